@@ -3,19 +3,22 @@ from pydantic import BaseModel
 from typing import Dict, Any, List, Optional
 import uvicorn
 import logging
+import threading
 
 try:
     from src.adversarial_engine import AdversarialEngine
-    from src.win_probability import WinProbabilityModel
+    from src.win_probability import RiskIntervalLookup, WinProbabilityModel
     from src.trade_partner_finder import TradePartnerFinder
+    from src.online_features import OnlineFeatureServer
 except ImportError:
     # Handle running from different directories
     import sys
     import os
     sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
     from src.adversarial_engine import AdversarialEngine
-    from src.win_probability import WinProbabilityModel
+    from src.win_probability import RiskIntervalLookup, WinProbabilityModel
     from src.trade_partner_finder import TradePartnerFinder
+    from src.online_features import OnlineFeatureServer
 
 # Setup Logger
 logging.basicConfig(level=logging.INFO)
@@ -28,6 +31,83 @@ engine = AdversarialEngine()
 win_model = WinProbabilityModel()
 partner_finder = TradePartnerFinder()
 
+# Online feature server is loaded lazily on first use (keeps startup DB-free).
+# Sync handlers run in a threadpool: the lazy globals below are built under locks.
+_feature_server: Optional[OnlineFeatureServer] = None
+_feature_server_lock = threading.Lock()
+
+def get_feature_server() -> OnlineFeatureServer:
+    global _feature_server
+    server = _feature_server
+    if server is None:
+        with _feature_server_lock:
+            if _feature_server is None:
+                from src.feature_store import FeatureStore
+                server = OnlineFeatureServer(FeatureStore(read_only=True))
+                server.refresh()
+                _feature_server = server
+            return _feature_server
+    # Serialized inside the server, on its own cursor
+    server.refresh_if_stale()
+    return server
+
+# Model prediction intervals, read once from prediction_results (no model call per request)
+_risk_intervals: Optional[RiskIntervalLookup] = None
+_risk_intervals_lock = threading.Lock()
+
+def get_risk_intervals() -> RiskIntervalLookup:
+    global _risk_intervals
+    if _risk_intervals is not None:
+        return _risk_intervals
+    with _risk_intervals_lock:
+        if _risk_intervals is None:
+            try:
+                from src.db_manager import DBManager
+                with DBManager() as db:
+                    _risk_intervals = RiskIntervalLookup.from_db(db.con)
+            except Exception as e:
+                logger.warning(f"Risk intervals unavailable ({e}); using point risk only.")
+                _risk_intervals = RiskIntervalLookup({})
+        return _risk_intervals
+
+# Risk model trained on the online feature set (src/online_model.py), compiled to flat
+# arrays once. The production model needs the full staging matrix, which is not online.
+_risk_predictor = None
+_risk_column_index = None
+_risk_predictor_lock = threading.Lock()
+
+# Below this share of the model's features present in the online vectors, scores are refused
+MIN_RISK_FEATURE_COVERAGE = 0.9
+
+def get_risk_predictor():
+    """(compiled predictor, its column index into the feature server's vectors, feature coverage)."""
+    global _risk_predictor, _risk_column_index
+    feature_names = get_feature_server().feature_names
+    predictor, column_index = _risk_predictor, _risk_column_index
+    # Recomputed only when a snapshot refresh swaps the feature list
+    if predictor is None or column_index is None or column_index[0] is not feature_names:
+        with _risk_predictor_lock:
+            if _risk_predictor is None:
+                from src.compiled_predictor import CompiledPredictor
+                from src.model_loader import load_online_predictor
+                registered = load_online_predictor()
+                if registered is None:
+                    raise RuntimeError("No online risk model registered")
+                _risk_predictor = CompiledPredictor.from_predictor(registered)
+                _risk_column_index = None
+            if _risk_column_index is None or _risk_column_index[0] is not feature_names:
+                index = _risk_predictor.column_index(feature_names)
+                coverage = float((index >= 0).mean()) if len(index) else 0.0
+                if coverage < MIN_RISK_FEATURE_COVERAGE:
+                    logger.warning(f"Online features cover {coverage:.0%} of the risk model's "
+                                   f"{len(index)} features ({int((index < 0).sum())} unmapped).")
+                _risk_column_index = (feature_names, index, coverage)
+            predictor, column_index = _risk_predictor, _risk_column_index
+    return predictor, column_index[1], column_index[2]
+
+class FeatureBatchRequest(BaseModel):
+    player_names: List[str]
+
 class TradeProposal(BaseModel):
     team_a: str
     team_b: str
@@ -63,7 +143,11 @@ def generate_counter(proposal: TradeProposal):
 def analyze_vegas(proposal: TradeProposal):
     try:
         logger.info(f"Analyzing Vegas impact for: {proposal.team_a} <-> {proposal.team_b}")
-        impact = win_model.calculate_win_impact(proposal.dict())
+        trade = proposal.dict()
+        intervals = get_risk_intervals()
+        intervals.attach(trade['team_a_assets'])
+        intervals.attach(trade['team_b_assets'])
+        impact = win_model.calculate_win_impact(trade)
         return impact
     except Exception as e:
         logger.error(f"Error analyzing Vegas impact: {str(e)}")
@@ -79,5 +163,56 @@ def find_partner(player_id: str, cap_hit: float, position: str = "QB"):
         logger.error(f"Error finding partners: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/features/{player_name}")
+def get_player_features(player_name: str):
+    try:
+        server = get_feature_server()
+        features = server.get_features(player_name)
+    except Exception as e:
+        logger.error(f"Error loading online features: {str(e)}")
+        raise HTTPException(status_code=503, detail="Feature store unavailable")
+    if features is None:
+        raise HTTPException(status_code=404, detail=f"No features for {player_name}")
+    return {"player": player_name, "features": features}
+
+@app.post("/api/features/batch")
+def get_batch_features(request: FeatureBatchRequest):
+    try:
+        server = get_feature_server()
+        X, found = server.get_batch(request.player_names)
+    except Exception as e:
+        logger.error(f"Error loading online features: {str(e)}")
+        raise HTTPException(status_code=503, detail="Feature store unavailable")
+    # NaN is not valid JSON; missing features are returned as null
+    rows = [[None if v != v else float(v) for v in row] for row in X.tolist()]
+    return {
+        "feature_names": server.feature_names,
+        "players": request.player_names,
+        "found": found.tolist(),
+        "features": rows,
+    }
+
+@app.post("/api/risk/batch")
+def score_batch_risk(request: FeatureBatchRequest):
+    try:
+        server = get_feature_server()
+        predictor, index, coverage = get_risk_predictor()
+        X, found = server.get_batch(request.player_names)
+    except Exception as e:
+        logger.error(f"Error loading risk model or features: {str(e)}")
+        raise HTTPException(status_code=503, detail="Risk model unavailable")
+    if coverage < MIN_RISK_FEATURE_COVERAGE:
+        # Unmapped features would be scored as missing: refuse rather than return meaningless numbers
+        raise HTTPException(status_code=503, detail=(
+            f"Online features cover {coverage:.0%} of the risk model's features "
+            f"(minimum {MIN_RISK_FEATURE_COVERAGE:.0%})"))
+    scores = predictor.predict(predictor.align(X, index)) if len(X) else []
+    return {
+        "players": request.player_names,
+        "found": found.tolist(),
+        "coverage": coverage,
+        "risk_scores": [float(s) if ok else None for s, ok in zip(scores, found)],
+    }
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -59,7 +59,7 @@ def main():
         try:
             from src.ml_validator import RedTeamEvaluator
             from src.ml_governance import MLGovernance
-            import joblib
+            from src.model_loader import load_predictor
             import pandas as pd
             import duckdb
             
@@ -67,7 +67,7 @@ def main():
             candidate = governance.get_latest_candidate()
             if candidate:
                 # Load candidate and validation data
-                model = joblib.load(candidate["path"])
+                model = load_predictor(candidate["path"], fallback=candidate)
                 con = duckdb.connect(get_db_path())
                 df = con.execute("SELECT * FROM staging_feature_matrix").df()
                 con.close()
@@ -78,7 +78,8 @@ def main():
                 
                 evaluator = RedTeamEvaluator()
                 # Use a small slice for drift check simulation
-                if evaluator.evaluate_model(model, X, y, X.tail(100), y.tail(100), candidate["metrics"]):
+                if evaluator.evaluate_model(model, X, y, X.tail(100), y.tail(100), candidate["metrics"],
+                                            model_path=candidate["path"]):
                     evaluator.validate_and_promote(candidate["path"])
                     logger.info("✅ Model Promoted to Production.")
                 else:
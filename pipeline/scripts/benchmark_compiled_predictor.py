@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark the Compiled Predictor Against XGBoost
+
+Loads the registered risk model (or --model), validates the compiled predictor
+bit for bit on the full training matrix, then reports p50/p99 latency of
+single-row and 100-row calls for:
+  - XGBRegressor.predict on a DataFrame (what a naive API endpoint would do)
+  - Booster.inplace_predict on a float32 array
+  - CompiledPredictor.predict
+
+Usage:
+    python scripts/benchmark_compiled_predictor.py [--model PATH] [--repeats 2000]
+"""
+
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.compiled_predictor import CompiledPredictor
+from src.model_loader import load_predictor, load_registered_predictor
+from src.train_model import RiskModeler
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def latency(fn, batches, repeats):
+    """(p50, p99) wall time in microseconds of fn over `repeats` calls cycling through batches."""
+    timings = np.empty(repeats)
+    for i in range(repeats):
+        batch = batches[i % len(batches)]
+        start = time.perf_counter()
+        fn(batch)
+        timings[i] = time.perf_counter() - start
+    return np.percentile(timings, 50) * 1e6, np.percentile(timings, 99) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compiled predictor validation and latency benchmark")
+    parser.add_argument("--model", default=None, help="Model artifact (defaults to the registered model)")
+    parser.add_argument("--target", default="edce_risk")
+    parser.add_argument("--repeats", type=int, default=2000)
+    args = parser.parse_args()
+
+    predictor = load_predictor(args.model) if args.model else load_registered_predictor()
+    if predictor is None:
+        logger.error("No registered model. Train one first (python -m src.train_model).")
+        sys.exit(1)
+
+    modeler = RiskModeler(read_only=True)
+    X, _, _ = modeler.prepare_data(args.target, matrix_format=predictor.matrix_format)
+    X_model = predictor.align(X)
+
+    start = time.perf_counter()
+    compiled = CompiledPredictor.from_predictor(predictor)
+    logger.info(f"Compiled {len(compiled.roots)} trees ({len(compiled.feature):,} nodes, depth {compiled.max_depth}) "
+                f"in {time.perf_counter() - start:.2f}s")
+
+    mismatched = compiled.validate(predictor.booster, X_model)
+    if mismatched:
+        logger.error(f"✗ {mismatched} rows differ from XGBoost; not benchmarking.")
+        sys.exit(1)
+
+    regressor = xgb.XGBRegressor()
+    regressor.load_model(str(predictor.path))
+    dense = compiled._dense(X_model)
+    rng = np.random.default_rng(0)
+
+    rows = []
+    for batch_size in (1, 100):
+        picks = [rng.integers(0, len(dense), batch_size) for _ in range(64)]
+        arrays = [dense[p] for p in picks]
+        frames = [pd.DataFrame(a, columns=predictor.feature_names) for a in arrays]
+        inputs = [X_model[p] for p in picks]
+        for name, fn, batches in [
+            ("XGBRegressor.predict(DataFrame)", regressor.predict, frames),
+            ("Booster.inplace_predict", lambda b: predictor.booster.inplace_predict(b, missing=np.nan), inputs),
+            ("CompiledPredictor.predict", compiled.predict, arrays),
+        ]:
+            p50, p99 = latency(fn, batches, args.repeats)
+            rows.append({'rows': batch_size, 'method': name, 'p50_us': round(p50, 1), 'p99_us': round(p99, 1)})
+
+    print(pd.DataFrame(rows).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
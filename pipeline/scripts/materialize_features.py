@@ -11,7 +11,7 @@ Pipeline Order:
 3. train_model.py (Feature Store → Model)
 
 Usage:
-    python scripts/materialize_features.py [--year YEAR] [--validate-only]
+    python scripts/materialize_features.py [--validate-only] [--full-refresh]
 """
 
 import argparse
@@ -31,13 +31,15 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def materialize_all_features(validate_only: bool = False, read_only: bool = False):
+def materialize_all_features(validate_only: bool = False, read_only: bool = False,
+                             full_refresh: bool = False):
     """
     Materialize all features into the Feature Store.
     
     Args:
         validate_only: If True, only validate existing features without re-materializing
         read_only: If True, open the database in read-only mode
+        full_refresh: If True, ignore partition watermarks and recompute every year
     """
     store = FeatureStore(read_only=read_only)
     
@@ -52,13 +54,10 @@ def materialize_all_features(validate_only: bool = False, read_only: bool = Fals
         print(stats)
         return is_valid
     
-    # Step 1: Materialize Lag Features (critical for preventing leakage)
-    logger.info("=== Step 1: Materializing Lag Features ===")
-    store.materialize_lag_features(source_table='fact_player_efficiency')
-    
-    # Step 2: Materialize Interaction Features
-    logger.info("=== Step 2: Materializing Interaction Features ===")
-    store.materialize_interaction_features(source_table='fact_player_efficiency')
+    # Step 1-2: Materialize Lag + Interaction Features for changed Gold partitions
+    logger.info("=== Step 1-2: Materializing Lag & Interaction Features (incremental) ===")
+    changed = store.refresh_features(source_table='fact_player_efficiency', full_refresh=full_refresh)
+    logger.info(f"Refreshed source years: {changed or 'none'}")
     
     # Step 3: Validate Temporal Integrity
     logger.info("=== Step 3: Validating Temporal Integrity ===")
@@ -93,11 +92,14 @@ def main():
     parser = argparse.ArgumentParser(description='Materialize features into Feature Store')
     parser.add_argument('--validate-only', action='store_true',
                         help='Only validate existing features without re-materializing')
+    parser.add_argument('--full-refresh', action='store_true',
+                        help='Ignore partition watermarks and recompute all years')
     parser.add_argument('--read-only', action='store_true', default=True,
                         help='Open the database in read-only mode (default: True)')
     args = parser.parse_args()
     
-    success = materialize_all_features(validate_only=args.validate_only, read_only=args.read_only)
+    success = materialize_all_features(validate_only=args.validate_only, read_only=args.read_only,
+                                       full_refresh=args.full_refresh)
     sys.exit(0 if success else 1)
 
 
@@ -1,4 +1,9 @@
 import logging
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import numpy as np
 import xgboost as xgb
@@ -6,11 +11,117 @@ from sklearn.metrics import mean_squared_error, r2_score
 import yaml
 import json
 from pathlib import Path
+from src.feature_factory import SparseFeatureMatrix
 
 logger = logging.getLogger(__name__)
 
+def write_sorted_history(X, order, directory):
+    """
+    Persist the year-sorted history once as float32 arrays that fold workers memory-map.
+
+    Returns a spec {kind, paths, shape} understood by `load_history_rows`.
+    """
+    directory = Path(directory)
+    if isinstance(X, SparseFeatureMatrix):
+        matrix = X.matrix[order].tocsr()
+        paths = {}
+        for name, arr in (("data", matrix.data.astype(np.float32, copy=False)),
+                          ("indices", matrix.indices), ("indptr", matrix.indptr)):
+            paths[name] = str(directory / f"{name}.npy")
+            np.save(paths[name], arr)
+        return {"kind": "csr", "paths": paths, "shape": matrix.shape}
+
+    dense = X.to_numpy(dtype=np.float32, na_value=np.nan)[order]
+    path = str(directory / "X.npy")
+    np.save(path, dense)
+    return {"kind": "dense", "paths": {"X": path}, "shape": dense.shape}
+
+
+def load_history_rows(spec, start, stop):
+    """Rows [start, stop) of the persisted history as a zero-copy view."""
+    if spec["kind"] == "dense":
+        return np.load(spec["paths"]["X"], mmap_mode="r")[start:stop]
+
+    import scipy.sparse as sp
+    indptr = np.load(spec["paths"]["indptr"], mmap_mode="r")
+    lo, hi = int(indptr[start]), int(indptr[stop])
+    return sp.csr_matrix(
+        (np.load(spec["paths"]["data"], mmap_mode="r")[lo:hi],
+         np.load(spec["paths"]["indices"], mmap_mode="r")[lo:hi],
+         np.asarray(indptr[start:stop + 1]) - lo),
+        shape=(stop - start, spec["shape"][1]),
+    )
+
+
+def warm_start_fit(params, X, y, booster=None, added_rounds=50, n_jobs=None):
+    """
+    Fit an XGBRegressor from scratch, or continue boosting `booster` on (X, y).
+
+    With a booster, exactly `added_rounds` trees are appended (xgb_model continuation)
+    instead of `params['n_estimators']`. Returns (model, fit seconds).
+    """
+    fit_params = dict(params)
+    if n_jobs is not None:
+        fit_params["n_jobs"] = n_jobs
+    if booster is not None:
+        fit_params["n_estimators"] = added_rounds
+
+    model = xgb.XGBRegressor(**fit_params)
+    start = time.perf_counter()
+    model.fit(X, y, xgb_model=booster, verbose=False)
+    return model, time.perf_counter() - start
+
+
+def expanding_folds(sorted_years, start_year, min_train=100):
+    """
+    (test_year, train_end, test_end) row ranges over a year-sorted history: fold T
+    trains on rows [0, train_end) (seasons before T) and tests on [train_end, test_end).
+    """
+    folds = []
+    for test_year in range(int(start_year), int(sorted_years.max()) + 1):
+        train_end = int(np.searchsorted(sorted_years, test_year, side='left'))
+        test_end = int(np.searchsorted(sorted_years, test_year, side='right'))
+        
+        if test_end == train_end or train_end == 0:
+            logger.warning(f"  ⚠️ Skipping year {test_year}: insufficient data")
+            continue
+        if train_end < min_train:
+            logger.warning(f"  ⚠️ Skipping year {test_year}: only {train_end} training samples")
+            continue
+        folds.append((test_year, train_end, test_end))
+    return folds
+
+
+def _fit_fold(task):
+    """Train on rows [0, train_end) and predict rows [train_end, test_end) (runs in a worker)."""
+    X_train = load_history_rows(task["spec"], 0, task["train_end"])
+    X_test = load_history_rows(task["spec"], task["train_end"], task["test_end"])
+    y_sorted = np.load(task["y_path"], mmap_mode="r")
+
+    model, seconds = warm_start_fit(task["params"], X_train, y_sorted[:task["train_end"]], n_jobs=task["n_jobs"])
+    return task["test_year"], (model.predict(X_test), seconds)
+
+
+def _fit_incremental(spec, y_path, folds, params, added_rounds, n_jobs):
+    """
+    Expanding window with warm starts: the first fold trains from scratch, every later
+    fold continues the previous booster on the rows appended since (in-process, as
+    each fold depends on the last).
+    """
+    y_sorted = np.load(y_path, mmap_mode="r")
+    booster, prev_end = None, 0
+    fold_preds = {}
+    for test_year, train_end, test_end in folds:
+        start = 0 if booster is None else prev_end
+        model, seconds = warm_start_fit(params, load_history_rows(spec, start, train_end), y_sorted[start:train_end],
+                                        booster=booster, added_rounds=added_rounds, n_jobs=n_jobs)
+        fold_preds[test_year] = (model.predict(load_history_rows(spec, train_end, test_end)), seconds)
+        booster, prev_end = model.get_booster(), train_end
+    return fold_preds
+
+
 class WalkForwardValidator:
-    def __init__(self, config_path="pipeline/config/ml_config.yaml"):
+    def __init__(self, config_path="pipeline/config/ml_config.yaml", max_workers=None):
         if not Path(config_path).exists():
              # Fallback for running within pipeline dir
              if Path("config/ml_config.yaml").exists():
@@ -18,84 +129,138 @@ class WalkForwardValidator:
         with open(config_path, "r") as f:
             self.config = yaml.safe_load(f)
         self.params = self.config["models"]["xgboost"]["params"]
+        backtest_config = self.config.get("validation", {}).get("backtest", {}) or {}
+        self.max_workers = max_workers or backtest_config.get("max_workers") or os.cpu_count() or 1
+        # 'full' retrains every fold, 'incremental' warm-starts, 'compare' runs both
+        self.mode = backtest_config.get("mode", "full")
+        self.incremental_rounds = backtest_config.get("incremental_rounds", 50)
+
+    def _fold_threads(self, n_workers):
+        """Threads per fold: the params' n_jobs, capped so workers share the cores."""
+        cores = os.cpu_count() or 1
+        requested = self.params.get("n_jobs", -1)
+        share = max(1, cores // n_workers)
+        return share if requested is None or requested <= 0 else min(requested, share)
 
-    def run_backtest(self, X, y, metadata, start_year=2018):
+    def run_backtest(self, X, y, metadata, start_year=2018, mode=None):
         """
         Executes a rolling walk-forward validation.
+
+        X may be a DataFrame or a SparseFeatureMatrix (rows positionally aligned
+        with y and metadata). The history is sorted by year and written once as
+        float32 arrays; every fold trains on a leading row range of it (a zero-copy
+        memory-mapped view) in a process pool. Per-fold seeds and thread counts do
+        not depend on scheduling, so results are deterministic.
+
+        mode: 'full' (fresh model per fold), 'incremental' (warm-start from the
+        previous fold, adding `incremental_rounds` trees on the new seasons) or
+        'compare' (both; predictions are the full ones and the results gain
+        *_incremental columns). Defaults to validation.backtest.mode.
         """
+        mode = mode or self.mode
+        if mode not in ("full", "incremental", "compare"):
+            raise ValueError(f"Unknown backtest mode: {mode}")
         logger.info(f"⏳ Starting Walk-Forward Validation (Start Test Year: {start_year})...")
         
         # Ensure metadata index aligns with X/y
-        metadata = metadata.loc[X.index].copy()
+        if isinstance(X, SparseFeatureMatrix):
+            metadata = metadata.reset_index(drop=True)
+            y = y.reset_index(drop=True)
+        else:
+            metadata = metadata.loc[X.index].copy()
+            y = y.loc[X.index]
         
         years = sorted(metadata['year'].dropna().unique())
         logger.info(f"  📊 Available years in data: {years}")
-        results = []
         
         # We need at least 3 years of data to start training usually
         if start_year < min(years) + 3:
             logger.warning(f"Start year {start_year} is too early for data starting {min(years)}. Adjusting.")
             start_year = min(years) + 3
+        
+        # 1. Temporal Split: sort once, so every fold is "rows before the test year"
+        order = np.argsort(metadata['year'].to_numpy(), kind='stable')
+        sorted_years = metadata['year'].to_numpy()[order]
+        
+        folds = expanding_folds(sorted_years, start_year)
+        
+        if not folds:
+            logger.error("❌ No valid backtest folds were produced!")
+            return pd.DataFrame(columns=["test_year", "rmse", "r2", "train_size", "test_size"]), pd.DataFrame()
+        
+        # 2. Train Models
+        n_workers = max(1, min(self.max_workers, len(folds))) if mode != "incremental" else 1
+        n_jobs = self._fold_threads(n_workers)
+        logger.info(f"  ⚙️ {len(folds)} folds ({mode}) on {n_workers} worker(s) × {n_jobs} thread(s)")
+        
+        y_sorted = y.to_numpy(dtype=np.float32)[order]
+        full_preds, incremental_preds = None, None
+        with tempfile.TemporaryDirectory(prefix="backtest_") as tmp:
+            spec = write_sorted_history(X, order, tmp)
+            y_path = str(Path(tmp) / "y.npy")
+            np.save(y_path, y_sorted)
             
-        for test_year in range(int(start_year), int(max(years)) + 1):
-            # 1. Temporal Split
-            train_mask = metadata['year'] < test_year
-            test_mask = metadata['year'] == test_year
-            
-            if not test_mask.any() or not train_mask.any():
-                logger.warning(f"  ⚠️ Skipping year {test_year}: insufficient data")
-                continue
-                
-            X_train = X.loc[train_mask]
-            y_train = y.loc[train_mask]
-            X_test = X.loc[test_mask]
-            y_test = y.loc[test_mask]
-            
-            if len(X_train) < 100:
-                logger.warning(f"  ⚠️ Skipping year {test_year}: only {len(X_train)} training samples")
-                continue
-            
-            # 2. Train Model (Fresh for each fold)
-            model = xgb.XGBRegressor(**self.params)
-            model.fit(X_train, y_train, verbose=False)
+            if mode in ("full", "compare"):
+                # Fresh model per fold, concurrently
+                tasks = [
+                    {"spec": spec, "y_path": y_path, "params": self.params, "n_jobs": n_jobs,
+                     "test_year": test_year, "train_end": train_end, "test_end": test_end}
+                    for test_year, train_end, test_end in folds
+                ]
+                if n_workers == 1:
+                    full_preds = dict(map(_fit_fold, tasks))
+                else:
+                    # spawn: workers must not inherit DuckDB/OpenMP thread state via fork
+                    context = multiprocessing.get_context("spawn")
+                    with ProcessPoolExecutor(max_workers=n_workers, mp_context=context) as pool:
+                        full_preds = dict(pool.map(_fit_fold, tasks))
             
-            # 3. Evaluate
-            preds = model.predict(X_test)
+            if mode in ("incremental", "compare"):
+                incremental_preds = _fit_incremental(spec, y_path, folds, self.params,
+                                                     self.incremental_rounds, self._fold_threads(1))
+        
+        # 3. Evaluate (in fold order, independent of completion order)
+        fold_preds = incremental_preds if mode == "incremental" else full_preds
+        results = []
+        all_preds = []
+        for test_year, train_end, test_end in folds:
+            preds, seconds = fold_preds[test_year]
+            rows = order[train_end:test_end]
+            y_test = y.iloc[rows]
             rmse = np.sqrt(mean_squared_error(y_test, preds))
             r2 = r2_score(y_test, preds)
             
-            logger.info(f"  📅 Test Year {test_year}: RMSE={rmse:.4f}, R2={r2:.4f} (Train Size: {len(X_train)})")
+            logger.info(f"  📅 Test Year {test_year}: RMSE={rmse:.4f}, R2={r2:.4f} (Train Size: {train_end})")
             
-            results.append({
+            result = {
                 "test_year": int(test_year),
                 "rmse": float(rmse),
                 "r2": float(r2),
-                "train_size": len(X_train),
-                "test_size": len(X_test),
-                "predictions": pd.DataFrame({
-                    "player_name": metadata.loc[test_mask, 'player_name'],
-                    "year": test_year,
-                    "team": metadata.loc[test_mask, 'team'],
-                    "actual": y_test,
-                    "predicted": preds
+                "train_size": train_end,
+                "test_size": test_end - train_end,
+                "fit_seconds": float(seconds),
+            }
+            if mode == "compare":
+                inc_preds, inc_seconds = incremental_preds[test_year]
+                inc_rmse = np.sqrt(mean_squared_error(y_test, inc_preds))
+                result.update({
+                    "rmse_incremental": float(inc_rmse),
+                    "r2_incremental": float(r2_score(y_test, inc_preds)),
+                    "fit_seconds_incremental": float(inc_seconds),
                 })
-            })
+                logger.info(f"     ↳ Warm start: RMSE={inc_rmse:.4f} ({inc_rmse - rmse:+.4f}), "
+                            f"fit {inc_seconds:.2f}s vs {seconds:.2f}s")
+            results.append(result)
+            all_preds.append(pd.DataFrame({
+                "player_name": metadata['player_name'].iloc[rows],
+                "year": test_year,
+                "team": metadata['team'].iloc[rows],
+                "actual": y_test,
+                "predicted": preds
+            }))
         
-        if not results:
-            logger.error("❌ No valid backtest folds were produced!")
-            return pd.DataFrame(columns=["test_year", "rmse", "r2", "train_size", "test_size"]), pd.DataFrame()
-            
-        # Compile all predictions into a single DataFrame
-        all_preds = []
-        clean_results = []
-        
-        for res in results:
-            if "predictions" in res:
-                all_preds.append(res.pop("predictions"))
-            clean_results.append(res)
-            
-        predictions_df = pd.concat(all_preds, ignore_index=True) if all_preds else pd.DataFrame()
-        return pd.DataFrame(clean_results), predictions_df
+        predictions_df = pd.concat(all_preds, ignore_index=True)
+        return pd.DataFrame(results), predictions_df
 
     def generate_report(self, results_df, report_path="reports/backtest_results.md"):
         if results_df.empty:
@@ -128,6 +293,18 @@ class WalkForwardValidator:
 """
         for _, row in results_df.iterrows():
             report += f"| {int(row['test_year'])} | {row['rmse']:.4f} | {row['r2']:.4f} | {int(row['train_size'])} | {int(row['test_size'])} |\n"
+        
+        if 'rmse_incremental' in results_df.columns:
+            report += """
+## Warm Start vs Full Retrain
+| Year | RMSE (full) | RMSE (warm) | Δ RMSE | Fit s (full) | Fit s (warm) | Speedup |
+|------|-------------|-------------|--------|--------------|--------------|---------|
+"""
+            for _, row in results_df.iterrows():
+                speedup = row['fit_seconds'] / row['fit_seconds_incremental'] if row['fit_seconds_incremental'] else float('nan')
+                report += (f"| {int(row['test_year'])} | {row['rmse']:.4f} | {row['rmse_incremental']:.4f} | "
+                           f"{row['rmse_incremental'] - row['rmse']:+.4f} | {row['fit_seconds']:.2f} | "
+                           f"{row['fit_seconds_incremental']:.2f} | {speedup:.1f}x |\n")
             
         # Write to file
         Path(report_path).parent.mkdir(parents=True, exist_ok=True)
@@ -0,0 +1,232 @@
+"""
+Batch Scoring: Stream the Feature Matrix Through the Model, Year by Year
+
+Scores any range of seasons of `staging_feature_matrix` with the registered risk
+model and writes `prediction_results`, one year partition at a time.
+
+Key Concepts:
+- The matrix is streamed from DuckDB as Arrow record batches; only one batch (plus
+  its float32 model input) is ever in memory, so 2011-2025 costs the same memory
+  as a single season.
+- The mapping from the model's feature manifest to batch columns is computed once
+  from the schema. Each batch is scattered into a float32 block in manifest order;
+  features the matrix lacks stay 0, i.e. what dense training filled NULLs with and
+  an absent (missing) entry for sparse models -- matching how each was trained.
+- Each year is a partition: its rows in `prediction_results` are replaced inside
+  one transaction, so a rerun of a range is idempotent and other years are untouched.
+  Training writes its predictions the same way (`replace_year_partitions`), so a
+  training run replaces only the seasons it scored, not batch-scored history.
+- If the model was registered with a quantile companion, its bands are written
+  next to the point estimate (risk_lower / risk_median / risk_upper).
+- With a multi-target bundle (--bundle, see src/multi_target.py) each batch is
+  built once and every member writes its own `predicted_<target>` column.
+
+Usage:
+    python -m src.batch_scoring --start-year 2011 --end-year 2025
+    python -m src.batch_scoring --start-year 2011 --end-year 2025 --bundle
+"""
+
+import argparse
+import logging
+import time
+from typing import List, Optional
+
+import duckdb
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import scipy.sparse as sp
+
+from src.config_loader import get_db_path
+from src.feature_dtypes import NUMERIC_SQL_TYPES
+from src.feature_factory import _quote_ident
+from src.model_loader import (ModelBundle, ModelPredictor, load_predictor, load_registered_bundle,
+                              load_registered_interval_predictor, load_registered_predictor)
+
+logger = logging.getLogger(__name__)
+
+METADATA_COLS = ('player_name', 'year', 'team')
+INTERVAL_COLS = ('risk_lower', 'risk_median', 'risk_upper')
+
+
+def replace_year_partitions(con, table: str, frame: pd.DataFrame):
+    """
+    Replace the rows of every year in `frame` in `table`, in one transaction.
+
+    The table is created from the frame if needed and gains any column the frame
+    adds; years not in `frame` are left as they are.
+    """
+    con.register("partition_rows", frame)
+    try:
+        con.execute(f"CREATE TABLE IF NOT EXISTS {table} AS SELECT * FROM partition_rows LIMIT 0")
+        existing = {row[0] for row in con.execute(f"DESCRIBE {table}").fetchall()}
+        for name, col_type, *_ in con.execute("DESCRIBE partition_rows").fetchall():
+            if name not in existing:
+                con.execute(f"ALTER TABLE {table} ADD COLUMN {_quote_ident(name)} {col_type}")
+        con.execute("BEGIN TRANSACTION")
+        try:
+            con.execute(f"DELETE FROM {table} WHERE year IN (SELECT DISTINCT year FROM partition_rows)")
+            con.execute(f"INSERT INTO {table} BY NAME SELECT * FROM partition_rows")
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+    finally:
+        con.unregister("partition_rows")
+
+
+class BatchScorer:
+    def __init__(self, db_path=None, predictor: Optional[ModelPredictor] = None,
+                 table='staging_feature_matrix', output_table='prediction_results', batch_size=50_000,
+                 interval_predictor: Optional[ModelPredictor] = None, bundle: Optional[ModelBundle] = None):
+        self.con = duckdb.connect(str(db_path or get_db_path()))
+        if bundle is not None:
+            # Members share one feature manifest, so the first one describes the input
+            predictor = bundle.first
+        elif predictor is None:
+            # The registered model and its registered quantile companion go together
+            predictor = load_registered_predictor()
+            interval_predictor = interval_predictor or load_registered_interval_predictor()
+        if predictor is None:
+            raise ValueError("No registered model to score with.")
+        self.predictor = predictor
+        self.interval_predictor = interval_predictor
+        self.bundle = bundle
+        self.table = table
+        self.output_table = output_table
+        self.batch_size = batch_size
+
+    def _column_map(self, predictor: ModelPredictor):
+        """(metadata columns, [(batch column, model feature index)]) for the source table."""
+        schema = self.con.execute(f"DESCRIBE {self.table}").fetchall()
+        numeric = {name for name, col_type, *_ in schema if col_type.split('(')[0] in NUMERIC_SQL_TYPES}
+        meta_cols = [c for c in METADATA_COLS if c in {row[0] for row in schema}]
+        mapping = [(name, j) for j, name in enumerate(predictor.feature_names)
+                   if name in numeric and name not in meta_cols]
+        return meta_cols, mapping
+
+    @staticmethod
+    def _model_input(batch: pa.RecordBatch, mapping, predictor: ModelPredictor):
+        """One record batch as `predictor`'s input block, columns in manifest order."""
+        block = np.zeros((batch.num_rows, len(predictor.feature_names)), dtype=np.float32)
+        for name, j in mapping:
+            block[:, j] = pc.cast(batch.column(name), pa.float32()).to_numpy(zero_copy_only=False)
+        # Training filled NULLs with 0 (dense) or stored neither zeros nor NULLs (sparse)
+        block = np.nan_to_num(block, nan=0.0, copy=False)
+        return sp.csr_matrix(block) if predictor.matrix_format == "sparse" else block
+
+    def _prediction_cols(self):
+        if self.bundle is not None:
+            return [f"predicted_{target}" for target in self.bundle.predictors]
+        return ['predicted_risk_score']
+
+    def _ensure_output(self, meta_cols):
+        cols = {'player_name': 'VARCHAR', 'year': 'INTEGER', 'team': 'VARCHAR'}
+        columns = ", ".join([f"{c} {cols[c]}" for c in meta_cols] +
+                            [f"{_quote_ident(c)} DOUBLE" for c in self._prediction_cols()])
+        self.con.execute(f"CREATE TABLE IF NOT EXISTS {self.output_table} ({columns})")
+        for col in self._prediction_cols():
+            self.con.execute(f"ALTER TABLE {self.output_table} ADD COLUMN IF NOT EXISTS {_quote_ident(col)} DOUBLE")
+        if self.interval_predictor is not None:
+            for col in INTERVAL_COLS:
+                self.con.execute(f"ALTER TABLE {self.output_table} ADD COLUMN IF NOT EXISTS {col} DOUBLE")
+
+    def score_year(self, year: int, meta_cols, mapping, interval_mapping=None) -> int:
+        """Replace the `year` partition of the output table; returns rows scored."""
+        columns = [name for name, _ in mapping] + [name for name, _ in interval_mapping or []]
+        select = ", ".join(_quote_ident(c) for c in meta_cols + list(dict.fromkeys(columns)))
+        # Separate cursor: the stream stays open while the writer connection inserts
+        with self.con.cursor() as cur:
+            reader = cur.execute(
+                f"SELECT {select} FROM {self.table} WHERE year = ?", [year]
+            ).fetch_record_batch(self.batch_size)
+            return self._write_year(year, reader, meta_cols, mapping, interval_mapping)
+
+    def _write_year(self, year, reader, meta_cols, mapping, interval_mapping) -> int:
+        """Score the batches of `reader` into a fresh `year` partition, in one transaction."""
+        n_rows = 0
+        self.con.execute("BEGIN TRANSACTION")
+        try:
+            self.con.execute(f"DELETE FROM {self.output_table} WHERE year = ?", [year])
+            for batch in reader:
+                results = batch.select(meta_cols).to_pandas()
+                block = self._model_input(batch, mapping, self.predictor)
+                if self.bundle is not None:
+                    for target, preds in self.bundle.predict_aligned(block).items():
+                        results[f"predicted_{target}"] = preds
+                else:
+                    results['predicted_risk_score'] = self.predictor.booster.inplace_predict(block, missing=np.nan)
+                if self.interval_predictor is not None:
+                    bands = self.interval_predictor.predict(
+                        self._model_input(batch, interval_mapping, self.interval_predictor))
+                    results['risk_lower'] = bands[:, 0]
+                    results['risk_median'] = bands[:, bands.shape[1] // 2]
+                    results['risk_upper'] = bands[:, -1]
+                self.con.register("scored_batch", results)
+                self.con.execute(f"INSERT INTO {self.output_table} BY NAME SELECT * FROM scored_batch")
+                self.con.unregister("scored_batch")
+                n_rows += batch.num_rows
+            self.con.execute("COMMIT")
+        except Exception:
+            self.con.execute("ROLLBACK")
+            raise
+        return n_rows
+
+    def score(self, start_year: int, end_year: int) -> pd.DataFrame:
+        """Score every season in [start_year, end_year]; returns rows and seconds per year."""
+        meta_cols, mapping = self._column_map(self.predictor)
+        interval_mapping = self._column_map(self.interval_predictor)[1] if self.interval_predictor else None
+        if 'year' not in meta_cols:
+            raise ValueError(f"{self.table} has no year column to partition on.")
+        n_missing = len(self.predictor.feature_names) - len(mapping)
+        model = f"bundle {self.bundle.version}" if self.bundle is not None else self.predictor.path
+        logger.info(f"🧮 Batch scoring {self.table} {start_year}-{end_year} with {model} "
+                    f"({len(mapping)} features mapped, {n_missing} absent, batches of {self.batch_size:,})")
+        self._ensure_output(meta_cols)
+
+        summary = []
+        for year in range(start_year, end_year + 1):
+            start = time.perf_counter()
+            n_rows = self.score_year(year, meta_cols, mapping, interval_mapping)
+            summary.append({'year': year, 'rows': n_rows, 'seconds': time.perf_counter() - start})
+            logger.info(f"  {year}: {n_rows:,} rows in {summary[-1]['seconds']:.2f}s")
+
+        summary = pd.DataFrame(summary)
+        logger.info(f"✓ Scored {summary['rows'].sum():,} rows into '{self.output_table}'")
+        return summary
+
+    def close(self):
+        self.con.close()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Score a range of seasons with the registered risk model.")
+    parser.add_argument("--start-year", type=int, required=True)
+    parser.add_argument("--end-year", type=int, required=True)
+    parser.add_argument("--db-path", default=None)
+    parser.add_argument("--model", default=None, help="Model artifact to use instead of the registry's")
+    parser.add_argument("--table", default="staging_feature_matrix")
+    parser.add_argument("--output-table", default=None,
+                        help="Defaults to prediction_results (multi_target_predictions with --bundle)")
+    parser.add_argument("--batch-size", type=int, default=50_000)
+    parser.add_argument("--bundle", action="store_true", help="Score every target of the registered model bundle")
+    args = parser.parse_args(argv)
+
+    bundle = None
+    if args.bundle:
+        bundle = load_registered_bundle()
+        if bundle is None:
+            raise ValueError("No registered model bundle to score with.")
+    output_table = args.output_table or ("multi_target_predictions" if bundle else "prediction_results")
+    predictor = load_predictor(args.model) if args.model and bundle is None else None
+    scorer = BatchScorer(args.db_path, predictor, args.table, output_table, args.batch_size, bundle=bundle)
+    try:
+        scorer.score(args.start_year, args.end_year)
+    finally:
+        scorer.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
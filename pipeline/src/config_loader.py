@@ -70,3 +70,21 @@ def get_model_dir():
     """Get the model directory from config."""
     config = get_config()
     return Path(config.get("models", {}).get("directory", "models"))
+
+
+def get_feature_snapshot_dir():
+    """Get the directory for persisted wide feature snapshots from config."""
+    config = get_config()
+    return Path(config.get("data", {}).get("feature_snapshots", "data/gold/feature_snapshots"))
+
+
+def get_feature_cache_dir():
+    """Get the on-disk feature matrix cache directory from config."""
+    config = get_config()
+    return Path(config.get("data", {}).get("feature_cache", "data/cache/features"))
+
+
+def get_training_snapshot_dir():
+    """Get the directory for content-addressed training snapshots from config."""
+    config = get_config()
+    return Path(config.get("data", {}).get("training_snapshots", "data/cache/training"))
@@ -0,0 +1,161 @@
+"""
+Drift Detection: KS and PSI for Every Feature at Once
+
+Compares a reference sample (training data) with a current sample (holdout or
+live data) across the full feature width in a handful of array operations,
+instead of one `ks_2samp` call per column.
+
+Key Concepts:
+- Each feature is sorted once (feature-major, so a feature is a contiguous row)
+  and both statistics read from the sorted rows.
+- KS: between two current values the current ECDF is flat, so the largest ECDF
+  gap is at, or just below, a current value. Both ECDFs are evaluated there with
+  searchsorted counts. The statistic equals `ks_2samp`'s.
+- Counts for every feature come from a single flattened `np.searchsorted`: values
+  are replaced by their integer rank among all values, and each feature's ranks
+  are offset by a per-feature stride, so the concatenated rows stay sorted and a
+  query never crosses into another feature's row.
+- KS p-values come from the Kolmogorov limiting distribution with Stephens'
+  small-sample correction -- one vectorized special-function call. (`ks_2samp`'s
+  exact distribution costs milliseconds per feature; the statistics are identical.)
+- PSI: bin edges are the reference deciles of each feature (read off the sorted
+  row), shared by both samples; bin counts are differences of "values below
+  edge" counts.
+- NaN is treated as missing: it is excluded from both statistics, with per-feature
+  sample sizes. A feature with no values in either sample has no distribution to
+  compare: its KS statistic is 0 (p-value 1) and its PSI is NaN.
+
+Usage:
+    from src.drift_detection import compute_drift
+
+    report = compute_drift(X_train, X_holdout)
+    report.head(10)   # most drifted features first
+"""
+
+import logging
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+from scipy.special import kolmogorov
+
+logger = logging.getLogger(__name__)
+
+PSI_EPSILON = 1e-4  # Floor for empty bins so PSI stays finite
+
+
+def _as_matrix(X) -> np.ndarray:
+    if isinstance(X, pd.DataFrame):
+        X = X.to_numpy(dtype=np.float64, na_value=np.nan)
+    elif hasattr(X, "toarray"):
+        X = X.toarray()
+    return np.asarray(X, dtype=np.float64)
+
+
+def _sorted_features(X: np.ndarray) -> np.ndarray:
+    """Feature-major copy with each feature's values sorted (NaN last)."""
+    return np.sort(np.ascontiguousarray(X.T), axis=1)
+
+
+def _count_below(sorted_rows: np.ndarray, queries: np.ndarray, side: str) -> np.ndarray:
+    """Row-wise searchsorted: for each row, how many sorted values are < (left) or <= (right) each query."""
+    n_rows, width = sorted_rows.shape
+    # Integer ranks (NaN last, ties equal) keep the order exact where float offsets would not
+    _, ranks = np.unique(np.concatenate([sorted_rows.ravel(), queries.ravel()]), return_inverse=True)
+    ranks = ranks.ravel().astype(np.int64)
+    row = np.arange(n_rows, dtype=np.int64)[:, None]
+    stride = int(ranks.max()) + 1 if ranks.size else 1
+    keys = ranks[:sorted_rows.size].reshape(sorted_rows.shape) + row * stride
+    query_keys = ranks[sorted_rows.size:].reshape(queries.shape) + row * stride
+    return np.searchsorted(keys.ravel(), query_keys, side=side) - row * width
+
+
+def _tie_ranks(sorted_rows: np.ndarray):
+    """For each value of each sorted row, how many values in its row are < it and <= it."""
+    position = np.broadcast_to(np.arange(sorted_rows.shape[1]), sorted_rows.shape)
+    differs = sorted_rows[:, 1:] != sorted_rows[:, :-1]
+    run_start = np.ones(sorted_rows.shape, dtype=bool)
+    run_start[:, 1:] = differs
+    run_end = np.ones(sorted_rows.shape, dtype=bool)
+    run_end[:, :-1] = differs
+    less = np.maximum.accumulate(np.where(run_start, position, 0), axis=1)
+    at_most = np.minimum.accumulate(np.where(run_end, position, sorted_rows.shape[1])[:, ::-1], axis=1)[:, ::-1] + 1
+    return less, at_most
+
+
+def _ks_from_sorted(ref: np.ndarray, cur: np.ndarray):
+    n_ref = (~np.isnan(ref)).sum(axis=1)[:, None]
+    n_cur = (~np.isnan(cur)).sum(axis=1)[:, None]
+    cur_less, cur_at_most = _tie_ranks(cur)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # Both ECDFs at, and just below, every current value: between two current
+        # values F_cur is flat, so the sup of |F_ref - F_cur| is at one of these points
+        at = np.abs(_count_below(ref, cur, "right") / n_ref - cur_at_most / n_cur)
+        below = np.abs(_count_below(ref, cur, "left") / n_ref - cur_less / n_cur)
+    gap = np.where(np.isnan(cur), 0.0, np.maximum(at, below))
+    stat = np.nan_to_num(gap.max(axis=1, initial=0.0))
+
+    n_ref, n_cur = n_ref.ravel(), n_cur.ravel()
+    p_value = np.ones_like(stat)
+    ok = (n_ref > 0) & (n_cur > 0)
+    root_n = np.sqrt(n_ref[ok] * n_cur[ok] / (n_ref[ok] + n_cur[ok]))
+    p_value[ok] = np.clip(kolmogorov((root_n + 0.12 + 0.11 / root_n) * stat[ok]), 0, 1)
+    return stat, p_value
+
+
+def _psi_from_sorted(ref: np.ndarray, cur: np.ndarray, n_bins: int) -> np.ndarray:
+    n_valid = (~np.isnan(ref)).sum(axis=1)
+    if ref.shape[1] == 0 or cur.shape[1] == 0:
+        return np.full(len(ref), np.nan)
+    # Inner edges: reference order statistics at each decile (lower interpolation)
+    ranks = np.floor(np.linspace(0, 1, n_bins + 1)[1:-1][None, :] * np.maximum(n_valid - 1, 0)[:, None])
+    edges = np.take_along_axis(ref, ranks.astype(np.int64), axis=1)
+
+    def shares(sorted_rows):
+        # Bin counts are differences of "values below each edge"; a value equal to an edge goes up
+        total = (~np.isnan(sorted_rows)).sum(axis=1)[:, None]
+        below = np.minimum(_count_below(sorted_rows, edges, "left"), total)
+        counts = np.diff(np.hstack([np.zeros_like(total), below, total]), axis=1)
+        return np.maximum(counts / np.maximum(total, 1), PSI_EPSILON)
+
+    expected, actual = shares(ref), shares(cur)
+    psi = ((actual - expected) * np.log(actual / expected)).sum(axis=1)
+    # An empty side would be all-epsilon bins (PSI ~9): undefined, not drifted
+    return np.where((n_valid > 0) & ((~np.isnan(cur)).sum(axis=1) > 0), psi, np.nan)
+
+
+def ks_statistics(reference: np.ndarray, current: np.ndarray):
+    """Two-sample KS statistic and p-value for every column: ((p,), (p,))."""
+    return _ks_from_sorted(_sorted_features(reference), _sorted_features(current))
+
+
+def population_stability_index(reference: np.ndarray, current: np.ndarray, n_bins: int = 10) -> np.ndarray:
+    """PSI per column, with bins at the reference quantiles (shared by both samples); NaN if a side is empty."""
+    return _psi_from_sorted(_sorted_features(reference), _sorted_features(current), n_bins)
+
+
+def compute_drift(reference, current, feature_names: Optional[List[str]] = None, n_bins: int = 10) -> pd.DataFrame:
+    """
+    Per-feature drift report, most drifted (largest KS statistic) first.
+
+    Returns a DataFrame with feature, ks_stat, ks_p_value, psi and drift_rank (1 = most drifted).
+    """
+    if isinstance(reference, pd.DataFrame) and isinstance(current, pd.DataFrame):
+        # Numeric features present in both samples; identifiers and labels are skipped
+        numeric = set(current.select_dtypes(include=["number", "bool"]).columns)
+        feature_names = [c for c in reference.select_dtypes(include=["number", "bool"]).columns if c in numeric]
+        reference, current = reference[feature_names], current[feature_names]
+    reference, current = _as_matrix(reference), _as_matrix(current)
+    feature_names = list(feature_names) if feature_names is not None else [f"f{i}" for i in range(reference.shape[1])]
+
+    # Each feature is sorted once and shared by both statistics
+    ref_sorted, cur_sorted = _sorted_features(reference), _sorted_features(current)
+    stat, p_value = _ks_from_sorted(ref_sorted, cur_sorted)
+    report = pd.DataFrame({
+        'feature': feature_names,
+        'ks_stat': stat,
+        'ks_p_value': p_value,
+        'psi': _psi_from_sorted(ref_sorted, cur_sorted, n_bins),
+    }).sort_values(['ks_stat', 'psi'], ascending=False, kind="stable").reset_index(drop=True)
+    report['drift_rank'] = np.arange(1, len(report) + 1)
+    return report
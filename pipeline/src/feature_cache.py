@@ -0,0 +1,115 @@
+"""
+Feature Matrix Cache: Memoized Point-in-Time Matrices on Local Disk
+
+Training, backtesting, inference and analysis scripts keep asking the FeatureStore
+for the same matrices. This cache stores each result as an uncompressed Arrow IPC
+file keyed by (query kind, parameters, store version), so a repeated request -- in
+the same session or another process -- is a memory-mapped read instead of a pivot.
+
+Key Concepts:
+- The store version is bumped on every materialization, so stale entries are never
+  served; they simply stop being referenced and age out.
+- Files are written to a temp name and atomically renamed, so concurrent readers
+  never see a partial entry.
+- Total size is kept under a byte budget by evicting least-recently-used entries
+  (file mtime is refreshed on every hit).
+
+Usage:
+    from src.feature_cache import FeatureMatrixCache
+
+    cache = FeatureMatrixCache("data/cache/features", max_bytes=2 * 1024**3)
+    key = cache.make_key("training_matrix", as_of_date="2024-09-01", version=7)
+    df = cache.get(key)
+    if df is None:
+        df = expensive_query()
+        cache.put(key, df)
+"""
+
+import hashlib
+import json
+import logging
+import os
+import uuid
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+import pyarrow as pa
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3  # 2 GB
+
+
+class FeatureMatrixCache:
+    """LRU cache of DataFrames stored as memory-mappable Arrow IPC files."""
+
+    SUFFIX = ".arrow"
+
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def make_key(kind: str, **params) -> str:
+        """Stable content key for a query kind and its parameters."""
+        payload = json.dumps({"kind": kind, **params}, sort_keys=True, default=str)
+        return f"{kind}-{hashlib.sha256(payload.encode()).hexdigest()[:32]}"
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}{self.SUFFIX}"
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        """Return the cached DataFrame for `key`, or None on a miss."""
+        path = self._path(key)
+        try:
+            with pa.memory_map(str(path), "r") as source:
+                table = pa.ipc.open_file(source).read_all()
+            os.utime(path)  # Mark as recently used
+        except (FileNotFoundError, pa.ArrowInvalid):
+            return None
+
+        logger.debug(f"Feature cache hit: {key}")
+        return table.to_pandas()
+
+    def put(self, key: str, df: pd.DataFrame):
+        """Store `df` under `key` and evict old entries beyond the size budget."""
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        path = self._path(key)
+        tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+
+        with pa.OSFile(str(tmp_path), "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+
+        self._evict(keep=path)
+
+    def _evict(self, keep: Optional[Path] = None):
+        """Delete least-recently-used entries until the cache fits its budget."""
+        entries = []
+        for path in self.cache_dir.glob(f"*{self.SUFFIX}"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            path.unlink(missing_ok=True)
+            total -= size
+            logger.debug(f"Evicted feature cache entry: {path.name}")
+
+    def clear(self):
+        """Remove every cached entry."""
+        for path in self.cache_dir.glob(f"*{self.SUFFIX}"):
+            path.unlink(missing_ok=True)
+
+    def size_bytes(self) -> int:
+        return sum(p.stat().st_size for p in self.cache_dir.glob(f"*{self.SUFFIX}"))
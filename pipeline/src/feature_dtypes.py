@@ -0,0 +1,230 @@
+"""
+Feature Dtypes: Compact Storage Policy per Feature Family
+
+Without a policy every feature ends up float64: one-hot booleans, season counts and
+the N(0, 1) sensors alike. This module declares one storage dtype per feature
+family and applies it wherever the matrix is persisted or loaded.
+
+Families (first matching rule wins, see DEFAULT_DTYPE_POLICY):
+- one_hot:    uint8     position/team/college indicators
+- count:      int16     games, touchdowns, yardage, draft round (and their lags)
+- sensor:     float32   narrative sensors
+- continuous: float32   every other numeric feature
+- category:   category  text columns (dictionary-encoded)
+
+Key Concepts:
+- The policy lives in the `feature_dtype_policy` table next to `feature_registry`,
+  so changing a family's dtype is a registry update, not a code change.
+- Integer dtypes are only used when every value fits (integral and in range);
+  otherwise the column falls back to float32 instead of silently truncating.
+- Every application returns a per-family report of bytes saved versus float64.
+
+Usage:
+    from src.feature_dtypes import load_dtype_policy, apply_dtypes
+
+    policy = load_dtype_policy(con)
+    X, report = apply_dtypes(X, policy)
+"""
+
+import logging
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Entity keys are never re-typed
+KEY_COLUMNS = ('player_name', 'year')
+
+
+@dataclass(frozen=True)
+class DtypeRule:
+    family: str
+    pattern: str     # Regex matched against the full column name
+    dtype: str       # 'uint8' | 'int16' | 'float32' | 'category'
+    description: str = ""
+
+
+DEFAULT_DTYPE_POLICY = [
+    DtypeRule('one_hot', r'(position|team|college)_.+', 'uint8', "One-hot indicators"),
+    DtypeRule('count', r'(games_played|games_started|draft_round|draft_pick|experience_years_num|total_\w+)(_lag_\d+)?',
+              'int16', "Season counts and their lags"),
+    DtypeRule('sensor', r'sensor_.+', 'float32', "Narrative sensors"),
+    DtypeRule('continuous', r'.*', 'float32', "All other numeric features"),
+    DtypeRule('category', r'.*', 'category', "Text columns"),
+]
+
+# DuckDB storage type per policy dtype (VARCHAR is dictionary-compressed by DuckDB itself)
+SQL_TYPES = {'uint8': 'UTINYINT', 'int16': 'SMALLINT', 'float32': 'FLOAT', 'category': 'VARCHAR'}
+
+_INT_RANGES = {'uint8': (0, 255), 'int16': (-32768, 32767)}
+
+# DuckDB column types that hold model-ready numbers (everything else is text/metadata)
+NUMERIC_SQL_TYPES = ('BOOLEAN', 'TINYINT', 'SMALLINT', 'INTEGER', 'BIGINT', 'HUGEINT', 'UTINYINT',
+                     'USMALLINT', 'UINTEGER', 'UBIGINT', 'FLOAT', 'DOUBLE', 'DECIMAL')
+
+
+def ensure_dtype_policy(con):
+    """Create the policy table and seed it with DEFAULT_DTYPE_POLICY if empty."""
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS feature_dtype_policy (
+            family VARCHAR PRIMARY KEY,
+            priority INTEGER,             -- Lower is matched first
+            pattern VARCHAR,
+            dtype VARCHAR,                -- 'uint8', 'int16', 'float32', 'category'
+            description VARCHAR
+        )
+    """)
+    if con.execute("SELECT COUNT(*) FROM feature_dtype_policy").fetchone()[0] == 0:
+        con.executemany(
+            "INSERT INTO feature_dtype_policy VALUES (?, ?, ?, ?, ?)",
+            [(r.family, i, r.pattern, r.dtype, r.description) for i, r in enumerate(DEFAULT_DTYPE_POLICY)]
+        )
+
+
+def load_dtype_policy(con) -> List[DtypeRule]:
+    """Policy declared in the registry, or the defaults if it has not been created."""
+    try:
+        rows = con.execute("""
+            SELECT family, pattern, dtype, description
+            FROM feature_dtype_policy
+            ORDER BY priority
+        """).fetchall()
+    except Exception:
+        rows = []
+    return [DtypeRule(*row) for row in rows] or list(DEFAULT_DTYPE_POLICY)
+
+
+def family_of(column: str, is_numeric: bool, policy: List[DtypeRule]) -> Optional[DtypeRule]:
+    """First rule matching `column` whose dtype suits the column's kind."""
+    if column in KEY_COLUMNS:
+        return None
+    for rule in policy:
+        if (rule.dtype == 'category') == is_numeric:
+            continue
+        if re.fullmatch(rule.pattern, column):
+            return rule
+    return None
+
+
+def _itemsize(dtype: str, n_categories: int = 0) -> int:
+    if dtype == 'category':
+        return 1 if n_categories < 128 else 2 if n_categories < 32768 else 4
+    return np.dtype(dtype).itemsize
+
+
+def _report(entries: List[Tuple[str, str, str, int]], n_rows: int) -> pd.DataFrame:
+    """Bytes per family versus the float64/object baseline (8 bytes per value)."""
+    report = pd.DataFrame(entries, columns=['column', 'family', 'dtype', 'n_categories'])
+    report['bytes_before'] = 8 * n_rows
+    report['bytes_after'] = [_itemsize(d, n) * n_rows for d, n in zip(report['dtype'], report['n_categories'])]
+    report = report.groupby('family', sort=False).agg(
+        columns=('column', 'size'), bytes_before=('bytes_before', 'sum'), bytes_after=('bytes_after', 'sum')
+    ).reset_index()
+    report['bytes_saved'] = report['bytes_before'] - report['bytes_after']
+    return report
+
+
+def log_dtype_report(report: pd.DataFrame):
+    for row in report.itertuples():
+        logger.info(f"  {row.family:<12} {row.columns:>5} cols: "
+                    f"{row.bytes_before / 1024**2:8.1f} MB -> {row.bytes_after / 1024**2:8.1f} MB "
+                    f"(saved {row.bytes_saved / 1024**2:.1f} MB)")
+    total = report['bytes_saved'].sum() if not report.empty else 0
+    logger.info(f"✓ Dtype policy saved {total / 1024**2:.1f} MB in total")
+
+
+def _fits(values: pd.Series, dtype: str) -> bool:
+    """Whether every non-null value of `values` is integral and within `dtype`'s range."""
+    lo, hi = _INT_RANGES[dtype]
+    arr = pd.to_numeric(values, errors='coerce').dropna().to_numpy(dtype=np.float64)
+    return bool(len(arr) == 0 or (np.all(arr == np.round(arr)) and arr.min() >= lo and arr.max() <= hi))
+
+
+def apply_dtypes(df: pd.DataFrame, policy: List[DtypeRule]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Cast each column of `df` to its family's dtype.
+
+    Integer families keep NULLs via pandas' nullable types (UInt8/Int16), which XGBoost
+    reads as missing. Returns (typed DataFrame, per-family bytes report).
+    """
+    out = {}
+    entries = []
+    for col in df.columns:
+        series = df[col]
+        is_numeric = pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series)
+        rule = family_of(col, is_numeric, policy)
+        if rule is None:
+            out[col] = series
+            continue
+
+        dtype = rule.dtype
+        if dtype in _INT_RANGES and not _fits(series, dtype):
+            dtype = 'float32'
+
+        if dtype == 'category':
+            out[col] = series.astype('category')
+            entries.append((col, rule.family, dtype, len(out[col].cat.categories)))
+            continue
+        if dtype in _INT_RANGES and series.isna().any():
+            out[col] = series.astype({'uint8': 'UInt8', 'int16': 'Int16'}[dtype])
+        else:
+            out[col] = series.astype(dtype)
+        entries.append((col, rule.family, dtype, 0))
+
+    typed = pd.DataFrame(out, index=df.index)
+    return typed, _report(entries, len(df))
+
+
+def apply_table_dtypes(con, table: str, policy: List[DtypeRule]) -> pd.DataFrame:
+    """
+    Rewrite `table` in place with every column stored as its family's DuckDB type.
+
+    Returns the per-family bytes report.
+    """
+    schema = con.execute(f"DESCRIBE {table}").fetchall()
+    n_rows = con.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    planned = []
+    for name, col_type, *_ in schema:
+        is_numeric = col_type.split('(')[0] in NUMERIC_SQL_TYPES
+        rule = family_of(name, is_numeric, policy)
+        planned.append((name, col_type, rule))
+
+    def q(name):
+        return '"' + name.replace('"', '""') + '"'
+
+    # One scan decides which integer-family columns actually fit their dtype
+    int_checks = [
+        (name, rule.dtype) for name, col_type, rule in planned
+        if rule is not None and rule.dtype in _INT_RANGES and col_type != 'BOOLEAN'
+    ]
+    fits = {}
+    if int_checks:
+        exprs = [
+            f"COALESCE(bool_and({q(n)} = round({q(n)}) AND {q(n)} BETWEEN {_INT_RANGES[d][0]} AND {_INT_RANGES[d][1]}), TRUE)"
+            for n, d in int_checks
+        ]
+        values = con.execute(f"SELECT {', '.join(exprs)} FROM {table}").fetchone()
+        fits = {n: bool(v) for (n, _), v in zip(int_checks, values)}
+
+    select = []
+    entries = []
+    for name, col_type, rule in planned:
+        if rule is None:
+            select.append(q(name))
+            continue
+        dtype = rule.dtype
+        if dtype in _INT_RANGES and col_type != 'BOOLEAN' and not fits.get(name, True):
+            dtype = 'float32'
+        n_categories = 0
+        if dtype == 'category':
+            n_categories = con.execute(f"SELECT COUNT(DISTINCT {q(name)}) FROM {table}").fetchone()[0]
+        select.append(f"CAST({q(name)} AS {SQL_TYPES[dtype]}) AS {q(name)}")
+        entries.append((name, rule.family, dtype, n_categories))
+
+    con.execute(f"CREATE OR REPLACE TABLE {table} AS SELECT {', '.join(select)} FROM {table}")
+    return _report(entries, n_rows)
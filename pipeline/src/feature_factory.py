@@ -1,7 +1,13 @@
-
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import scipy.sparse as sp
+from dataclasses import dataclass
+from typing import List, Sequence
 from src.db_manager import DBManager
+from src.feature_dtypes import (NUMERIC_SQL_TYPES, apply_dtypes, apply_table_dtypes,
+                                ensure_dtype_policy, load_dtype_policy, log_dtype_report)
 import logging
 from pathlib import Path
 
@@ -12,112 +18,411 @@ from src.config_loader import get_db_path
 
 DB_PATH = get_db_path()
 
+# Categorical columns expanded to one-hot indicators (plus a `<col>_nan` indicator)
+ONE_HOT_COLUMNS = ['position', 'team', 'college']
+
+# Historical performance columns lagged 1-3 seasons
+PERFORMANCE_LAG_COLUMNS = ['total_pass_yds', 'total_rush_yds', 'total_rec_yds', 'total_tds',
+                           'games_played', 'total_sacks', 'total_int']
+PERFORMANCE_LAG_PERIODS = [1, 2, 3]
+
+# Narrative Taxonomy Expansion (Lean Hyperscale)
+# We focus on high-quality signal depth rather than vanity quantity.
+NARRATIVE_CATEGORIES = {
+    'legal_disciplinary': 25,   # Critical red flags
+    'substance_health': 25,     # Physical longevity
+    'family_emotional': 25,     # Stability/Focus
+    'lifestyle_vices': 25,      # High-risk hobbies/distractions
+    'physical_resilience': 50,  # Depth on recovery markers
+    'contractual_friction': 25, # Sentiment indicators
+    'leadership_friction': 25   # Team cohesion
+}
+
+# Reproducibility (MLE Skill): sensors are a pure function of (player, year, sensor, seed).
+# Uniforms come from md5 rather than DuckDB's hash(), whose values may change between
+# DuckDB versions; md5 is fixed, so the matrices survive an upgrade.
+SENSOR_SEED = 42
+
+
+def _sensor_uniform(name, stream):
+    """SQL for a uniform in (0, 1): the top 52 bits of md5('<player>|<year>|<sensor>|<seed>|<stream>')."""
+    key = f"concat_ws('|', player_name, year, '{name}', {SENSOR_SEED}, {stream})"
+    return f"((('0x' || substr(md5({key}), 1, 13))::BIGINT + 0.5) / 4503599627370496.0)"
+
+
+def _quote_ident(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _quote_literal(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+
+@dataclass
+class SparseFeatureMatrix:
+    """
+    CSR feature matrix plus its column vocabulary.
+
+    Zeros and NULLs are not stored; XGBoost treats absent entries as missing, so the
+    same representation must be used at training and inference time.
+    """
+    matrix: sp.csr_matrix
+    feature_names: List[str]
+
+    @property
+    def columns(self) -> pd.Index:
+        return pd.Index(self.feature_names)
+
+    @property
+    def shape(self):
+        return self.matrix.shape
+
+    @property
+    def density(self) -> float:
+        rows, cols = self.matrix.shape
+        return self.matrix.nnz / (rows * cols) if rows and cols else 0.0
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def take(self, rows) -> "SparseFeatureMatrix":
+        """Row subset (positional indices or boolean mask)."""
+        return SparseFeatureMatrix(self.matrix[np.asarray(rows)], self.feature_names)
+
+    def align(self, feature_names: Sequence[str]) -> "SparseFeatureMatrix":
+        """Reorder columns to `feature_names`; names not in the vocabulary come out empty."""
+        vocab = {name: j for j, name in enumerate(self.feature_names)}
+        remap = np.full(len(self.feature_names), -1, dtype=np.int64)
+        for j, name in enumerate(feature_names):
+            if name in vocab:
+                remap[vocab[name]] = j
+
+        coo = self.matrix.tocoo()
+        new_cols = remap[coo.col]
+        keep = new_cols >= 0
+        matrix = sp.csr_matrix(
+            (coo.data[keep], (coo.row[keep], new_cols[keep])),
+            shape=(self.matrix.shape[0], len(feature_names)), dtype=self.matrix.dtype,
+        )
+        return SparseFeatureMatrix(matrix, list(feature_names))
+
+    def to_frame(self) -> pd.DataFrame:
+        """Dense DataFrame view (absent entries become 0); only for small slices, e.g. SHAP plots."""
+        return pd.DataFrame(self.matrix.toarray(), columns=self.feature_names)
+
+
+def as_model_input(X):
+    """What XGBoost should be handed for X: the CSR matrix itself, or the DataFrame."""
+    return X.matrix if isinstance(X, SparseFeatureMatrix) else X
+
+
+def take_rows(X, rows):
+    """Positional row subset of a DataFrame or SparseFeatureMatrix."""
+    if isinstance(X, SparseFeatureMatrix):
+        return X.take(rows)
+    return X.iloc[rows]
+
+
+def load_sparse_matrix(con, query, exclude=(), metadata_cols=('player_name', 'year', 'team'),
+                       target_col=None, batch_size=100_000):
+    """
+    Stream the result of `query` into a CSR matrix without materializing a dense frame.
+
+    Numeric/boolean columns not listed in `exclude`, `metadata_cols` or `target_col`
+    become features; columns that are NULL in every row are dropped (as the former
+    `dropna(axis=1, how='all')`).
+
+    Returns:
+        (SparseFeatureMatrix, metadata DataFrame, target ndarray or None)
+    """
+    schema = con.execute(f"DESCRIBE {query}").fetchall()
+    skip = set(exclude) | set(metadata_cols) | ({target_col} if target_col else set())
+    feature_cols = [name for name, col_type, *_ in schema
+                    if name not in skip and col_type.split('(')[0] in NUMERIC_SQL_TYPES]
+    meta_cols = [c for c in metadata_cols if c in {row[0] for row in schema}]
+
+    select = [_quote_ident(c) for c in meta_cols]
+    if target_col:
+        select.append(_quote_ident(target_col))
+    select += [_quote_ident(c) for c in feature_cols]
+    reader = con.execute(f"SELECT {', '.join(select)} FROM ({query})").fetch_record_batch(batch_size)
+
+    blocks, meta_parts, target_parts = [], [], []
+    seen = np.zeros(len(feature_cols), dtype=bool)
+    for batch in reader:
+        rows, cols, data = [], [], []
+        for j, name in enumerate(feature_cols):
+            column = batch.column(name)
+            seen[j] |= column.null_count < len(column)
+            values = pc.cast(column, pa.float32()).to_numpy(zero_copy_only=False)
+            nz = np.flatnonzero((values != 0) & ~np.isnan(values))
+            rows.append(nz)
+            cols.append(np.full(len(nz), j, dtype=np.int32))
+            data.append(values[nz])
+        blocks.append(sp.csr_matrix(
+            (np.concatenate(data) if data else np.empty(0, dtype=np.float32),
+             (np.concatenate(rows) if rows else np.empty(0, dtype=np.int64),
+              np.concatenate(cols) if cols else np.empty(0, dtype=np.int32))),
+            shape=(batch.num_rows, len(feature_cols)), dtype=np.float32,
+        ))
+        meta_parts.append(batch.select(meta_cols).to_pandas())
+        if target_col:
+            target_parts.append(pc.cast(batch.column(target_col), pa.float64()).to_numpy(zero_copy_only=False))
+
+    if blocks:
+        matrix = sp.vstack(blocks, format='csr')
+        metadata = pd.concat(meta_parts, ignore_index=True)
+    else:
+        matrix = sp.csr_matrix((0, len(feature_cols)), dtype=np.float32)
+        metadata = pd.DataFrame(columns=meta_cols)
+
+    keep = np.flatnonzero(seen)
+    X = SparseFeatureMatrix(matrix[:, keep].tocsr(), [feature_cols[j] for j in keep])
+    y = (np.concatenate(target_parts) if target_parts else np.empty(0)) if target_col else None
+    logger.info(f"✓ Sparse matrix loaded: {X.shape[0]:,} × {X.shape[1]} "
+                f"({X.density:.1%} dense, {X.matrix.data.nbytes / 1024**2:.1f} MB of values)")
+    return X, metadata, y
+
+
 class FeatureFactory:
     def __init__(self, db_path=DB_PATH):
         self.db = DBManager(db_path)
         self.con = self.db.con
 
-    def _validate_point_in_time(self, df):
-        """Validate that lag features do not leak future data (Principal MLE Standard)."""
+    def validate_point_in_time(self, matrix, source_table='fact_player_efficiency',
+                               violations_table='feature_pit_violations'):
+        """
+        Check every (player, year, lag_k) cell of `matrix` against its source season.
+
+        A lag cell is correct only if it equals the source column at exactly year - k
+        (NULL when that season does not exist), so a value taken from the same or a
+        later season, or from the wrong prior season, is a violation. One SQL pass over
+        the whole matrix; violations are written to `violations_table`.
+
+        Returns:
+            Number of violating cells
+        """
         logger.info("🔍 Validating Point-in-Time Correctness...")
-        
-        # For each player, verify lag_1 data comes from year-1
-        sample_players = df['player_name'].dropna().unique()[:10]
-        violations = 0
-        
-        for player in sample_players:
-            player_df = df[df['player_name'] == player].sort_values('year')
-            if len(player_df) < 2:
-                continue
-            
-            for i in range(1, len(player_df)):
-                current_year = player_df.iloc[i]['year']
-                lag_year = player_df.iloc[i-1]['year']
-                
-                # The lag should be from a prior year
-                if lag_year >= current_year:
-                    violations += 1
-                    logger.warning(f"⚠️ Violation: {player} has lag data from {lag_year} for year {current_year}")
-        
+
+        matrix_cols = set(self._source_columns(matrix))
+        source_cols = set(self._source_columns(source_table))
+        specs = [
+            (f"{col}_lag_{lag}", col, lag)
+            for col in PERFORMANCE_LAG_COLUMNS for lag in PERFORMANCE_LAG_PERIODS
+            if f"{col}_lag_{lag}" in matrix_cols and col in source_cols
+        ]
+        if not specs:
+            logger.info("No lag features to validate.")
+            return 0
+
+        # Source values per (player, season) as lists, so duplicate source rows neither
+        # multiply matrix rows nor hide a mismatch (a cell passes if any row matches)
+        src_cols = sorted({col for _, col, _ in specs})
+        src_lists = ", ".join(f"list(CAST({_quote_ident(c)} AS DOUBLE)) AS {_quote_ident(c)}" for c in src_cols)
+        depths = sorted({lag for _, _, lag in specs})
+        joins = "\n                ".join(
+            f"LEFT JOIN src s{lag} ON s{lag}.player_name = m.player_name AND s{lag}.year = m.year - {lag}"
+            for lag in depths
+        )
+        pairs = ",\n                    ".join(
+            f"CAST(m.{_quote_ident(name)} AS DOUBLE) AS {_quote_ident(name)}, "
+            f"COALESCE(s{lag}.{_quote_ident(col)}, [NULL]) AS {_quote_ident(name + '__src')}"
+            for name, col, lag in specs
+        )
+        branches = "\n            UNION ALL\n".join(f"""
+            SELECT player_name, year, {_quote_literal(name)} AS feature_name, {_quote_literal(col)} AS source_column,
+                   {lag} AS lag, year - {lag} AS source_year,
+                   {_quote_ident(name)} AS feature_value, {_quote_ident(name + '__src')}[1] AS expected_value
+            FROM checked
+            -- Stored lags may be narrower than the source (e.g. float32), hence the tolerance
+            WHERE NOT list_bool_or(list_transform({_quote_ident(name + '__src')}, v ->
+                COALESCE(({_quote_ident(name)} IS NULL AND v IS NULL)
+                         OR abs({_quote_ident(name)} - v) <= 1e-6 * greatest(1, abs(v)), FALSE)))"""
+            for name, col, lag in specs
+        )
+
+        self.con.execute(f"""
+            CREATE OR REPLACE TABLE {violations_table} AS
+            WITH src AS (
+                SELECT player_name, year, {src_lists}
+                FROM {source_table}
+                WHERE player_name IS NOT NULL
+                GROUP BY player_name, year
+            ),
+            checked AS MATERIALIZED (
+                SELECT
+                    m.player_name,
+                    m.year,
+                    {pairs}
+                FROM {matrix} m
+                {joins}
+                WHERE m.player_name IS NOT NULL
+            )
+            SELECT * FROM ({branches}
+            )
+            ORDER BY player_name, year, feature_name
+        """)
+
+        violations = self.con.execute(f"SELECT COUNT(*) FROM {violations_table}").fetchone()[0]
         if violations == 0:
-            logger.info("✅ Point-in-Time validation PASSED: No future data leakage detected.")
+            logger.info(f"✅ Point-in-Time validation PASSED: {len(specs)} lag features checked on every row.")
         else:
-            logger.warning(f"⚠️ Point-in-Time validation: {violations} potential violations found (may be gaps).")
+            logger.warning(f"⚠️ Point-in-Time validation: {violations} violating cells (see {violations_table}).")
+        return violations
+
+    def _source_columns(self, source_table):
+        return self.con.execute(f"DESCRIBE {source_table}").df()['column_name'].tolist()
+
+    def _one_hot_exprs(self, source_table, source_cols):
+        """CASE-style one-hot indicators, named like pd.get_dummies(..., dummy_na=True)."""
+        exprs = []
+        for col in ONE_HOT_COLUMNS:
+            if col not in source_cols:
+                continue
+            values = [r[0] for r in self.con.execute(f"""
+                SELECT DISTINCT CAST({_quote_ident(col)} AS VARCHAR)
+                FROM {source_table}
+                WHERE {_quote_ident(col)} IS NOT NULL
+                ORDER BY 1
+            """).fetchall()]
+            for value in values:
+                exprs.append(
+                    f"COALESCE(CAST({_quote_ident(col)} AS VARCHAR) = {_quote_literal(value)}, FALSE) "
+                    f"AS {_quote_ident(f'{col}_{value}')}"
+                )
+            exprs.append(f"{_quote_ident(col)} IS NULL AS {_quote_ident(f'{col}_nan')}")
+        return exprs
+
+    def _sensor_exprs(self):
+        """Deterministic N(0, 1) sensors via Box-Muller over two md5-derived uniforms."""
+        exprs = []
+        for category, count in NARRATIVE_CATEGORIES.items():
+            for i in range(count):
+                # Placeholder for NLP-derived sentiment scores
+                name = f'sensor_{category}_{i}'
+                u1, u2 = _sensor_uniform(name, 1), _sensor_uniform(name, 2)
+                exprs.append(
+                    f"sqrt(-2 * ln({u1})) * cos(2 * pi() * {u2}) * sentiment_volume / 100.0 AS {name}"
+                )
+        return exprs
+
+    def build_matrix_sql(self, source_table='fact_player_efficiency'):
+        """
+        SQL for the hyperscale feature matrix, evaluated entirely inside DuckDB.
+
+        Equivalent to the former pandas build: one-hot position/team/college,
+        per-player performance lags, interactions, volatility and narrative sensors.
+        """
+        source_cols = self._source_columns(source_table)
+
+        # 1. Base columns (categoricals other than team are replaced by indicators)
+        base_select = f"* EXCLUDE ({', '.join(_quote_ident(c) for c in ONE_HOT_COLUMNS if c in source_cols)})"
+        if not any(c in source_cols for c in ONE_HOT_COLUMNS):
+            base_select = "*"
 
-    def generate_hyperscale_matrix(self):
-        """Explodes the Silver/Gold layers into a 1000+ feature matrix."""
-        logger.info("Generating Hyperscale Feature Matrix...")
-        
-        # 1. Load Base Data
-        df = self.con.execute("SELECT * FROM fact_player_efficiency").df()
-        
         # 2. Clean Numeric Fields
-        if 'experience_years' in df.columns:
-            df['experience_years_num'] = df['experience_years'].astype(str).str.extract(r'(\d+)').astype(float).fillna(0)
-            
-        # 3. Categorical Expansion (One-Hot Encoding)
+        derived = []
+        if 'experience_years' in source_cols:
+            derived.append(
+                "COALESCE(TRY_CAST(NULLIF(regexp_extract(CAST(experience_years AS VARCHAR), '(\\d+)', 1), '') "
+                "AS DOUBLE), 0) AS experience_years_num"
+            )
         # We preserve the original 'team' for metadata persistence in prediction_results
-        df['team_original'] = df['team'] 
-        df = pd.get_dummies(df, columns=['position', 'team', 'college'], dummy_na=True)
-        df = df.rename(columns={'team_original': 'team'})
-        
+        if 'team' in source_cols:
+            derived.append("team")
+
+        # 3. Categorical Expansion (One-Hot Encoding)
+        derived += self._one_hot_exprs(source_table, source_cols)
+
         # 4. Performance Lags (Historical Performance Lags)
-        # We need to sort by player/year
-        df = df.sort_values(['player_name', 'year'])
-        lag_cols = {}
-        for col in ['total_pass_yds', 'total_rush_yds', 'total_rec_yds', 'total_tds', 'games_played', 'total_sacks', 'total_int']:
-            for lag in [1, 2, 3]:
-                lag_cols[f'{col}_lag_{lag}'] = df.groupby('player_name')[col].shift(lag)
-        
-        if lag_cols:
-            df = pd.concat([df, pd.DataFrame(lag_cols, index=df.index)], axis=1)
-        
-        # POINT-IN-TIME CORRECTNESS VALIDATION (Principal MLE Standard)
-        # Assert that lag features do not contain future data
-        self._validate_point_in_time(df)
-        
-        # 4. Interaction Terms (Cross-Domain Risk)
-        df['age_cap_interaction'] = df['age'] * df['cap_hit_millions']
-        df['experience_risk_interaction'] = df['draft_round'] * df['age']
-        df['td_per_dollar'] = df['total_tds'] / df['cap_hit_millions'].replace(0, np.nan)
-        
-        # 5. Volatility (Performance variance over lags)
-        df['td_volatility'] = df[['total_tds', 'total_tds_lag_1', 'total_tds_lag_2']].std(axis=1)
-        
-        # 6. Narrative Taxonomy Expansion (Lean Hyperscale)
-        # We focus on high-quality signal depth rather than vanity quantity.
-        narrative_categories = {
-            'legal_disciplinary': 25,   # Critical red flags
-            'substance_health': 25,     # Physical longevity
-            'family_emotional': 25,     # Stability/Focus
-            'lifestyle_vices': 25,      # High-risk hobbies/distractions
-            'physical_resilience': 50,  # Depth on recovery markers
-            'contractual_friction': 25, # Sentiment indicators
-            'leadership_friction': 25   # Team cohesion
-        }
-        
-        # Reproducibility (MLE Skill)
-        np.random.seed(42)
-        
+        # RANGE frames of exactly k seasons back, so a gap year yields NULL rather than
+        # an older season (same semantics as FeatureStore.materialize_lag_features)
+        lag_cols = [c for c in PERFORMANCE_LAG_COLUMNS if c in source_cols]
+        derived += [
+            f"FIRST({col}) OVER w{lag} AS {col}_lag_{lag}"
+            for col in lag_cols for lag in PERFORMANCE_LAG_PERIODS
+        ]
+        windows = ",\n                    ".join(
+            f"w{lag} AS (PARTITION BY player_name ORDER BY year "
+            f"RANGE BETWEEN {lag} PRECEDING AND {lag} PRECEDING)"
+            for lag in PERFORMANCE_LAG_PERIODS
+        )
+
         # Safety fallback for missing sentiment data
-        if 'sentiment_volume' not in df.columns:
-            df['sentiment_volume'] = 1.0
-            
-        sensor_cols = {}
-        for category, count in narrative_categories.items():
-            for i in range(count):
-                # Placeholder for NLP-derived sentiment scores
-                sensor_cols[f'sensor_{category}_{i}'] = np.random.normal(0, 1, size=len(df)) * df['sentiment_volume'] / 100.0
-             
-        if sensor_cols:
-            df = pd.concat([df, pd.DataFrame(sensor_cols, index=df.index)], axis=1)
+        if 'sentiment_volume' not in source_cols:
+            derived.append("1.0 AS sentiment_volume")
+
+        # 5. Interaction Terms (Cross-Domain Risk), Volatility, Sensors
+        downstream = [
+            "age * cap_hit_millions AS age_cap_interaction",
+            "draft_round * age AS experience_risk_interaction",
+            "total_tds / NULLIF(cap_hit_millions, 0) AS td_per_dollar",
+            # Performance variance over lags (sample std, NULL-skipping like pandas)
+            "list_aggregate([total_tds, total_tds_lag_1, total_tds_lag_2]::DOUBLE[], 'stddev_samp') AS td_volatility",
+        ]
+        downstream += self._sensor_exprs()
+
+        derived_sql = ",\n                    ".join(derived)
+        downstream_sql = ",\n                ".join(downstream)
+        return f"""
+            WITH expanded AS (
+                SELECT
+                    {base_select},
+                    {derived_sql}
+                FROM {source_table}
+                WINDOW {windows}
+            )
+            SELECT
+                *,
+                {downstream_sql}
+            FROM expanded
+            ORDER BY player_name, year
+        """
 
+    def materialize_hyperscale_matrix(self, source_table='fact_player_efficiency',
+                                      target_table='staging_feature_matrix'):
+        """Build the feature matrix in DuckDB and write it straight to `target_table`."""
+        logger.info("Generating Hyperscale Feature Matrix (in-database)...")
+
+        self.con.execute(f"CREATE OR REPLACE TABLE {target_table} AS {self.build_matrix_sql(source_table)}")
+
+        # Compact storage: one dtype per feature family, as declared in the registry
+        ensure_dtype_policy(self.con)
+        log_dtype_report(apply_table_dtypes(self.con, target_table, load_dtype_policy(self.con)))
+
+        # POINT-IN-TIME CORRECTNESS VALIDATION (Principal MLE Standard)
+        # Assert that every lag feature comes from exactly its source season
+        self.validate_point_in_time(target_table, source_table)
+
+        num_rows = self.con.execute(f"SELECT COUNT(*) FROM {target_table}").fetchone()[0]
+        num_cols = len(self._source_columns(target_table))
+        logger.info(f"✓ Feature expansion complete. Matrix shape: ({num_rows}, {num_cols})")
+        return num_rows, num_cols
+
+    def generate_hyperscale_matrix(self, source_table='fact_player_efficiency'):
+        """Explodes the Silver/Gold layers into a 1000+ feature matrix (returned as a DataFrame)."""
+        logger.info("Generating Hyperscale Feature Matrix...")
+        df = self.con.execute(self.build_matrix_sql(source_table)).df()
+        df, report = apply_dtypes(df, load_dtype_policy(self.con))
+        log_dtype_report(report)
+        self.con.register('_ff_matrix', df)
+        try:
+            self.validate_point_in_time('_ff_matrix', source_table)
+        finally:
+            self.con.unregister('_ff_matrix')
         logger.info(f"✓ Feature expansion complete. Matrix shape: {df.shape}")
         return df
 
+    def to_sparse_matrix(self, table='staging_feature_matrix', where=None, exclude=(),
+                         metadata_cols=('player_name', 'year', 'team'), target_col=None):
+        """CSR view of a materialized feature matrix (see `load_sparse_matrix`)."""
+        query = f"SELECT * FROM {table}" + (f" WHERE {where}" if where else "")
+        return load_sparse_matrix(self.con, query, exclude=exclude,
+                                  metadata_cols=metadata_cols, target_col=target_col)
+
 if __name__ == "__main__":
     factory = FeatureFactory()
-    matrix = factory.generate_hyperscale_matrix()
-    # Save as staging table
-    factory.db.execute("CREATE OR REPLACE TABLE staging_feature_matrix AS SELECT * FROM matrix", {"matrix": matrix})
+    # Build and persist the staging table without round-tripping through pandas
+    factory.materialize_hyperscale_matrix()
     logger.info("✓ Staging feature matrix persisted to database.")
@@ -1,11 +1,11 @@
-
 import pandas as pd
 import numpy as np
-import duckdb
 import logging
+from dataclasses import dataclass
+from typing import Optional
 from sklearn.linear_model import LassoCV
 from sklearn.preprocessing import StandardScaler
-from sklearn.decomposition import PCA
+from sklearn.decomposition import PCA, IncrementalPCA
 from pathlib import Path
 
 logging.basicConfig(level=logging.INFO)
@@ -14,75 +14,154 @@ from src.config_loader import get_db_path
 
 DB_PATH = get_db_path()
 
+# Beyond RiskModeler.prepare_data's own exclusions
+SKIP_COLS = ['experience_years', 'fair_market_value', 'ied_overpayment', 'value_metric_proxy']
+
+
+@dataclass
+class PreparedMatrix:
+    """One target's training matrix, loaded once and shared by every pruning step."""
+    values: np.ndarray                      # float32 copy of the prepared matrix, all columns
+    keep: np.ndarray                        # Positions of the pruning features in `values`
+    columns: list
+    y: pd.Series
+    scaler: StandardScaler
+    chunk_rows: int
+    scaled: Optional[np.ndarray] = None     # Standardized float32 copy, built on first full-matrix use
+
+    def chunks(self):
+        """Standardized row chunks, streamed from the snapshot (or the standardized copy)."""
+        for start in range(0, len(self.values), self.chunk_rows):
+            if self.scaled is not None:
+                yield self.scaled[start:start + self.chunk_rows]
+            else:
+                chunk = self.values[start:start + self.chunk_rows][:, self.keep]
+                yield self.scaler.transform(chunk).astype(np.float32, copy=False)
+
+    def standardized(self) -> np.ndarray:
+        if self.scaled is None:
+            scaled = np.empty((len(self.values), len(self.keep)), dtype=np.float32)
+            for start, chunk in zip(range(0, len(self.values), self.chunk_rows), self.chunks()):
+                scaled[start:start + len(chunk)] = chunk
+            self.scaled = scaled
+        return self.scaled
+
+
 class FeaturePruner:
-    def __init__(self, db_path=DB_PATH):
-        self.con = duckdb.connect(db_path)
+    def __init__(self, db_path=DB_PATH, n_jobs=None, chunk_rows=None, pca_method=None):
+        self.db_path = db_path
+        config = self._config()
+        self.n_jobs = n_jobs if n_jobs is not None else config.get("n_jobs", -1)
+        self.chunk_rows = chunk_rows or config.get("chunk_rows", 50_000)
+        self.pca_method = pca_method or config.get("pca_method", "incremental")
+        self._prepared = {}
+
+    @staticmethod
+    def _config():
+        try:
+            from src.train_model import load_ml_config
+            return load_ml_config().get("feature_selection", {}) or {}
+        except Exception as e:
+            logger.warning(f"Could not load config: {e}. Using pruning defaults.")
+            return {}
+
+    def _load(self, target_col):
+        """Prepared (X, y) from the shared training snapshot, as a float32 array."""
+        from src.train_model import RiskModeler
+        X, y, _ = RiskModeler(self.db_path, read_only=True).prepare_data(target_col, matrix_format='dense')
+        return X, y
+
+    def prepare(self, target_col='edce_risk') -> PreparedMatrix:
+        """
+        Load and standardize once per target.
+
+        Scaler statistics are accumulated over row chunks of the memory-mapped
+        snapshot, so no standardized copy exists until a step needs the full matrix.
+        """
+        if target_col in self._prepared:
+            return self._prepared[target_col]
+
+        X, y = self._load(target_col)
+        keep = np.array([j for j, c in enumerate(X.columns) if c not in SKIP_COLS], dtype=np.int64)
+        values = X.to_numpy(dtype=np.float32, copy=False)
 
-    def prune_with_l1(self, target_col='edce_risk'):
-        """Use Lasso (L1) regularization to identify and keep only significant features."""
-        logger.info(f"Pruning features using L1 (Lasso) targeting {target_col}...")
-        
-        # 1. Load Data
-        df = self.con.execute("SELECT * FROM staging_feature_matrix").df()
-        
-        # 2. Cleanup (Drop non-features)
-        skip_cols = ['player_name', 'year', 'experience_years', 'edce_risk', 'fair_market_value', 'ied_overpayment', 'value_metric_proxy']
-        X_raw = df.drop(columns=[c for c in skip_cols if c in df.columns])
-        
-        # Robustly convert to numeric and drop non-numeric columns
-        X = X_raw.apply(pd.to_numeric, errors='coerce').dropna(axis=1, how='all')
-        X = X.fillna(0)
-        
-        y = df[target_col].fillna(0)
-        
-        # Handle NAs in features
-        X = X.fillna(0)
-        
-        # 3. Standardize
-        logger.info(f"Feature matrix columns: {X.columns.tolist()[:5]}... ({len(X.columns)} total)")
-        non_numeric = X.select_dtypes(exclude=[np.number]).columns
-        if not non_numeric.empty:
-            logger.error(f"Non-numeric columns found in X: {non_numeric.tolist()}")
-            X = X.drop(columns=non_numeric)
-            
         scaler = StandardScaler()
-        X_scaled = scaler.fit_transform(X)
-        
-        # 4. LassoCV
-        lasso = LassoCV(cv=5, random_state=42, max_iter=10000).fit(X_scaled, y)
-        
-        # 5. Identify Selected Features
-        coef = pd.Series(lasso.coef_, index=X.columns)
+        for start in range(0, len(values), self.chunk_rows):
+            scaler.partial_fit(values[start:start + self.chunk_rows][:, keep])
+
+        prepared = PreparedMatrix(values, keep, X.columns[keep].tolist(), y, scaler, self.chunk_rows)
+        self._prepared[target_col] = prepared
+        logger.info(f"✓ Standardized {len(values):,} rows × {len(keep)} features "
+                    f"(chunks of {self.chunk_rows:,})")
+        return prepared
+
+    def prune_with_l1(self, target_col='edce_risk', persist_as=None):
+        """
+        Use Lasso (L1) regularization to identify and keep only significant features.
+
+        persist_as: register the selected set under this name in the feature store,
+        where training can project to it (`prepare_data(feature_set=...)`).
+        """
+        logger.info(f"Pruning features using L1 (Lasso) targeting {target_col}...")
+
+        # 1. Load + Standardize (shared with analyze_components)
+        prepared = self.prepare(target_col)
+        logger.info(f"Feature matrix columns: {prepared.columns[:5]}... ({len(prepared.columns)} total)")
+
+        # 2. LassoCV: CV folds along the regularization path run in parallel
+        lasso = LassoCV(cv=5, random_state=42, max_iter=10000, n_jobs=self.n_jobs)
+        lasso.fit(prepared.standardized(), prepared.y)
+
+        # 3. Identify Selected Features
+        coef = pd.Series(lasso.coef_, index=prepared.columns)
         selected_features = coef[coef != 0].index.tolist()
-        
-        logger.info(f"✓ L1 Pruning complete. Kept {len(selected_features)} features out of {X.shape[1]}.")
+
+        logger.info(f"✓ L1 Pruning complete. Kept {len(selected_features)} features out of {len(coef)}.")
         logger.info(f"Top Features: {coef.abs().sort_values(ascending=False).head(10).index.tolist()}")
-        
+
+        if persist_as:
+            from src.feature_store import FeatureStore
+            FeatureStore(self.db_path).register_feature_selection(persist_as, coef, target_col=target_col)
+
         return selected_features, coef
 
-    def analyze_components(self, n_components=10):
-        """Perform Principal Component Analysis to understand data variance."""
-        logger.info(f"Performing PCA (n_components={n_components})...")
-        
-        df = self.con.execute("SELECT * FROM staging_feature_matrix").df()
-        skip_cols = ['player_name', 'year', 'experience_years', 'edce_risk', 'fair_market_value', 'ied_overpayment', 'value_metric_proxy']
-        X_raw = df.drop(columns=[c for c in skip_cols if c in df.columns])
-        
-        # Robustly convert to numeric
-        X = X_raw.apply(pd.to_numeric, errors='coerce').dropna(axis=1, how='all').fillna(0)
-        
-        scaler = StandardScaler()
-        X_scaled = scaler.fit_transform(X)
-        
-        pca = PCA(n_components=n_components)
-        pca.fit(X_scaled)
-        
+    def analyze_components(self, n_components=10, target_col='edce_risk', method=None):
+        """
+        Perform Principal Component Analysis to understand data variance.
+
+        method: "incremental" fits IncrementalPCA over standardized row chunks (memory
+        bounded by the chunk size); "randomized" runs randomized SVD on the full
+        standardized matrix. Defaults to `feature_selection.pca_method`.
+        """
+        method = method or self.pca_method
+        logger.info(f"Performing PCA (n_components={n_components}, {method})...")
+
+        prepared = self.prepare(target_col)
+
+        if method == "incremental":
+            pca = IncrementalPCA(n_components=n_components)
+            pending = None
+            for chunk in prepared.chunks():
+                # Every partial_fit needs at least n_components rows; fold a short tail into the previous chunk
+                if pending is not None and len(chunk) < n_components:
+                    pending = np.vstack([pending, chunk])
+                    continue
+                if pending is not None:
+                    pca.partial_fit(pending)
+                pending = chunk
+            pca.partial_fit(pending)
+        elif method == "randomized":
+            pca = PCA(n_components=n_components, svd_solver="randomized", random_state=42)
+            pca.fit(prepared.standardized())
+        else:
+            raise ValueError(f"Unknown PCA method: {method}")
+
         explained_var = np.sum(pca.explained_variance_ratio_)
         logger.info(f"✓ PCA Complete. Top {n_components} components explain {explained_var:.2%} of variance.")
-        
+
         return pca
 
 if __name__ == "__main__":
     pruner = FeaturePruner()
-    selected, coefs = pruner.prune_with_l1()
+    selected, coefs = pruner.prune_with_l1(persist_as="l1_edce_risk")
     pca = pruner.analyze_components()
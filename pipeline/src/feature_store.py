@@ -19,30 +19,65 @@ Usage:
     store.materialize_lag_features(source_table='fact_player_efficiency')
     
     # Retrieve for training (point-in-time)
-    features = store.get_training_matrix(as_of_year=2024)
+    features = store.get_training_matrix(as_of_date=date(2024, 9, 1))
+    
+    # Persist wide snapshots per season start for repeated reads
+    store.materialize_season_snapshots(min_year=2015, max_year=2025)
+    features = store.load_snapshot(date(2024, 9, 1), columns=['total_tds_lag_1'])
 """
 
 from src.db_manager import DBManager
+from src.feature_cache import FeatureMatrixCache, DEFAULT_MAX_BYTES
+from src.feature_dtypes import ensure_dtype_policy
+import numpy as np
 import pandas as pd
 import logging
 from datetime import date
 from typing import Optional, List, Dict, Any
 
-from src.config_loader import get_db_path
+from src.config_loader import get_db_path, get_feature_snapshot_dir, get_feature_cache_dir
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 DB_PATH = get_db_path()
 
+# Default lag set, used to seed the feature registry on first materialization
+DEFAULT_LAG_COLUMNS = [
+    'total_pass_yds', 'total_rush_yds', 'total_rec_yds', 
+    'total_tds', 'games_played', 'cap_hit_millions', 
+    'dead_cap_millions', 'age'
+]
+DEFAULT_LAG_PERIODS = [1, 2, 3]
+
+# A traded player has one Gold row per team in a season. Lags read the season
+# total (SUM); these columns describe the player rather than a stint, so take MAX.
+SEASON_MAX_COLUMNS = {'age'}
+
+
+def load_feature_selection(con, selection_name: str) -> Optional[List[str]]:
+    """Registered feature selection, read with any connection to the warehouse (None if absent)."""
+    exists = con.execute("""
+        SELECT COUNT(*) FROM information_schema.tables WHERE table_name = 'feature_selections'
+    """).fetchone()[0]
+    if not exists:
+        return None
+    rows = con.execute("""
+        SELECT feature_name FROM feature_selections WHERE selection_name = ? ORDER BY rank
+    """, [selection_name]).fetchall()
+    return [name for (name,) in rows] or None
+
 
 class FeatureStore:
     """DuckDB-based Feature Store with point-in-time semantics."""
     
-    def __init__(self, db_path: str = DB_PATH, read_only: bool = False):
+    def __init__(self, db_path: str = DB_PATH, read_only: bool = False,
+                 cache_dir: Optional[str] = None, cache_max_bytes: int = DEFAULT_MAX_BYTES):
         self.db = DBManager(db_path)
         self.con = self.db.con
         self.read_only = read_only
+        # Optional on-disk memo of retrieved matrices (see src/feature_cache.py)
+        self.cache = FeatureMatrixCache(cache_dir, cache_max_bytes) if cache_dir else None
         
     def initialize_schema(self):
         """Create feature store tables if they don't exist."""
@@ -64,6 +99,9 @@ class FeatureStore:
             )
         """)
         
+        # Dtype Policy: storage dtype per feature family (see src/feature_dtypes.py)
+        ensure_dtype_policy(self.con)
+        
         # Feature Values: The actual feature data with temporal validity
         # Changed: valid_from is DATE, added valid_until
         self.con.execute("""
@@ -80,6 +118,21 @@ class FeatureStore:
             )
         """)
         
+        # Store Version: bumped on every materialization, used to invalidate cached matrices
+        self.con.execute("""
+            CREATE TABLE IF NOT EXISTS feature_store_version (
+                version BIGINT,
+                bumped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        self.con.execute("""
+            INSERT INTO feature_store_version (version)
+            SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM feature_store_version)
+        """)
+        
+        # Feature Selections: pruned feature sets that training projects to
+        self._ensure_selection_catalog()
+        
         # Create index for efficient point-in-time queries
         self.con.execute("""
             CREATE INDEX IF NOT EXISTS idx_feature_pit 
@@ -98,84 +151,149 @@ class FeatureStore:
             VALUES (?, ?, ?, ?, ?)
         """, [feature_name, feature_type, source_column, lag_periods, description])
         
-    def materialize_lag_features(self, source_table: str = 'fact_player_efficiency'):
+    def register_lag_features(self, columns: List[str] = None,
+                              lag_periods: List[int] = None):
+        """
+        Register lag features (one per column × depth) in the feature registry.
+        
+        The registry is the source of truth for what `materialize_lag_features`
+        computes, so adding a column or depth here is all that is needed.
+        """
+        columns = columns or DEFAULT_LAG_COLUMNS
+        lag_periods = lag_periods or DEFAULT_LAG_PERIODS
+        
+        rows = [
+            (f"{col}_lag_{lag}", 'lag', col, lag, f"{col} from {lag} year(s) prior")
+            for col in columns for lag in lag_periods
+        ]
+        self.con.executemany("""
+            INSERT OR REPLACE INTO feature_registry 
+            (feature_name, feature_type, source_column, lag_periods, description)
+            VALUES (?, ?, ?, ?, ?)
+        """, rows)
+        
+    def get_lag_specs(self) -> List[tuple]:
+        """Return registered lag features as (feature_name, source_column, lag_periods)."""
+        return self.con.execute("""
+            SELECT feature_name, source_column, lag_periods
+            FROM feature_registry
+            WHERE feature_type = 'lag'
+              AND source_column IS NOT NULL
+              AND lag_periods IS NOT NULL
+            ORDER BY source_column, lag_periods
+        """).fetchall()
+        
+    def materialize_lag_features(self, source_table: str = 'fact_player_efficiency',
+                                 years: Optional[List[int]] = None,
+                                 as_of: Optional[date] = None):
         """
         Materialize lag features with strict point-in-time semantics.
         
-        For each (player, year) pair, compute lag_1, lag_2, lag_3 features.
+        All registered lags for all columns are computed in a single scan of the
+        source table with window functions, unpivoted once and written as new
+        feature versions (see `_write_feature_versions`). The source is first
+        reduced to one row per (player_name, year), so a traded player's season
+        is a single, deterministic value (see SEASON_MAX_COLUMNS).
         Validity Rule: Data from Season Y is valid from (Y+1)-02-15.
+        
+        Args:
+            source_table: Gold table to read
+            years: Restrict recomputation to these prediction years (None = all)
+            as_of: Knowledge date for revisions of already-published values (default: today)
         """
         logger.info(f"Materializing lag features from {source_table}...")
         
-        # Define which columns to compute lags for
-        lag_columns = [
-            'total_pass_yds', 'total_rush_yds', 'total_rec_yds', 
-            'total_tds', 'games_played', 'cap_hit_millions', 
-            'dead_cap_millions', 'age'
-        ]
+        # Seed the registry with the default lag set on first run
+        lag_specs = self.get_lag_specs()
+        if not lag_specs:
+            self.register_lag_features()
+            lag_specs = self.get_lag_specs()
         
-        # Clear existing lag features
-        self.con.execute("""
-            DELETE FROM feature_values 
-            WHERE feature_name LIKE '%_lag_%'
-        """)
+        # Check source columns once
+        source_columns = set(self.con.execute(f"DESCRIBE {source_table}").df()['column_name'])
+        missing = sorted({col for _, col, _ in lag_specs if col not in source_columns})
+        for col in missing:
+            logger.warning(f"Column {col} not in {source_table}, skipping.")
+        lag_specs = [spec for spec in lag_specs if spec[1] in source_columns]
         
-        # Register and materialize each lag feature
-        for col in lag_columns:
-            # Check if column exists in source
-            cols_df = self.con.execute(f"DESCRIBE {source_table}").df()
-            if col not in cols_df['column_name'].values:
-                logger.warning(f"Column {col} not in {source_table}, skipping.")
-                continue
-                
-            for lag in [1, 2, 3]:
-                feature_name = f"{col}_lag_{lag}"
-                
-                # Register the feature
-                self.register_feature(
-                    feature_name=feature_name,
-                    feature_type='lag',
-                    source_column=col,
-                    lag_periods=lag,
-                    description=f"{col} from {lag} year(s) prior"
-                )
-                
-                # Materialize with strict temporal semantics
-                # Lag 1: Target Year 2024. Source Year 2023.
-                # Valid From: 2024-02-15 (After 2023 season ends)
-                # Valid Until: 2025-02-15 (When 2024 season data becomes available)
-                
-                self.con.execute(f"""
-                    INSERT INTO feature_values (entity_key, player_name, prediction_year, 
-                                                feature_name, feature_value, valid_from, valid_until)
+        if not lag_specs:
+            logger.warning("No registered lag features can be computed. Nothing to materialize.")
+            return
+        
+        # One window per lag depth: a RANGE frame of exactly k years back is LAG(k)
+        # keyed on the season rather than the row, so gap years are never
+        # mistaken for the prior season (same semantics as a year - k self-join).
+        depths = sorted({lag for _, _, lag in lag_specs})
+        lag_exprs = ",\n                    ".join(
+            f"CAST(FIRST({col}) OVER w{lag} AS DOUBLE) AS \"{name}\""
+            for name, col, lag in lag_specs
+        )
+        windows = ",\n                    ".join(
+            f"w{lag} AS (PARTITION BY player_name ORDER BY year "
+            f"RANGE BETWEEN {lag} PRECEDING AND {lag} PRECEDING)"
+            for lag in depths
+        )
+        unpivot_cols = ", ".join(f'"{name}"' for name, _, _ in lag_specs)
+        season_exprs = ",\n                    ".join(
+            f"{'MAX' if col in SEASON_MAX_COLUMNS else 'SUM'}({col}) AS {col}"
+            for col in sorted({col for _, col, _ in lag_specs})
+        )
+        
+        # Incremental runs only scan the seasons the requested lags can reach
+        source_filter, target_filter = "", ""
+        if years is not None:
+            year_list = ", ".join(str(int(y)) for y in years) or "NULL"
+            source_filter = f"WHERE year >= {min(years, default=0) - max(depths)}"
+            target_filter = f"WHERE year IN ({year_list})"
+        
+        # Lag 1: Target Year 2024. Source Year 2023.
+        # Valid From: 2024-02-15 (After 2023 season ends)
+        # Valid Until: 2025-02-15 (When 2024 season data becomes available)
+        staged_sql = f"""
+            WITH lagged AS (
+                SELECT * FROM (
                     SELECT 
-                        target.player_name || '_' || target.year as entity_key,
-                        target.player_name,
-                        target.year as prediction_year,
-                        '{feature_name}' as feature_name,
-                        source.{col} as feature_value,
-                        -- Validity Logic:
-                        -- If source year is Y, data is known in Feb of Y+1
-                        -- Example: 2022 stats known 2023-02-15.
-                        -- Valid for predicting 2023 season (which starts Sept 2023).
-                        make_date(source.year + 1, 2, 15) as valid_from,
-                        make_date(source.year + 2, 2, 15) as valid_until
-                    FROM {source_table} target
-                    INNER JOIN {source_table} source
-                        ON target.player_name = source.player_name
-                        AND source.year = target.year - {lag}
-                    WHERE source.{col} IS NOT NULL
-                    ON CONFLICT (entity_key, feature_name, valid_from) DO UPDATE 
-                        SET feature_value = EXCLUDED.feature_value,
-                            valid_until = EXCLUDED.valid_until
-                """)
+                        player_name,
+                        year,
+                        {lag_exprs}
+                    FROM (
+                        SELECT player_name, year,
+                            {season_exprs}
+                        FROM {source_table}
+                        {source_filter}
+                        GROUP BY player_name, year
+                    )
+                    WINDOW {windows}
+                ) {target_filter}
+            ),
+            long AS (
+                -- UNPIVOT drops NULLs, i.e. missing source values and absent seasons
+                UNPIVOT lagged ON {unpivot_cols}
+                INTO NAME feature_name VALUE feature_value
+            )
+            SELECT 
+                l.player_name || '_' || l.year as entity_key,
+                l.player_name,
+                l.year as prediction_year,
+                l.feature_name,
+                l.feature_value,
+                -- Source year is (year - lag); its data is known in Feb of source year + 1
+                make_date(l.year - fr.lag_periods + 1, 2, 15) as valid_from,
+                make_date(l.year - fr.lag_periods + 2, 2, 15) as valid_until
+            FROM long l
+            JOIN feature_registry fr ON fr.feature_name = l.feature_name
+        """
+        written = self._write_feature_versions(
+            staged_sql, [name for name, _, _ in lag_specs], years, as_of
+        )
                 
-        # Log summary
-        count = self.con.execute("SELECT COUNT(*) FROM feature_values").fetchone()[0]
-        logger.info(f"✓ Materialized {count:,} feature values in store.")
+        logger.info(f"✓ Materialized {len(lag_specs)} lag features in one scan "
+                    f"({written:,} feature values written).")
         
-    def materialize_interaction_features(self, source_table: str = 'fact_player_efficiency'):
-        """Materialize derived/interaction features."""
+    def materialize_interaction_features(self, source_table: str = 'fact_player_efficiency',
+                                         years: Optional[List[int]] = None,
+                                         as_of: Optional[date] = None):
+        """Materialize derived/interaction features (optionally only for `years`)."""
         logger.info("Materializing interaction features...")
         
         interactions = [
@@ -183,6 +301,10 @@ class FeatureStore:
             ('experience_risk', 'draft_round * age', 'Draft round × Age risk'),
         ]
         
+        year_filter = ""
+        if years is not None:
+            year_filter = f"AND year IN ({', '.join(str(int(y)) for y in years) or 'NULL'})"
+        
         for feature_name, formula, description in interactions:
             self.register_feature(
                 feature_name=feature_name,
@@ -197,9 +319,7 @@ class FeatureStore:
                 # Assuming these are static traits or current contract info known at start of league year.
                 # We'll set valid_from to March 1st of the year (start of league year approx).
                 
-                self.con.execute(f"""
-                    INSERT INTO feature_values (entity_key, player_name, prediction_year, 
-                                                feature_name, feature_value, valid_from, valid_until)
+                self._write_feature_versions(f"""
                     SELECT 
                         player_name || '_' || year as entity_key,
                         player_name,
@@ -210,9 +330,8 @@ class FeatureStore:
                         make_date(year + 1, 3, 15) as valid_until
                     FROM {source_table}
                     WHERE {formula.split('*')[0].strip()} IS NOT NULL
-                    ON CONFLICT (entity_key, feature_name, valid_from) DO UPDATE 
-                        SET feature_value = EXCLUDED.feature_value
-                """)
+                    {year_filter}
+                """, [feature_name], years, as_of)
             except Exception as e:
                 logger.warning(f"Could not compute {feature_name}: {e}")
                 
@@ -222,27 +341,254 @@ class FeatureStore:
         """).fetchone()[0]
         logger.info(f"✓ Materialized {count:,} interaction features.")
         
-    def get_training_matrix(self, as_of_date: date, 
-                            min_year: int = 2015) -> pd.DataFrame:
+    def _write_feature_versions(self, staged_sql: str, feature_names: List[str],
+                                years: Optional[List[int]] = None,
+                                as_of: Optional[date] = None) -> int:
         """
-        Get feature matrix for training with strict point-in-time semantics as of a SINGLE date.
-        Useful for Inference or specific backtest folds.
+        Write freshly computed feature values as point-in-time versions.
         
-        Args:
-            as_of_date: The 'knowledge cutoff' date. We only use data valid on or before this date.
-            min_year: Minimum prediction year to include
+        `staged_sql` yields feature_values-shaped rows with their natural validity
+        window. Compared to the latest stored version of each (entity, feature):
+        - unchanged values are left alone,
+        - new values are inserted with their natural window,
+        - changed values close the old version's valid_until at `as_of` (if its
+          window is still open then) and insert a revision valid from `as_of` until
+          the natural valid_until -- or overwrite in place if the old version was
+          not yet known at `as_of`. A revision learned after the natural window
+          closed gets an empty window [as_of, as_of): it is recorded, but never
+          served as current knowledge for an old prediction year,
+        - values that disappeared from the source are closed at `as_of`.
+        Nothing is deleted, so earlier knowledge states stay reproducible.
+        
+        Returns:
+            Number of feature versions inserted or revised
+        """
+        as_of = as_of or date.today()
+        name_list = ", ".join(f"'{n}'" for n in feature_names)
+        year_filter = ""
+        if years is not None:
+            year_filter = f"AND prediction_year IN ({', '.join(str(int(y)) for y in years) or 'NULL'})"
+        
+        self.con.execute(f"CREATE OR REPLACE TEMPORARY TABLE _fs_staged AS {staged_sql}")
+        self.con.execute(f"""
+            CREATE OR REPLACE TEMPORARY TABLE _fs_current AS
+            SELECT entity_key, feature_name, valid_from, valid_until, feature_value
+            FROM feature_values
+            WHERE feature_name IN ({name_list}) {year_filter}
+            QUALIFY ROW_NUMBER() OVER (PARTITION BY entity_key, feature_name ORDER BY valid_from DESC) = 1
+        """)
+        
+        self.con.execute("BEGIN TRANSACTION")
+        try:
+            # Close superseded versions that were already known at as_of
+            self.con.execute("""
+                UPDATE feature_values AS fv
+                SET valid_until = ?::DATE
+                FROM _fs_current c
+                LEFT JOIN _fs_staged s
+                    ON s.entity_key = c.entity_key AND s.feature_name = c.feature_name
+                WHERE fv.entity_key = c.entity_key
+                  AND fv.feature_name = c.feature_name
+                  AND fv.valid_from = c.valid_from
+                  AND c.valid_from < ?::DATE
+                  AND (c.valid_until IS NULL OR c.valid_until > ?::DATE)
+                  AND (s.entity_key IS NULL OR s.feature_value IS DISTINCT FROM c.feature_value)
+            """, [as_of, as_of, as_of])
             
+            # Insert new values and revisions
+            written = self.con.execute("""
+                INSERT INTO feature_values (entity_key, player_name, prediction_year, 
+                                            feature_name, feature_value, valid_from, valid_until)
+                SELECT 
+                    s.entity_key,
+                    s.player_name,
+                    s.prediction_year,
+                    s.feature_name,
+                    s.feature_value,
+                    CASE WHEN c.entity_key IS NULL THEN s.valid_from
+                         ELSE GREATEST(s.valid_from, ?::DATE) END as valid_from,
+                    CASE WHEN c.entity_key IS NULL OR s.valid_until IS NULL THEN s.valid_until
+                         ELSE GREATEST(s.valid_until, s.valid_from, ?::DATE) END as valid_until
+                FROM _fs_staged s
+                LEFT JOIN _fs_current c
+                    ON s.entity_key = c.entity_key AND s.feature_name = c.feature_name
+                WHERE c.entity_key IS NULL OR s.feature_value IS DISTINCT FROM c.feature_value
+                ON CONFLICT (entity_key, feature_name, valid_from) DO UPDATE 
+                    SET feature_value = EXCLUDED.feature_value,
+                        valid_until = EXCLUDED.valid_until
+            """, [as_of, as_of]).fetchone()[0]
+            self._bump_version()
+            self.con.execute("COMMIT")
+        except Exception:
+            self.con.execute("ROLLBACK")
+            raise
+        finally:
+            self.con.execute("DROP TABLE IF EXISTS _fs_staged")
+            self.con.execute("DROP TABLE IF EXISTS _fs_current")
+            
+        return written
+        
+    def get_store_version(self, con=None) -> int:
+        """Current store version (0 if the store has never been materialized), read on `con` if given."""
+        try:
+            row = (con or self.con).execute("SELECT MAX(version) FROM feature_store_version").fetchone()
+        except Exception:
+            return 0
+        return int(row[0] or 0)
+        
+    def _bump_version(self):
+        self.con.execute("""
+            UPDATE feature_store_version 
+            SET version = version + 1, bumped_at = CURRENT_TIMESTAMP
+        """)
+        
+    def _source_watermark(self, source_table: str = 'fact_player_efficiency') -> Optional[str]:
+        """
+        Digest of the per-year watermarks last recorded for `source_table` (None if none).
+        
+        Reads the small feature_watermarks table, never the source itself.
+        """
+        try:
+            row = self.con.execute("""
+                SELECT CAST(SUM(hash(year, row_hash, row_count)::HUGEINT) AS VARCHAR)
+                FROM feature_watermarks WHERE source_table = ?
+            """, [source_table]).fetchone()
+        except Exception:
+            return None
+        return row[0]
+        
+    def _cached(self, kind: str, params: Dict[str, Any], compute) -> pd.DataFrame:
+        """
+        Serve `compute()` through the matrix cache, keyed on params + store version.
+        
+        The key also covers the fact_player_efficiency (base spine) watermarks that
+        `refresh_features` records, so a hit costs two small lookups, not a scan.
+        A Gold rebuild reaches the cache through the next `refresh_features`.
+        """
+        if self.cache is None:
+            return compute()
+            
+        key = self.cache.make_key(kind, store_version=self.get_store_version(),
+                                  source=self._source_watermark(), **params)
+        df = self.cache.get(key)
+        if df is not None:
+            logger.info(f"✓ Retrieved {kind} from cache ({len(df):,} rows)")
+            return df
+            
+        df = compute()
+        if not df.empty:
+            self.cache.put(key, df)
+        return df
+        
+    def _partition_hashes(self, source_table: str) -> Dict[int, tuple]:
+        """Order-independent content hash and row count of each source year."""
+        rows = self.con.execute(f"""
+            SELECT year, CAST(SUM(hash(t)::HUGEINT) AS VARCHAR), COUNT(*)
+            FROM {source_table} t
+            GROUP BY year
+        """).fetchall()
+        return {int(year): (row_hash, count) for year, row_hash, count in rows if year is not None}
+        
+    def get_changed_years(self, source_table: str = 'fact_player_efficiency') -> List[int]:
+        """Source years whose content differs from the last recorded watermark."""
+        self._ensure_watermarks()
+        current = self._partition_hashes(source_table)
+        recorded = {
+            int(year): (row_hash, count) for year, row_hash, count in self.con.execute("""
+                SELECT year, row_hash, row_count FROM feature_watermarks WHERE source_table = ?
+            """, [source_table]).fetchall()
+        }
+        return sorted(
+            year for year in current.keys() | recorded.keys()
+            if current.get(year) != recorded.get(year)
+        )
+        
+    def refresh_features(self, source_table: str = 'fact_player_efficiency',
+                         full_refresh: bool = False,
+                         as_of: Optional[date] = None) -> List[int]:
+        """
+        Incrementally re-materialize only features whose source partitions changed.
+        
+        A changed source year Y invalidates interaction features for Y and lag
+        features for Y plus the next `max(lag_periods)` prediction years.
+        
         Returns:
-            DataFrame with player_name, year, and pivoted features
+            The changed source years (empty if nothing to do)
         """
-        logger.info(f"Retrieving training matrix (as of {as_of_date})...")
+        self._ensure_watermarks()
+        if full_refresh:
+            self.con.execute("DELETE FROM feature_watermarks WHERE source_table = ?", [source_table])
+            
+        changed = self.get_changed_years(source_table)
+        if not changed:
+            logger.info(f"✓ {source_table} unchanged since last materialization. Nothing to refresh.")
+            return []
+        logger.info(f"Changed {source_table} partitions: {changed}")
+        
+        if not self.get_lag_specs():
+            self.register_lag_features()
+        max_lag = max(lag for _, _, lag in self.get_lag_specs())
+        lag_years = sorted({y + k for y in changed for k in range(max_lag + 1)})
+        
+        self.materialize_lag_features(source_table, years=lag_years, as_of=as_of)
+        self.materialize_interaction_features(source_table, years=changed, as_of=as_of)
+        
+        # Advance watermarks only after both materializers succeeded
+        current = self._partition_hashes(source_table)
+        self.con.execute("DELETE FROM feature_watermarks WHERE source_table = ?", [source_table])
+        self.con.executemany("""
+            INSERT INTO feature_watermarks (source_table, year, row_hash, row_count)
+            VALUES (?, ?, ?, ?)
+        """, [(source_table, year, row_hash, count) for year, (row_hash, count) in current.items()])
+        
+        return changed
+        
+    def _ensure_watermarks(self):
+        """Create the per-partition watermark table if needed."""
+        if self.read_only:
+            return
+        self.con.execute("""
+            CREATE TABLE IF NOT EXISTS feature_watermarks (
+                source_table VARCHAR,
+                year INTEGER,
+                row_hash VARCHAR,             -- order-independent hash of the year's rows
+                row_count BIGINT,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (source_table, year)
+            )
+        """)
+        
+    def _wide_matrix_sql(self, base_filter: str, pit_filter: str,
+                         feature_names: Optional[List[str]] = None) -> str:
+        """
+        Build the SQL that pivots point-in-time feature values to one column per feature.
+        
+        The pivot runs inside DuckDB as a conditional aggregation, so only the final
+        (player, year) × feature matrix ever leaves the database.
+        
+        Args:
+            base_filter: WHERE clause (without WHERE) on fact_player_efficiency
+            pit_filter: WHERE clause (without WHERE) on feature_values aliased `fv`
+            feature_names: Restrict (and order) the output columns; defaults to all
+                features visible under `pit_filter`
+        """
+        if feature_names is None:
+            feature_names = [r[0] for r in self.con.execute(f"""
+                SELECT DISTINCT fv.feature_name FROM feature_values fv
+                WHERE {pit_filter}
+                ORDER BY 1
+            """).fetchall()]
+            
+        feature_cols = "".join(
+            f",\n                FIRST(pf.feature_value) FILTER (WHERE pf.feature_name = '{name}') AS \"{name}\""
+            for name in feature_names
+        )
         
-        # Pivot features to wide format with point-in-time constraint
-        query = f"""
+        return f"""
             WITH base AS (
                 SELECT DISTINCT player_name, year 
                 FROM fact_player_efficiency 
-                WHERE year >= {min_year}
+                WHERE {base_filter}
             ),
             pit_features AS (
                 SELECT 
@@ -251,42 +597,64 @@ class FeatureStore:
                     fv.feature_name,
                     fv.feature_value
                 FROM feature_values fv
-                WHERE fv.prediction_year >= {min_year}
-                  AND fv.valid_from <= '{as_of_date}' -- Known by cutoff
-                  AND (fv.valid_until > '{as_of_date}' OR fv.valid_until IS NULL) -- Not yet superseded
+                WHERE {pit_filter}
             )
             SELECT 
                 b.player_name,
-                b.year,
-                pf.feature_name,
-                pf.feature_value
+                b.year{feature_cols}
             FROM base b
-            LEFT JOIN pit_features pf
+            JOIN pit_features pf
                 ON b.player_name = pf.player_name
                 AND b.year = pf.prediction_year
+            GROUP BY b.player_name, b.year
+            ORDER BY b.player_name, b.year
         """
         
-        df = self.con.execute(query).df()
+    @staticmethod
+    def _as_of_filters(as_of_date: date, min_year: int) -> tuple:
+        """Base/feature filters for a single knowledge cutoff."""
+        base_filter = f"year >= {min_year}"
+        pit_filter = f"""fv.prediction_year >= {min_year}
+                  AND fv.valid_from <= '{as_of_date}' -- Known by cutoff
+                  AND (fv.valid_until > '{as_of_date}' OR fv.valid_until IS NULL) -- Not yet superseded"""
+        return base_filter, pit_filter
         
-        if df.empty:
-            logger.warning("No features found. Run materialize_* methods first.")
-            return df
+    def get_training_matrix(self, as_of_date: date, 
+                            min_year: int = 2015,
+                            feature_names: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Get feature matrix for training with strict point-in-time semantics as of a SINGLE date.
+        Useful for Inference or specific backtest folds.
+        
+        Args:
+            as_of_date: The 'knowledge cutoff' date. We only use data valid on or before this date.
+            min_year: Minimum prediction year to include
+            feature_names: Optional subset of features to return
             
-        # Pivot to wide format
-        pivot_df = df.pivot_table(
-            index=['player_name', 'year'], 
-            columns='feature_name', 
-            values='feature_value',
-            aggfunc='first'
-        ).reset_index()
-        
-        # Flatten column names
-        pivot_df.columns = [col if isinstance(col, str) else col for col in pivot_df.columns]
-        
-        logger.info(f"✓ Retrieved {len(pivot_df):,} rows × {len(pivot_df.columns)} features")
-        return pivot_df
+        Returns:
+            DataFrame with player_name, year, and pivoted features
+        """
+        logger.info(f"Retrieving training matrix (as of {as_of_date})...")
+        
+        def compute():
+            base_filter, pit_filter = self._as_of_filters(as_of_date, min_year)
+            pivot_df = self.con.execute(
+                self._wide_matrix_sql(base_filter, pit_filter, feature_names)
+            ).df()
+            
+            if pivot_df.empty:
+                logger.warning("No features found. Run materialize_* methods first.")
+                return pivot_df
+            
+            logger.info(f"✓ Retrieved {len(pivot_df):,} rows × {len(pivot_df.columns)} features")
+            return pivot_df
+        
+        return self._cached('training_matrix', {
+            'as_of_date': as_of_date, 'min_year': min_year, 'feature_names': feature_names
+        }, compute)
 
-    def get_historical_features(self, min_year: int = 2015, max_year: int = 2025) -> pd.DataFrame:
+    def get_historical_features(self, min_year: int = 2015, max_year: int = 2025,
+                                feature_names: Optional[List[str]] = None) -> pd.DataFrame:
         """
         Get feature matrix for Batch Training (Diagonal Join).
         
@@ -297,63 +665,299 @@ class FeatureStore:
         Args:
             min_year: Start year
             max_year: End year
+            feature_names: Optional subset of features to return
         """
         logger.info(f"Retrieving historical features (Diagonal Join {min_year}-{max_year})...")
         
-        query = f"""
-            WITH base AS (
-                SELECT DISTINCT player_name, year 
-                FROM fact_player_efficiency 
-                WHERE year BETWEEN {min_year} AND {max_year}
-            ),
-            pit_features AS (
+        def compute():
+            base_filter = f"year BETWEEN {min_year} AND {max_year}"
+            # DIAGONAL JOIN LOGIC:
+            # Valid at the start of the prediction season (Sept 1st)
+            pit_filter = f"""fv.prediction_year BETWEEN {min_year} AND {max_year}
+                      AND fv.valid_from <= make_date(fv.prediction_year, 9, 1)
+                      AND (fv.valid_until > make_date(fv.prediction_year, 9, 1) OR fv.valid_until IS NULL)"""
+            
+            pivot_df = self.con.execute(
+                self._wide_matrix_sql(base_filter, pit_filter, feature_names)
+            ).df()
+            
+            if pivot_df.empty:
+                logger.warning("No features found.")
+                return pivot_df
+            
+            logger.info(f"✓ Retrieved {len(pivot_df):,} rows (Historical Batch)")
+            return pivot_df
+        
+        return self._cached('historical_features', {
+            'min_year': min_year, 'max_year': max_year, 'feature_names': feature_names
+        }, compute)
+        
+    def get_features_at_cutoffs(self, entity_cutoffs: pd.DataFrame,
+                                feature_names: Optional[List[str]] = None,
+                                enforce_valid_until: bool = False) -> pd.DataFrame:
+        """
+        Resolve point-in-time features for many (entity, cutoff) pairs in one ASOF join.
+        
+        For every (player_name, year, cutoff) row and every feature, the version with the
+        latest valid_from <= cutoff is selected, so later revisions never leak into an
+        earlier cutoff. This lets every backtest fold be served from a single scan.
+        
+        Args:
+            entity_cutoffs: DataFrame with player_name, year (prediction year) and cutoff
+                            (date/timestamp); extra columns (e.g. fold) are carried through
+            feature_names: Optional subset of features to return
+            enforce_valid_until: Also drop versions whose valid_until <= cutoff (the
+                                 single-date semantics of get_training_matrix)
+                                 
+        Returns:
+            One row per input row with the carried columns plus one column per feature
+        """
+        if entity_cutoffs.empty:
+            return entity_cutoffs.copy()
+        
+        if feature_names is None:
+            feature_names = [r[0] for r in self.con.execute(
+                "SELECT DISTINCT feature_name FROM feature_values ORDER BY 1"
+            ).fetchall()]
+        
+        carry_cols = [c for c in entity_cutoffs.columns if c not in ('player_name', 'year', 'cutoff')]
+        carry_select = "".join(f', s."{c}"' for c in carry_cols)
+        feature_cols = "".join(
+            f",\n                FIRST(r.feature_value) FILTER (WHERE r.feature_name = '{name}') AS \"{name}\""
+            for name in feature_names
+        )
+        expiry_filter = ""
+        if enforce_valid_until:
+            expiry_filter = "WHERE fv.valid_until > s._cutoff_date OR fv.valid_until IS NULL"
+        
+        # Row ids come from pandas: DuckDB's scan order of a registered frame is not guaranteed
+        self.con.register("_fs_entity_cutoffs", entity_cutoffs.assign(_row_id=np.arange(len(entity_cutoffs))))
+        try:
+            df = self.con.execute(f"""
+                WITH spine AS (
+                    SELECT 
+                        e.*,
+                        CAST(e.cutoff AS DATE) AS _cutoff_date
+                    FROM _fs_entity_cutoffs e
+                ),
+                spine_features AS (
+                    SELECT s._row_id, s.player_name, s.year, s._cutoff_date, f.feature_name
+                    FROM spine s
+                    CROSS JOIN (SELECT UNNEST(?::VARCHAR[]) AS feature_name) f
+                ),
+                resolved AS (
+                    -- Latest version known at each row's cutoff
+                    SELECT s._row_id, s.feature_name, fv.feature_value
+                    FROM spine_features s
+                    ASOF JOIN feature_values fv
+                        ON fv.player_name = s.player_name
+                        AND fv.prediction_year = s.year
+                        AND fv.feature_name = s.feature_name
+                        AND s._cutoff_date >= fv.valid_from
+                    {expiry_filter}
+                )
                 SELECT 
-                    fv.player_name,
-                    fv.prediction_year,
-                    fv.feature_name,
-                    fv.feature_value
-                FROM feature_values fv
-                WHERE fv.prediction_year BETWEEN {min_year} AND {max_year}
-                  -- DIAGONAL JOIN LOGIC:
-                  -- Valid at the start of the prediction season (Sept 1st)
-                  AND fv.valid_from <= make_date(fv.prediction_year, 9, 1)
-                  AND (fv.valid_until > make_date(fv.prediction_year, 9, 1) OR fv.valid_until IS NULL)
-            )
-            SELECT 
-                b.player_name,
-                b.year,
-                pf.feature_name,
-                pf.feature_value
-            FROM base b
-            LEFT JOIN pit_features pf
-                ON b.player_name = pf.player_name
-                AND b.year = pf.prediction_year
+                    s._row_id,
+                    s.player_name,
+                    s.year,
+                    s.cutoff{carry_select}{feature_cols}
+                FROM spine s
+                LEFT JOIN resolved r ON r._row_id = s._row_id
+                GROUP BY ALL
+                ORDER BY s._row_id
+            """, [feature_names]).df().drop(columns=['_row_id'])
+        finally:
+            self.con.unregister("_fs_entity_cutoffs")
+            
+        logger.info(f"✓ Resolved {len(df):,} (entity, cutoff) rows × {len(feature_names)} features via ASOF join")
+        return df
+        
+    def get_backtest_matrices(self, test_years: List[int], min_year: int = 2015,
+                              feature_names: Optional[List[str]] = None) -> pd.DataFrame:
         """
+        Training/test matrices for every walk-forward fold from one ASOF join.
         
-        df = self.con.execute(query).df()
+        Fold T uses knowledge as of the start of season T (Sept 1st) for all rows
+        with min_year <= year <= T. Slice with `df[df['fold'] == T]`, then split
+        on `year < T` (train) and `year == T` (test).
+        """
+        base = self.con.execute(f"""
+            SELECT DISTINCT player_name, year 
+            FROM fact_player_efficiency 
+            WHERE year BETWEEN {min_year} AND {max(test_years)}
+        """).df()
         
-        if df.empty:
-            logger.warning("No features found.")
-            return df
+        spine = pd.concat([
+            base[base['year'] <= fold].assign(cutoff=date(fold, 9, 1), fold=fold)
+            for fold in test_years
+        ], ignore_index=True)
+        
+        logger.info(f"Resolving {len(test_years)} backtest folds ({len(spine):,} rows) in one pass...")
+        return self._cached('backtest_matrices', {
+            'test_years': sorted(test_years), 'min_year': min_year, 'feature_names': feature_names,
+            'spine': int(pd.util.hash_pandas_object(spine, index=False).sum())
+        }, lambda: self.get_features_at_cutoffs(spine, feature_names=feature_names))
+        
+    def materialize_snapshot(self, as_of_date: date, min_year: int = 2015,
+                             fmt: str = 'table') -> str:
+        """
+        Persist the wide point-in-time matrix as of `as_of_date` for fast re-reads.
+        
+        Args:
+            as_of_date: Knowledge cutoff of the snapshot (e.g. a season start)
+            min_year: Minimum prediction year to include
+            fmt: 'table' for a DuckDB table, 'parquet' for a file under the
+                 configured feature snapshot directory
+                 
+        Returns:
+            The snapshot location (table name or Parquet path)
+        """
+        if self.read_only:
+            raise RuntimeError("Cannot materialize snapshots on a read-only store.")
+        if fmt not in ('table', 'parquet'):
+            raise ValueError(f"Unknown snapshot format: {fmt}")
+            
+        self._ensure_snapshot_catalog()
+        name = f"feature_snapshot_{as_of_date:%Y%m%d}"
+        base_filter, pit_filter = self._as_of_filters(as_of_date, min_year)
+        query = self._wide_matrix_sql(base_filter, pit_filter)
+        
+        if fmt == 'table':
+            location = name
+            self.con.execute(f"CREATE OR REPLACE TABLE {location} AS {query}")
+            num_rows = self.con.execute(f"SELECT COUNT(*) FROM {location}").fetchone()[0]
+        else:
+            snapshot_dir = get_feature_snapshot_dir()
+            snapshot_dir.mkdir(parents=True, exist_ok=True)
+            location = str(snapshot_dir / f"{name}.parquet")
+            self.con.execute(f"COPY ({query}) TO '{location}' (FORMAT PARQUET)")
+            num_rows = self.con.execute(f"SELECT COUNT(*) FROM read_parquet('{location}')").fetchone()[0]
+            
+        num_features = len(self._snapshot_columns(location, fmt)) - 2
+        self.con.execute("""
+            INSERT OR REPLACE INTO feature_snapshots 
+            (snapshot_name, as_of_date, min_year, format, location, num_rows, num_features)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, [name, as_of_date, min_year, fmt, location, num_rows, num_features])
+        
+        logger.info(f"✓ Snapshot {name} persisted ({num_rows:,} rows × {num_features} features) → {location}")
+        return location
+        
+    def materialize_season_snapshots(self, min_year: int = 2015, max_year: int = 2025,
+                                     fmt: str = 'table') -> List[str]:
+        """Persist one snapshot per season start (Sept 1st) in [min_year, max_year]."""
+        return [
+            self.materialize_snapshot(date(year, 9, 1), min_year=min_year, fmt=fmt)
+            for year in range(min_year, max_year + 1)
+        ]
+        
+    def load_snapshot(self, as_of_date: date, columns: Optional[List[str]] = None,
+                      min_year: Optional[int] = None) -> pd.DataFrame:
+        """
+        Read a persisted snapshot, projecting only the requested feature columns.
+        
+        Returns an empty DataFrame if no snapshot exists for `as_of_date`.
+        """
+        self._ensure_snapshot_catalog()
+        row = self.con.execute("""
+            SELECT format, location FROM feature_snapshots WHERE as_of_date = ?
+        """, [as_of_date]).fetchone()
+        if row is None:
+            logger.warning(f"No feature snapshot as of {as_of_date}.")
+            return pd.DataFrame()
             
-        pivot_df = df.pivot_table(
-            index=['player_name', 'year'], 
-            columns='feature_name', 
-            values='feature_value',
-            aggfunc='first'
-        ).reset_index()
+        fmt, location = row
+        source = location if fmt == 'table' else f"read_parquet('{location}')"
+        projection = "*"
+        if columns is not None:
+            projection = ", ".join(['player_name', 'year'] + [f'"{c}"' for c in columns])
+        where = f"WHERE year >= {min_year}" if min_year is not None else ""
         
-        pivot_df.columns = [col if isinstance(col, str) else col for col in pivot_df.columns]
+        return self.con.execute(f"SELECT {projection} FROM {source} {where}").df()
         
-        logger.info(f"✓ Retrieved {len(pivot_df):,} rows (Historical Batch)")
-        return pivot_df
+    def _ensure_snapshot_catalog(self):
+        """Create the snapshot catalog table if needed."""
+        if self.read_only:
+            return
+        self.con.execute("""
+            CREATE TABLE IF NOT EXISTS feature_snapshots (
+                snapshot_name VARCHAR PRIMARY KEY,
+                as_of_date DATE,
+                min_year INTEGER,
+                format VARCHAR,               -- 'table' or 'parquet'
+                location VARCHAR,             -- table name or parquet path
+                num_rows BIGINT,
+                num_features INTEGER,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        
+    def _ensure_selection_catalog(self):
+        """Create the feature selection table if needed."""
+        if self.read_only:
+            return
+        self.con.execute("""
+            CREATE TABLE IF NOT EXISTS feature_selections (
+                selection_name VARCHAR,
+                target_col VARCHAR,
+                feature_name VARCHAR,
+                coefficient DOUBLE,           -- Standardized L1 coefficient (NULL if not from a linear fit)
+                rank INTEGER,                 -- 1 = largest |coefficient|
+                method VARCHAR,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (selection_name, feature_name)
+            )
+        """)
+        
+    def register_feature_selection(self, selection_name: str, coefficients: pd.Series,
+                                   target_col: str = None, method: str = 'l1'):
+        """
+        Persist a selected feature set (the non-zero entries of `coefficients`).
+        
+        Training reads it back with `get_feature_selection` and projects the matrix
+        to these columns. Re-registering a name replaces the set.
+        """
+        if self.read_only:
+            logger.info("Database is read-only. Skipping feature selection registration.")
+            return
+        self._ensure_selection_catalog()
+        selected = coefficients[coefficients != 0]
+        rows = pd.DataFrame({
+            'selection_name': selection_name,
+            'target_col': target_col,
+            'feature_name': selected.index.astype(str),
+            'coefficient': selected.to_numpy(dtype=float),
+            'rank': selected.abs().rank(ascending=False, method='first', na_option='bottom').astype(int).to_numpy(),
+            'method': method,
+        })
+        self.con.execute("BEGIN TRANSACTION")
+        try:
+            self.con.execute("DELETE FROM feature_selections WHERE selection_name = ?", [selection_name])
+            self.con.register("selection_rows", rows)
+            self.con.execute("INSERT INTO feature_selections BY NAME SELECT * FROM selection_rows")
+            self.con.unregister("selection_rows")
+            self.con.execute("COMMIT")
+        except Exception:
+            self.con.execute("ROLLBACK")
+            raise
+        logger.info(f"✓ Registered feature selection '{selection_name}' ({len(rows)} features).")
+        
+    def get_feature_selection(self, selection_name: str) -> Optional[List[str]]:
+        """Features of a registered selection, most important first; None if it does not exist."""
+        return load_feature_selection(self.con, selection_name)
+        
+    def _snapshot_columns(self, location: str, fmt: str) -> List[str]:
+        source = location if fmt == 'table' else f"read_parquet('{location}')"
+        return self.con.execute(f"DESCRIBE SELECT * FROM {source}").df()['column_name'].tolist()
         
     def validate_temporal_integrity(self) -> bool:
         """
         Validate that no feature values violate point-in-time constraints.
         
         Rule: valid_from must be < season start date of prediction_year.
-        Assuming season starts Sept 1st.
+        Assuming season starts Sept 1st. Revisions written by incremental refreshes
+        (a later version of an already-known value) are exempt: they are valid only
+        from the date they were learned, so they cannot leak into earlier cutoffs.
         """
         logger.info("🔍 Validating temporal integrity...")
         
@@ -364,6 +968,14 @@ class FeatureStore:
             WHERE fr.feature_type = 'lag'
               -- Violation if 'known' date is AFTER the season starts
               AND fv.valid_from >= make_date(fv.prediction_year, 9, 1)
+              -- A revision is fine: an earlier version was known in time and ended before it
+              AND NOT EXISTS (
+                  SELECT 1 FROM feature_values prior
+                  WHERE prior.entity_key = fv.entity_key
+                    AND prior.feature_name = fv.feature_name
+                    AND prior.valid_from < make_date(fv.prediction_year, 9, 1)
+                    AND prior.valid_until <= fv.valid_from
+              )
         """).fetchone()[0]
         
         if violations == 0:
@@ -379,6 +991,13 @@ class FeatureStore:
                 JOIN feature_registry fr ON fv.feature_name = fr.feature_name
                 WHERE fr.feature_type = 'lag'
                   AND fv.valid_from >= make_date(fv.prediction_year, 9, 1)
+                  AND NOT EXISTS (
+                      SELECT 1 FROM feature_values prior
+                      WHERE prior.entity_key = fv.entity_key
+                        AND prior.feature_name = fv.feature_name
+                        AND prior.valid_from < make_date(fv.prediction_year, 9, 1)
+                        AND prior.valid_until <= fv.valid_from
+                  )
                 LIMIT 5
             """).df()
             logger.error(f"Sample violations:\n{samples}")
@@ -402,7 +1021,7 @@ class FeatureStore:
 
 if __name__ == "__main__":
     # Demo usage
-    store = FeatureStore()
+    store = FeatureStore(cache_dir=str(get_feature_cache_dir()))
     store.initialize_schema()
     store.materialize_lag_features()
     store.materialize_interaction_features()
@@ -1,32 +1,31 @@
-
-import json
 import pathlib
+import shutil
 import sys
 
-def filter_history(start_year=2022, end_year=2024):
-    input_path = pathlib.Path("web/data/historical_predictions.json")
-    if not input_path.exists():
-        print(f"Error: {input_path} not found.")
+import yaml
+
+from src.simulate_history import export_history, history_paths
+
+def filter_history(start_year=2022, end_year=2024, source="simulation", config_path="pipeline/config/ml_config.yaml"):
+    if not pathlib.Path(config_path).exists():
+        config_path = "config/ml_config.yaml"
+    with open(config_path, "r") as f:
+        output_dir, json_path = history_paths(yaml.safe_load(f))
+
+    partitions = sorted(pathlib.Path(output_dir, f"source={source}").glob("year=*"))
+    if not partitions:
+        print(f"Error: no {source} seasons under {output_dir}.")
         sys.exit(1)
-        
-    with open(input_path, "r") as f:
-        data = json.load(f)
-        
-    print(f"Loaded {len(data)} records.")
-    
-    # Filter for expanding window simulation range
-    filtered_data = [
-        row for row in data 
-        if start_year <= row.get("year", 0) <= end_year
-    ]
-    
-    print(f"Filtered to {len(filtered_data)} records ({start_year}-{end_year}).")
-    
-    # Write back
-    with open(input_path, "w") as f:
-        json.dump(filtered_data, f, indent=2)
-        
-    print(f"Saved to {input_path}")
+
+    # Filter for expanding window simulation range: drop the seasons outside it from
+    # the dataset itself, so the next export does not bring them back
+    dropped = [p for p in partitions if not start_year <= int(p.name.split("=", 1)[1]) <= end_year]
+    for partition in dropped:
+        shutil.rmtree(partition)
+    print(f"Dropped {len(dropped)} of {len(partitions)} {source} seasons outside {start_year}-{end_year}.")
+
+    n_records = export_history(source, output_dir, json_path)
+    print(f"Saved {n_records} records to {json_path}")
 
 if __name__ == "__main__":
     filter_history()
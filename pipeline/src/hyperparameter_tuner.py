@@ -0,0 +1,223 @@
+"""
+Hyperparameter Tuner: Successive Halving over Walk-Forward Folds
+
+Searches XGBoost configurations on the same expanding-window folds the backtest
+uses, instead of training 500 fixed trees everywhere.
+
+Key Concepts:
+- Every trial trains on the seasons before a fold's validation year and early-stops
+  on the last of those seasons, so the number of trees is learned rather than
+  configured. The validation year is only scored, never used for stopping, so
+  cv_rmse is not biased toward configurations that overfit the stopping set.
+- Successive halving: all candidates are scored on the most recent fold(s) first;
+  only the best 1/eta survive to be scored on eta times as many folds, until the
+  survivors have seen every fold. Total work is bounded by roughly
+  n_candidates × min_folds × (number of rungs) fits.
+- Trials run in a spawn process pool over the year-sorted history written once as
+  memory-mapped float32 arrays (see src/backtesting.py).
+- The winner (with n_estimators set to the median early-stopping round) and its
+  fold metrics are written to the model registry, where training picks them up.
+
+Usage:
+    from src.hyperparameter_tuner import HyperparameterTuner
+
+    tuner = HyperparameterTuner()
+    result = tuner.tune(X, y, metadata)
+    tuner.record(result)
+"""
+
+import itertools
+import logging
+import math
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+import yaml
+
+from src.backtesting import expanding_folds, load_history_rows, write_sorted_history
+from src.feature_factory import SparseFeatureMatrix
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEARCH_SPACE = {
+    "learning_rate": [0.03, 0.05, 0.1],
+    "max_depth": [3, 4, 6],
+    "min_child_weight": [1, 5],
+    "subsample": [0.8, 1.0],
+    "colsample_bytree": [0.5, 0.8],
+}
+
+
+@dataclass
+class TuningResult:
+    best_params: Dict[str, Any]     # Ready for XGBRegressor (n_estimators included)
+    cv_rmse: float                  # Mean validation RMSE of the winner over all folds
+    fold_metrics: pd.DataFrame      # Winner: fold_year, rmse, stopping_year, stopping_rmse, best_iteration, fit_seconds
+    trials: pd.DataFrame            # Every (candidate, fold) trial that was run
+
+
+def _run_trial(task):
+    """Fit one candidate on one fold, early-stopping on the last training season (runs in a worker)."""
+    X_fit = load_history_rows(task["spec"], 0, task["stop_start"])
+    X_stop = load_history_rows(task["spec"], task["stop_start"], task["train_end"])
+    X_val = load_history_rows(task["spec"], task["train_end"], task["val_end"])
+    y_sorted = np.load(task["y_path"], mmap_mode="r")
+
+    model = xgb.XGBRegressor(
+        **task["params"],
+        n_estimators=task["max_rounds"],
+        early_stopping_rounds=task["early_stopping_rounds"],
+        eval_metric="rmse",
+        n_jobs=task["n_jobs"],
+    )
+    start = time.perf_counter()
+    model.fit(X_fit, y_sorted[:task["stop_start"]],
+              eval_set=[(X_stop, y_sorted[task["stop_start"]:task["train_end"]])], verbose=False)
+    # predict() uses the early-stopped trees; the validation year played no part in choosing them
+    residuals = model.predict(X_val) - y_sorted[task["train_end"]:task["val_end"]]
+    return {
+        "candidate": task["candidate"],
+        "fold_year": task["fold_year"],
+        "rmse": float(np.sqrt(np.mean(np.square(residuals, dtype=np.float64)))),
+        "stopping_year": task["stopping_year"],
+        "stopping_rmse": float(model.best_score),
+        "best_iteration": int(model.best_iteration) + 1,
+        "fit_seconds": time.perf_counter() - start,
+    }
+
+
+class HyperparameterTuner:
+    def __init__(self, config_path="pipeline/config/ml_config.yaml", max_workers=None):
+        if not Path(config_path).exists():
+            config_path = "config/ml_config.yaml"
+        with open(config_path, "r") as f:
+            self.config = yaml.safe_load(f)
+
+        tuning = self.config.get("tuning", {}) or {}
+        self.base_params = {k: v for k, v in self.config["models"]["xgboost"]["params"].items()
+                            if k not in ("n_estimators", "n_jobs")}
+        self.search_space = tuning.get("search_space") or DEFAULT_SEARCH_SPACE
+        self.n_candidates = tuning.get("n_candidates", 12)
+        self.eta = tuning.get("eta", 3)
+        self.min_folds = tuning.get("min_folds", 1)
+        self.max_rounds = tuning.get("max_rounds", 2000)
+        self.early_stopping_rounds = tuning.get("early_stopping_rounds", 50)
+        self.seed = tuning.get("seed", 42)
+        self.max_workers = max_workers or tuning.get("max_workers") or os.cpu_count() or 1
+
+    def sample_candidates(self) -> List[Dict[str, Any]]:
+        """Deterministic sample of distinct configurations from the search grid."""
+        keys = sorted(self.search_space)
+        grid = list(itertools.product(*(self.search_space[k] for k in keys)))
+        rng = np.random.default_rng(self.seed)
+        picks = rng.choice(len(grid), size=min(self.n_candidates, len(grid)), replace=False)
+        return [dict(zip(keys, grid[i])) for i in sorted(picks)]
+
+    def tune(self, X, y, metadata, start_year=2018) -> TuningResult:
+        """Successive halving of sampled candidates over the walk-forward folds."""
+        if isinstance(X, SparseFeatureMatrix):
+            metadata = metadata.reset_index(drop=True)
+            y = y.reset_index(drop=True)
+        else:
+            metadata = metadata.loc[X.index]
+            y = y.loc[X.index]
+
+        order = np.argsort(metadata['year'].to_numpy(), kind='stable')
+        sorted_years = metadata['year'].to_numpy()[order]
+        # Most recent seasons first: the cheapest rungs score on the most relevant folds
+        folds = expanding_folds(sorted_years, max(start_year, int(sorted_years.min()) + 3))[::-1]
+        if not folds:
+            raise ValueError("No walk-forward folds available for tuning.")
+
+        candidates = self.sample_candidates()
+        n_workers = max(1, self.max_workers)
+        n_jobs = max(1, (os.cpu_count() or 1) // n_workers)
+        logger.info(f"🎛️ Tuning {len(candidates)} candidates over {len(folds)} folds "
+                    f"(eta={self.eta}, {n_workers} worker(s) × {n_jobs} thread(s))")
+
+        trials = []
+        with tempfile.TemporaryDirectory(prefix="tuning_") as tmp:
+            spec = write_sorted_history(X, order, tmp)
+            y_path = str(Path(tmp) / "y.npy")
+            np.save(y_path, y.to_numpy(dtype=np.float32)[order])
+
+            def make_task(candidate, fold):
+                fold_year, train_end, val_end = fold
+                # The last season before the validation year is the early-stopping set
+                stopping_year = int(sorted_years[train_end - 1])
+                stop_start = int(np.searchsorted(sorted_years, stopping_year, side='left'))
+                return {"spec": spec, "y_path": y_path, "candidate": candidate,
+                        "params": {**self.base_params, **candidates[candidate]},
+                        "fold_year": fold_year, "stopping_year": stopping_year, "stop_start": stop_start,
+                        "train_end": train_end, "val_end": val_end,
+                        "max_rounds": self.max_rounds, "early_stopping_rounds": self.early_stopping_rounds,
+                        "n_jobs": n_jobs}
+
+            context = multiprocessing.get_context("spawn")
+            pool = ProcessPoolExecutor(max_workers=n_workers, mp_context=context) if n_workers > 1 else None
+            try:
+                alive = list(range(len(candidates)))
+                rung = 0
+                while True:
+                    n_folds = min(len(folds), self.min_folds * self.eta ** rung)
+                    done = {(t["candidate"], t["fold_year"]) for t in trials}
+                    tasks = [make_task(c, fold) for c in alive for fold in folds[:n_folds]
+                             if (c, fold[0]) not in done]
+                    trials += list(pool.map(_run_trial, tasks) if pool else map(_run_trial, tasks))
+
+                    scored = pd.DataFrame(trials)
+                    scored = scored[scored["candidate"].isin(alive)
+                                    & scored["fold_year"].isin([f[0] for f in folds[:n_folds]])]
+                    scores = scored.groupby("candidate")["rmse"].mean().sort_values(kind="stable")
+                    logger.info(f"  Rung {rung}: {len(alive)} candidate(s) on {n_folds} fold(s), "
+                                f"best RMSE {scores.iloc[0]:.4f}")
+                    if n_folds == len(folds):
+                        break
+                    alive = scores.index[:max(1, math.ceil(len(alive) / self.eta))].tolist()
+                    rung += 1
+            finally:
+                if pool:
+                    pool.shutdown()
+
+        trials_df = pd.DataFrame(trials)
+        best = int(scores.index[0])
+        fold_metrics = (trials_df[trials_df["candidate"] == best]
+                        .drop(columns="candidate").sort_values("fold_year").reset_index(drop=True))
+        best_params = {
+            **self.config["models"]["xgboost"]["params"],
+            **candidates[best],
+            "n_estimators": int(np.median(fold_metrics["best_iteration"])),
+        }
+        logger.info(f"✓ Best configuration (CV RMSE {scores.iloc[0]:.4f}, "
+                    f"{len(trials_df)} trials): {candidates[best]}, n_estimators={best_params['n_estimators']}")
+        return TuningResult(best_params, float(scores.iloc[0]), fold_metrics, trials_df)
+
+    def record(self, result: TuningResult, governance=None):
+        """Write the winning configuration and its fold metrics to the model registry."""
+        if governance is None:
+            from src.ml_governance import MLGovernance
+            governance = MLGovernance()
+        governance.record_tuning_result(
+            params=result.best_params,
+            cv_rmse=result.cv_rmse,
+            fold_metrics=result.fold_metrics.to_dict(orient="records"),
+            n_trials=len(result.trials),
+        )
+
+
+if __name__ == "__main__":
+    from src.train_model import RiskModeler
+
+    logging.basicConfig(level=logging.INFO)
+    X, y, metadata = RiskModeler(read_only=True).prepare_data()
+    tuner = HyperparameterTuner()
+    tuner.record(tuner.tune(X, y, metadata))
@@ -2,10 +2,9 @@
 import pandas as pd
 from src.db_manager import DBManager
 import logging
-import joblib
 import os
 from pathlib import Path
-from src.feature_factory import FeatureFactory
+from src.feature_factory import load_sparse_matrix
 
 logger = logging.getLogger(__name__)
 
@@ -15,117 +14,140 @@ class InferenceEngine:
         self.model_dir = Path(model_dir)
 
     def get_latest_model(self):
-        from src.ml_governance import MLGovernance
-        governance = MLGovernance()
-        prod_info = governance.get_production_model_info()
-        
-        if not prod_info:
-            logger.warning("No PRODUCTION model found in registry. Checking for CANDIDATE...")
-            prod_info = governance.get_latest_candidate()
-            
-        if not prod_info:
-             logger.warning("No model found (Production or Candidate).")
-             return None
-            
-        model_path = Path(prod_info["path"])
-        if not model_path.exists():
-            # Fallback for transient environments
-            alt_path = Path("/tmp") / model_path.relative_to(model_path.parents[1])
-            if alt_path.exists():
-                model_path = alt_path
-            else:
-                logger.error(f"Production model file not found: {model_path}")
-                return None
-        
-        logger.info(f"Loading PRODUCTION model: {model_path}")
-        return joblib.load(model_path)
-
-    def enrich_gold_layer(self):
-        """
-        Loads the feature matrix using FeatureStore (PIT-correct), runs inference, 
-        and updates fact_player_efficiency.
-        """
-        from bs4 import BeautifulSoup # Unused but keeping imports clean isn't part of this refactor
-        from datetime import date
-        from src.feature_store import FeatureStore
-        
-        # 1. Load Point-in-Time Features (As of TODAY)
-        # store = FeatureStore(db_path=str(self.db_path))
-        # We want the latest known data for all active players
-        # df_features = store.get_training_matrix(as_of_date=date.today(), min_year=2024)
-        
-        # Direct read from staging (consistency with training)
-        with DBManager(str(self.db_path)) as db:
-             df_features = db.execute("SELECT * FROM staging_feature_matrix WHERE year >= 2024").df()
+        """Predictor for the PRODUCTION model (or latest CANDIDATE), from the process model cache."""
+        from src.model_loader import load_registered_predictor
+        return load_registered_predictor()
 
-        if df_features.empty:
-            logger.warning("Feature matrix emtpy. Ensure materialization has run.")
-            return
+    def _ensure_scoring_tables(self, db):
+        # Stable integer surrogate for player_name (joins and merges stay on integers)
+        db.execute("""
+            CREATE TABLE IF NOT EXISTS player_keys (
+                player_key INTEGER PRIMARY KEY,
+                player_name VARCHAR UNIQUE
+            )
+        """)
+        # Last score per (player, year), with what it was computed from
+        db.execute("""
+            CREATE TABLE IF NOT EXISTS inference_scores (
+                player_key INTEGER,
+                year INTEGER,
+                feature_fingerprint UBIGINT,  -- hash of the staging_feature_matrix row
+                artifact_hash VARCHAR,        -- model artifact that produced the score
+                ml_risk_score DOUBLE,
+                scored_at TIMESTAMP,
+                PRIMARY KEY (player_key, year)
+            )
+        """)
 
-        model = self.get_latest_model()
-        if model is None:
+    def enrich_gold_layer(self, min_year=2024, force=False):
+        """
+        Scores staging_feature_matrix rows (year >= min_year) and updates fact_player_efficiency.
+
+        Only rows whose feature fingerprint or model artifact changed since they were last
+        scored are re-scored (all rows with force=True). Scores are merged into
+        `inference_scores` and synced to the Gold Layer through `player_keys`. The key
+        lives only in that side table: a Gold column would flow into the next Feature
+        Factory run as a feature.
+        """
+        predictor = self.get_latest_model()
+        if predictor is None:
             logger.warning("No ML model found. Skipping ML enrichment.")
             return
 
-        # 2. Align Features with Model
-        from src.ml_governance import MLGovernance
-        from src.ml_governance import MLGovernance
-        governance = MLGovernance()
-        prod_info = governance.get_production_model_info()
-        
-        if prod_info and "feature_names" in prod_info:
-            expected_features = prod_info["feature_names"]
-        else:
-            logger.warning("No feature metadata in governance. Using booster fallback.")
-            expected_features = model.get_booster().feature_names
-            
-        if expected_features is None:
-             logger.warning("Feature names not found in model. Falling back to available columns.")
-             expected_features = [c for c in df_features.columns if c not in ['player_name', 'year']]
-
-        logger.info(f"ML Inference: Model expects {len(expected_features)} features")
-        
-        # Reindex checks for missing columns (fills 0) and drops extras
-        # We must set index to keep alignment with df_features
-        X_aligned = df_features.set_index(['player_name', 'year']).reindex(columns=expected_features, fill_value=0)
-        
-        # 3. Predict
-        preds = model.predict(X_aligned)
-        
-        # 4. Persistence
-        # We need to map predictions back to (player, year, team)
-        # FeatureStore (get_training_matrix) returns [player_name, year, ...] but NOT team 
-        # We need to join team back from fact_player_efficiency to update the table correctly?
-        # Actually, UPDATE FROM only needs player/year if those are the keys.
-        # But fact_player_efficiency PK might include 'team'.
-        # Let's pivot: The easiest way is to push predictions to a temp table keyed by player/year
-        
+        # 1. Align Features with Model (the predictor carries the artifact's feature manifest)
+        matrix_format = predictor.matrix_format
+        logger.info(f"ML Inference: Model expects {len(predictor.feature_names)} features ({matrix_format})")
+
         with DBManager(str(self.db_path)) as db:
-            # Create a dataframe for the update
-            updates_df = X_aligned.reset_index()[['player_name', 'year']].copy()
-            updates_df['ml_risk_score'] = preds
-            
-            # Calculate simplistic Fair Market Value proxy
-            # If risk is high, value is simpler. If risk low, value high.
-            # We don't have 'fair_market_value' column in X_aligned unless it was a feature.
-            # Let's just update risk score for now as that is the critical artifact.
-            
-            db.execute("CREATE OR REPLACE TEMPORARY TABLE inference_results AS SELECT * FROM updates_df", {"updates_df": updates_df})
-            
-            # Add column if missing
+            self._ensure_scoring_tables(db)
+            db.execute("""
+                INSERT INTO player_keys
+                SELECT (SELECT COALESCE(MAX(player_key), 0) FROM player_keys)
+                           + row_number() OVER (ORDER BY player_name),
+                       player_name
+                FROM (
+                    SELECT DISTINCT player_name FROM staging_feature_matrix
+                    WHERE year >= $min_year AND player_name IS NOT NULL
+                    EXCEPT
+                    SELECT player_name FROM player_keys
+                )
+            """, {"min_year": min_year})
+
+            # 2. Change detection: new rows, changed features, or a different model.
+            # One row per (player, year) -- the lowest fingerprint, if the matrix holds
+            # duplicates -- so the stored fingerprint is compared with the same row every run
+            db.execute("""
+                CREATE OR REPLACE TEMPORARY TABLE inference_changes AS
+                WITH current_rows AS (
+                    SELECT k.player_key, s.year, hash(s) AS feature_fingerprint
+                    FROM staging_feature_matrix s
+                    JOIN player_keys k USING (player_name)
+                    WHERE s.year >= $min_year
+                    QUALIFY ROW_NUMBER() OVER (PARTITION BY k.player_key, s.year ORDER BY hash(s)) = 1
+                )
+                SELECT c.player_key, c.year, c.feature_fingerprint
+                FROM current_rows c
+                LEFT JOIN inference_scores p
+                    ON p.player_key = c.player_key AND p.year = c.year
+                WHERE $force
+                   OR p.player_key IS NULL
+                   OR p.feature_fingerprint <> c.feature_fingerprint
+                   OR p.artifact_hash IS DISTINCT FROM $artifact_hash
+            """, {"min_year": min_year, "force": force, "artifact_hash": predictor.artifact_hash})
+            n_changed = db.execute("SELECT COUNT(*) FROM inference_changes").fetchone()[0]
+            n_total = db.execute("SELECT COUNT(*) FROM staging_feature_matrix WHERE year >= $min_year",
+                                 {"min_year": min_year}).fetchone()[0]
+
+            if n_total == 0:
+                logger.warning("Feature matrix emtpy. Ensure materialization has run.")
+                return
+            logger.info(f"ML Inference: {n_changed:,} of {n_total:,} rows changed since last scoring")
+
+            if n_changed > 0:
+                # 3. Load and predict only the changed rows (the row each fingerprint was taken from)
+                feature_query = """
+                    SELECT c.player_key, s.*
+                    FROM staging_feature_matrix s
+                    JOIN player_keys k USING (player_name)
+                    JOIN inference_changes c
+                        ON c.player_key = k.player_key
+                        AND c.year = s.year
+                        AND c.feature_fingerprint = hash(s)
+                """
+                if matrix_format == "sparse":
+                    X, keys_df, _ = load_sparse_matrix(db.con, feature_query, exclude=('player_name',),
+                                                       metadata_cols=['player_key', 'year'])
+                else:
+                    df_features = db.execute(feature_query).df()
+                    keys_df = df_features[['player_key', 'year']]
+                    X = df_features.drop(columns=['player_key', 'player_name', 'year'])
+
+                updates_df = keys_df[['player_key', 'year']].copy()
+                updates_df['ml_risk_score'] = predictor.predict(X)
+                updates_df = updates_df.drop_duplicates(['player_key', 'year'])
+
+                # 4. One bulk merge into the score table
+                db.execute("""
+                    INSERT OR REPLACE INTO inference_scores
+                    SELECT u.player_key, u.year, c.feature_fingerprint, $artifact_hash, u.ml_risk_score, now()
+                    FROM updates_df u
+                    JOIN inference_changes c USING (player_key, year)
+                """, {"updates_df": updates_df, "artifact_hash": predictor.artifact_hash})
+
+            # 5. Sync the Gold Layer through the key table (Gold itself carries no player_key)
             db.execute("ALTER TABLE fact_player_efficiency ADD COLUMN IF NOT EXISTS ml_risk_score DOUBLE")
-            
-            # Update
+            db.execute("ALTER TABLE fact_player_efficiency DROP COLUMN IF EXISTS player_key")  # Left by older runs
             db.execute("""
                 UPDATE fact_player_efficiency
-                SET ml_risk_score = inference_results.ml_risk_score
-                FROM inference_results
-                WHERE fact_player_efficiency.player_name = inference_results.player_name 
-                  AND fact_player_efficiency.year = inference_results.year
+                SET ml_risk_score = s.ml_risk_score
+                FROM inference_scores s
+                JOIN player_keys k USING (player_key)
+                WHERE fact_player_efficiency.player_name = k.player_name
+                  AND fact_player_efficiency.year = s.year
+                  AND fact_player_efficiency.ml_risk_score IS DISTINCT FROM s.ml_risk_score
             """)
-            
-            count = db.execute("SELECT COUNT(*) FROM inference_results").fetchone()[0]
-            logger.info(f"✓ Updated {count} rows with ML Risk Scores (Source: FeatureStore).")
+
+            logger.info(f"✓ Scored {n_changed} changed rows; {n_total - n_changed} unchanged scores reused.")
 
 if __name__ == "__main__":
     from src.config_loader import get_db_path
@@ -1,84 +1,450 @@
+"""
+ML Governance: Model Registry in DuckDB
+
+Candidates, promotions and tuning runs live in a small DuckDB database next to
+the model artifacts (`model_registry.registry_db`, default `models/registry.duckdb`).
+
+Tables:
+    registry_models      one row per registered artifact; status is candidate,
+                         production or archived
+    registry_metrics     (model_id, metric, value)
+    registry_features    (model_id, position, feature_name)
+    registry_promotions  audit trail: which model replaced which, and when
+    registry_tuning      hyperparameter tuning runs (latest = tuned params)
+    registry_drift       per-feature drift report of each evaluated model
+    registry_bundles     versioned multi-target bundles (src/multi_target.py); the
+                         member boosters are registry_models rows with status 'bundled'
+
+Models trained on the online feature set (src/online_model.py) are registry_models
+rows with status 'online': the API scores them from in-memory feature vectors, and
+they are never serving candidates for the batch paths.
+
+Key Concepts:
+- Every write is one short transaction on a short-lived connection. DuckDB lets a
+  single process hold the file for writing, so a concurrent training run waits
+  (with backoff) for the lock instead of overwriting the other's entries.
+- Promotion archives the current production model, promotes the candidate and
+  records the promotion atomically: there is never zero or two production models.
+- "Current production" and "latest candidate" are indexed lookups; serving reads
+  the model it should use with one query (`get_serving_model_info`).
+- The legacy `registry.json` (`model_registry.registry_path`) is imported once,
+  automatically, the first time the database is created.
+"""
+
 import json
 import logging
-import os
-from pathlib import Path
+import random
+import subprocess
+import time
+from contextlib import contextmanager
 from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+
+import duckdb
 import yaml
 
 logger = logging.getLogger(__name__)
 
+LOCK_RETRIES = 50
+
+SCHEMA = [
+    "CREATE SEQUENCE IF NOT EXISTS registry_model_id",
+    """
+    CREATE TABLE IF NOT EXISTS registry_models (
+        model_id INTEGER PRIMARY KEY DEFAULT nextval('registry_model_id'),
+        path VARCHAR NOT NULL UNIQUE,
+        artifact_hash VARCHAR,
+        registered_at TIMESTAMP NOT NULL,
+        git_sha VARCHAR,
+        matrix_format VARCHAR,
+        quantile_model JSON,
+        status VARCHAR NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_registry_models_status ON registry_models (status, registered_at)",
+    """
+    CREATE TABLE IF NOT EXISTS registry_metrics (
+        model_id INTEGER,
+        metric VARCHAR,
+        value DOUBLE,
+        PRIMARY KEY (model_id, metric)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS registry_features (
+        model_id INTEGER,
+        position INTEGER,
+        feature_name VARCHAR,
+        PRIMARY KEY (model_id, position)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS registry_promotions (
+        model_id INTEGER,
+        previous_model_id INTEGER,
+        promoted_at TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS registry_tuning (
+        recorded_at TIMESTAMP,
+        git_sha VARCHAR,
+        params JSON,
+        cv_rmse DOUBLE,
+        fold_metrics JSON,
+        n_trials INTEGER
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS registry_drift (
+        model_id INTEGER,
+        feature VARCHAR,
+        ks_stat DOUBLE,
+        ks_p_value DOUBLE,
+        psi DOUBLE,
+        drift_rank INTEGER,
+        evaluated_at TIMESTAMP,
+        PRIMARY KEY (model_id, feature)
+    )
+    """,
+    "CREATE SEQUENCE IF NOT EXISTS registry_bundle_id",
+    """
+    CREATE TABLE IF NOT EXISTS registry_bundles (
+        bundle_id INTEGER PRIMARY KEY DEFAULT nextval('registry_bundle_id'),
+        version VARCHAR NOT NULL UNIQUE,
+        registered_at TIMESTAMP NOT NULL,
+        git_sha VARCHAR
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS registry_bundle_members (
+        bundle_id INTEGER,
+        target VARCHAR,
+        model_id INTEGER,
+        PRIMARY KEY (bundle_id, target)
+    )
+    """,
+]
+
+# Registry entry as a dict (the shape registry.json used), in one query
+MODEL_SELECT = """
+    SELECT m.model_id, m.path, m.artifact_hash, m.registered_at, m.git_sha, m.matrix_format,
+           m.quantile_model, m.status,
+           (SELECT list(f.feature_name ORDER BY f.position) FROM registry_features f
+            WHERE f.model_id = m.model_id) AS feature_names,
+           (SELECT map(list(r.metric), list(r.value)) FROM registry_metrics r
+            WHERE r.model_id = m.model_id) AS metrics
+    FROM registry_models m
+"""
+
+
+@lru_cache(maxsize=1)
+def _git_sha():
+    """Current git commit SHA for artifact lineage (resolved once per process)."""
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True, text=True, check=True
+        )
+        return result.stdout.strip()
+    except Exception:
+        return "unknown"
+
+
 class MLGovernance:
     def __init__(self, config_path="config/ml_config.yaml"):
         with open(config_path, "r") as f:
             self.config = yaml.safe_load(f)
-        self.registry_path = Path(self.config["model_registry"]["registry_path"])
-        self.registry_path.parent.mkdir(parents=True, exist_ok=True)
-        self._load_registry()
-
-    def _load_registry(self):
-        if self.registry_path.exists():
-            with open(self.registry_path, "r") as f:
-                self.registry = json.load(f)
-        else:
-            self.registry = {
-                "production_model": None,
-                "candidates": [],
-                "history": []
-            }
-
-    def _save_registry(self):
-        with open(self.registry_path, "w") as f:
-            json.dump(self.registry, f, indent=2)
-
-    def _get_git_sha(self):
-        """Get current git commit SHA for artifact lineage."""
-        import subprocess
+        registry_config = self.config["model_registry"]
+        self.registry_path = Path(registry_config["registry_path"])
+        self.db_path = Path(registry_config.get("registry_db") or self.registry_path.with_suffix(".duckdb"))
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._init_schema()
+
+    @contextmanager
+    def _connect(self, read_only=False):
+        """Short-lived connection; waits for another process's lock with jittered backoff."""
+        read_only = read_only and self.db_path.exists()
+        for attempt in range(LOCK_RETRIES):
+            try:
+                con = duckdb.connect(str(self.db_path), read_only=read_only)
+                break
+            except duckdb.IOException as e:
+                if "lock" not in str(e).lower() or attempt == LOCK_RETRIES - 1:
+                    raise
+                time.sleep(min(0.05 * 2 ** min(attempt, 5), 1.0) * (0.5 + random.random()))
         try:
-            result = subprocess.run(
-                ["git", "rev-parse", "HEAD"],
-                capture_output=True, text=True, check=True
-            )
-            return result.stdout.strip()
-        except Exception:
-            return "unknown"
-
-    def register_candidate(self, model_path, metrics, feature_names):
+            yield con
+        finally:
+            con.close()
+
+    @contextmanager
+    def _transaction(self):
+        with self._connect() as con:
+            con.execute("BEGIN TRANSACTION")
+            try:
+                yield con
+                con.execute("COMMIT")
+            except Exception:
+                con.execute("ROLLBACK")
+                raise
+
+    def _init_schema(self):
+        with self._transaction() as con:
+            for statement in SCHEMA:
+                con.execute(statement)
+            is_new = con.execute("SELECT COUNT(*) FROM registry_models").fetchone()[0] == 0 and \
+                con.execute("SELECT COUNT(*) FROM registry_tuning").fetchone()[0] == 0
+        if is_new and self.registry_path.suffix == ".json" and self.registry_path.exists():
+            self.import_json_registry(self.registry_path)
+
+    def import_json_registry(self, json_path):
+        """One-time import of a legacy registry.json; already-registered paths are skipped."""
+        with open(json_path, "r") as f:
+            legacy = json.load(f)
+
+        entries = list(legacy.get("history", []))
+        entries += legacy.get("candidates", [])
+        if legacy.get("production_model"):
+            entries.append(legacy["production_model"])
+
+        with self._transaction() as con:
+            n_models = 0
+            for entry in entries:
+                status = entry.get("status") or "candidate"
+                if entry is legacy.get("production_model"):
+                    status = "production"
+                if self._insert_model(con, entry, status, entry.get("timestamp"), entry.get("git_sha")):
+                    n_models += 1
+            tuning = legacy.get("tuning_history") or ([legacy["tuned_params"]] if legacy.get("tuned_params") else [])
+            for run in tuning:
+                self._insert_tuning(con, run, run.get("timestamp"), run.get("git_sha"))
+        logger.info(f"Imported {n_models} models and {len(tuning)} tuning runs from {json_path}")
+        return n_models
+
+    @staticmethod
+    def _insert_model(con, entry, status, registered_at, git_sha):
+        """Insert one registry entry; returns its model_id (None if the path is already registered)."""
+        row = con.execute("""
+            INSERT INTO registry_models (path, artifact_hash, registered_at, git_sha, matrix_format,
+                                         quantile_model, status)
+            VALUES ($path, $artifact_hash, $registered_at, $git_sha, $matrix_format, $quantile_model, $status)
+            ON CONFLICT (path) DO NOTHING
+            RETURNING model_id
+        """, {
+            "path": str(entry["path"]),
+            "artifact_hash": entry.get("artifact_hash"),
+            "registered_at": registered_at or datetime.now(),
+            "git_sha": git_sha,
+            "matrix_format": entry.get("matrix_format", "dense"),
+            "quantile_model": json.dumps(entry["quantile_model"]) if entry.get("quantile_model") else None,
+            "status": status,
+        }).fetchone()
+        if row is None:
+            return None
+        model_id = row[0]
+        metrics = entry.get("metrics") or {}
+        if metrics:
+            con.executemany("INSERT INTO registry_metrics VALUES (?, ?, ?)",
+                            [(model_id, name, float(value)) for name, value in metrics.items()])
+        features = entry.get("feature_names") or []
+        if features:
+            con.executemany("INSERT INTO registry_features VALUES (?, ?, ?)",
+                            [(model_id, i, name) for i, name in enumerate(features)])
+        return model_id
+
+    @staticmethod
+    def _insert_tuning(con, run, recorded_at, git_sha):
+        con.execute("INSERT INTO registry_tuning VALUES (?, ?, ?, ?, ?, ?)", [
+            recorded_at or datetime.now(), git_sha, json.dumps(run["params"]), run["cv_rmse"],
+            json.dumps(run["fold_metrics"]), run["n_trials"],
+        ])
+
+    @staticmethod
+    def _as_entry(row, columns):
+        if row is None:
+            return None
+        entry = dict(zip(columns, row))
+        entry["timestamp"] = entry.pop("registered_at").isoformat()
+        entry["feature_names"] = entry["feature_names"] or []
+        entry["metrics"] = dict(entry["metrics"] or {})
+        entry["quantile_model"] = json.loads(entry["quantile_model"]) if entry["quantile_model"] else None
+        return entry
+
+    def _fetch_model(self, where, params=None, order="m.registered_at DESC, m.model_id DESC"):
+        with self._connect(read_only=True) as con:
+            cursor = con.execute(f"{MODEL_SELECT} WHERE {where} ORDER BY {order} LIMIT 1", params or {})
+            return self._as_entry(cursor.fetchone(), [d[0] for d in cursor.description])
+
+    def register_candidate(self, model_path, metrics, feature_names, matrix_format="dense", artifact_hash=None,
+                           quantile_model=None):
         entry = {
             "path": str(model_path),
-            "timestamp": datetime.now().isoformat(),
-            "git_sha": self._get_git_sha(),
+            "artifact_hash": artifact_hash,
             "metrics": metrics,
             "feature_names": feature_names,
-            "status": "candidate"
+            "matrix_format": matrix_format,
+            "quantile_model": quantile_model,  # {path, artifact_hash, quantiles} of the interval model
         }
-        self.registry["candidates"].append(entry)
-        self._save_registry()
-        logger.info(f"Registered new candidate model: {model_path} (SHA: {entry['git_sha'][:8]})")
+        git_sha = _git_sha()
+        with self._transaction() as con:
+            # Re-registering a candidate's artifact path replaces its entry
+            stale = con.execute("SELECT model_id FROM registry_models WHERE path = ? AND status = 'candidate'",
+                                [str(model_path)]).fetchone()
+            if stale:
+                for table in ("registry_metrics", "registry_features", "registry_models"):
+                    con.execute(f"DELETE FROM {table} WHERE model_id = ?", [stale[0]])
+            if self._insert_model(con, entry, "candidate", datetime.now(), git_sha) is None:
+                raise ValueError(f"{model_path} is already registered as a non-candidate model.")
+        logger.info(f"Registered new candidate model: {model_path} (SHA: {git_sha[:8]})")
+
+    def record_tuning_result(self, params, cv_rmse, fold_metrics, n_trials):
+        """Store a tuning run; its params become the default for the next training run."""
+        run = {"params": params, "cv_rmse": cv_rmse, "fold_metrics": fold_metrics, "n_trials": n_trials}
+        with self._transaction() as con:
+            self._insert_tuning(con, run, datetime.now(), _git_sha())
+        logger.info(f"Recorded tuned parameters (CV RMSE {cv_rmse:.4f}, {n_trials} trials)")
+
+    def get_tuned_params(self):
+        with self._connect(read_only=True) as con:
+            row = con.execute("SELECT params FROM registry_tuning ORDER BY recorded_at DESC LIMIT 1").fetchone()
+        return json.loads(row[0]) if row else None
 
     def promote_to_production(self, model_path):
-        # Archive current production if it exists
-        if self.registry["production_model"]:
-            current_prod = self.registry["production_model"]
-            current_prod["status"] = "archived"
-            self.registry["history"].append(current_prod)
-
-        # Find the candidate and promote
-        for i, candidate in enumerate(self.registry["candidates"]):
-            if candidate["path"] == str(model_path):
-                candidate["status"] = "production"
-                self.registry["production_model"] = candidate
-                self.registry["candidates"].pop(i)
-                self._save_registry()
-                logger.info(f"🚀 PROMOTED {model_path} to PRODUCTION")
-                return True
-        
-        logger.error(f"Failed to promote {model_path}: Not found in candidates.")
-        return False
+        with self._transaction() as con:
+            candidate = con.execute(
+                "SELECT model_id FROM registry_models WHERE path = ? AND status = 'candidate'", [str(model_path)]
+            ).fetchone()
+            if candidate is None:
+                logger.error(f"Failed to promote {model_path}: Not found in candidates.")
+                return False
+            # Archive current production, promote, and record -- all or nothing
+            previous = con.execute("SELECT model_id FROM registry_models WHERE status = 'production'").fetchone()
+            con.execute("UPDATE registry_models SET status = 'archived' WHERE status = 'production'")
+            con.execute("UPDATE registry_models SET status = 'production' WHERE model_id = ?", [candidate[0]])
+            con.execute("INSERT INTO registry_promotions VALUES (?, ?, ?)",
+                        [candidate[0], previous[0] if previous else None, datetime.now()])
+        logger.info(f"🚀 PROMOTED {model_path} to PRODUCTION")
+        return True
+
+    def record_drift(self, model_path, report):
+        """Store a per-feature drift report (see src/drift_detection.py) for a registered model."""
+        with self._transaction() as con:
+            row = con.execute("SELECT model_id FROM registry_models WHERE path = ?", [str(model_path)]).fetchone()
+            if row is None:
+                logger.warning(f"Drift report not stored: {model_path} is not registered.")
+                return False
+            # A re-evaluation replaces the previous report
+            con.execute("DELETE FROM registry_drift WHERE model_id = ?", [row[0]])
+            con.register("drift_report", report[['feature', 'ks_stat', 'ks_p_value', 'psi', 'drift_rank']])
+            con.execute("""
+                INSERT INTO registry_drift
+                SELECT $model_id, feature, ks_stat, ks_p_value, psi, drift_rank, $evaluated_at FROM drift_report
+            """, {"model_id": row[0], "evaluated_at": datetime.now()})
+        logger.info(f"Stored drift report for {model_path} ({len(report)} features)")
+        return True
+
+    def get_drift_report(self, model_path):
+        """Drift report of a model, most drifted feature first (empty if none was recorded)."""
+        with self._connect(read_only=True) as con:
+            return con.execute("""
+                SELECT d.feature, d.ks_stat, d.ks_p_value, d.psi, d.drift_rank, d.evaluated_at
+                FROM registry_drift d JOIN registry_models m USING (model_id)
+                WHERE m.path = ?
+                ORDER BY d.drift_rank
+            """, [str(model_path)]).df()
 
     def get_production_model_info(self):
-        return self.registry.get("production_model")
+        return self._fetch_model("m.status = 'production'")
 
     def get_latest_candidate(self):
-        if not self.registry["candidates"]:
-            return None
-        return self.registry["candidates"][-1]
+        return self._fetch_model("m.status = 'candidate'")
+
+    def get_serving_model_info(self):
+        """The PRODUCTION model, else the latest CANDIDATE -- one indexed query."""
+        return self._fetch_model("m.status IN ('production', 'candidate')",
+                                 order="m.status = 'production' DESC, m.registered_at DESC, m.model_id DESC")
+
+    def register_online_model(self, model_path, metrics, feature_names, matrix_format="dense", artifact_hash=None):
+        """Register a model trained on the online feature set (served by the API only)."""
+        entry = {
+            "path": str(model_path),
+            "artifact_hash": artifact_hash,
+            "metrics": metrics,
+            "feature_names": feature_names,
+            "matrix_format": matrix_format,
+        }
+        git_sha = _git_sha()
+        with self._transaction() as con:
+            if self._insert_model(con, entry, "online", datetime.now(), git_sha) is None:
+                raise ValueError(f"{model_path} is already registered.")
+        logger.info(f"Registered online model: {model_path} (SHA: {git_sha[:8]})")
+
+    def get_online_model_info(self):
+        """The latest model registered for online (API) scoring, or None."""
+        return self._fetch_model("m.status = 'online'")
+
+    def register_bundle(self, version, members, feature_names, matrix_format="dense"):
+        """
+        Register a multi-target bundle: one booster per target over the same features.
+
+        members: {target: {"path", "artifact_hash", "metrics"}}. All members and the
+        bundle row are written in one transaction.
+        """
+        git_sha = _git_sha()
+        with self._transaction() as con:
+            bundle_id = con.execute(
+                "INSERT INTO registry_bundles (version, registered_at, git_sha) VALUES (?, ?, ?) RETURNING bundle_id",
+                [version, datetime.now(), git_sha]
+            ).fetchone()[0]
+            for target, member in members.items():
+                entry = {**member, "feature_names": feature_names, "matrix_format": matrix_format}
+                model_id = self._insert_model(con, entry, "bundled", datetime.now(), git_sha)
+                if model_id is None:
+                    raise ValueError(f"{member['path']} is already registered.")
+                con.execute("INSERT INTO registry_bundle_members VALUES (?, ?, ?)", [bundle_id, target, model_id])
+        logger.info(f"Registered model bundle {version}: {', '.join(members)} (SHA: {git_sha[:8]})")
+
+    def get_latest_bundle(self):
+        """{version, timestamp, members: {target: entry}} of the newest bundle, or None."""
+        with self._connect(read_only=True) as con:
+            bundle = con.execute("""
+                SELECT bundle_id, version, registered_at FROM registry_bundles
+                ORDER BY registered_at DESC, bundle_id DESC LIMIT 1
+            """).fetchone()
+            if bundle is None:
+                return None
+            cursor = con.execute(f"""
+                SELECT b.target, e.* FROM registry_bundle_members b
+                JOIN ({MODEL_SELECT}) e USING (model_id)
+                WHERE b.bundle_id = ? ORDER BY b.target
+            """, [bundle[0]])
+            columns = [d[0] for d in cursor.description]
+            rows = cursor.fetchall()
+        members = {row[0]: self._as_entry(row[1:], columns[1:]) for row in rows}
+        return {"version": bundle[1], "timestamp": bundle[2].isoformat(), "members": members}
+
+    def list_models(self, status=None):
+        """Registry entries, newest first (optionally only one status)."""
+        where, params = ("m.status = $status", {"status": status}) if status else ("TRUE", {})
+        with self._connect(read_only=True) as con:
+            cursor = con.execute(f"{MODEL_SELECT} WHERE {where} ORDER BY m.registered_at DESC, m.model_id DESC",
+                                 params)
+            columns = [d[0] for d in cursor.description]
+            return [self._as_entry(row, columns) for row in cursor.fetchall()]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Model registry maintenance")
+    parser.add_argument("--import-json", help="Import a legacy registry.json into the registry database")
+    args = parser.parse_args()
+
+    governance = MLGovernance()
+    if args.import_json:
+        governance.import_json_registry(args.import_json)
+    for model in governance.list_models():
+        print(f"{model['status']:<11} {model['timestamp']}  {model['path']}")
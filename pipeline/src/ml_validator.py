@@ -2,7 +2,7 @@ import logging
 import yaml
 import numpy as np
 import pandas as pd
-from scipy.stats import ks_2samp
+from src.drift_detection import compute_drift
 from src.ml_governance import MLGovernance
 
 logger = logging.getLogger(__name__)
@@ -13,10 +13,15 @@ class RedTeamEvaluator:
             self.config = yaml.safe_load(f)
         self.thresholds = self.config["validation"]["thresholds"]
         self.governance = MLGovernance(config_path)
+        self.drift_config = self.config["validation"].get("drift", {})
+        self.last_drift_report = None
 
-    def evaluate_model(self, model, X_train, y_train, X_test, y_test, metrics):
+    def evaluate_model(self, model, X_train, y_train, X_test, y_test, metrics, model_path=None):
         """
         Rigorous evaluation of a candidate model.
+
+        With `model_path`, the per-feature drift report is stored in the registry
+        next to that candidate.
         """
         logger.info("🛡️  Starting Red Team Evaluation...")
         
@@ -34,16 +39,24 @@ class RedTeamEvaluator:
             
         logger.info("✅ Statistical thresholds passed.")
         
-        # 2. Concept/Data Drift Check (Simple Feature KS-Test)
-        # We compare test set distribution against training set for key features
-        drifted_features = []
-        for col in X_train.columns[:10]: # Check first 10 primary features for speed
-            stat, p_value = ks_2samp(X_train[col], X_test[col])
-            if p_value < self.thresholds['max_drift_p_value']:
-                drifted_features.append(col)
-                
+        # 2. Concept/Data Drift Check (KS + PSI on every feature)
+        # We compare test set distribution against training set, all features at once
+        report = compute_drift(X_train, X_test, n_bins=self.drift_config.get('psi_bins', 10))
+        self.last_drift_report = report
+        if model_path is not None:
+            self.governance.record_drift(model_path, report)
+        # Features with no values in one of the samples (e.g. all-NULL columns) have nothing to compare
+        comparable = report[report['psi'].notna()]
+        if len(comparable) < len(report):
+            logger.info(f"Drift skipped for {len(report) - len(comparable)} features empty in one sample.")
+        drifted = comparable[(comparable['ks_p_value'] < self.thresholds['max_drift_p_value'])
+                             | (comparable['psi'] > self.thresholds.get('max_psi', float('inf')))]
+        drifted_features = drifted['feature'].tolist()
+        logger.info(f"Drift checked on {len(comparable)} features. Top drifting:\n"
+                    f"{report.head(self.drift_config.get('report_top_k', 10)).to_string(index=False)}")
+
         if drifted_features:
-            logger.warning(f"⚠️  Feature Drift detected in: {drifted_features}")
+            logger.warning(f"⚠️  Feature Drift detected in {len(drifted_features)} features: {drifted_features[:20]}")
             if self.config["validation"]["red_team"]["fail_on_drift"]:
                 return False
         else:
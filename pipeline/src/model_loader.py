@@ -0,0 +1,336 @@
+"""
+Model Loader: Native Model Artifacts and a Process-Wide Booster Cache
+
+Risk models used to be pickled XGBRegressor objects that every caller re-read
+(and re-resolved through the registry JSON) on each use. Artifacts are now stored
+in XGBoost's native UBJSON format next to a feature manifest:
+
+    <model_dir>/xgboost_risk_model_<timestamp>.ubj             booster
+    <model_dir>/xgboost_risk_model_<timestamp>.features.json   manifest
+
+The manifest carries the feature names (in training column order), the matrix
+format the model was trained on and the sha256 of the booster bytes.
+
+Key Concepts:
+- `load_predictor(path)` reads the file once, hashes it and loads the booster from
+  the in-memory buffer. Loaded predictors live in a process-level LRU keyed by that
+  hash, so the API, inference and batch scoring share one booster per artifact.
+  The hash itself is remembered per (path, mtime, size), so a cache hit is a stat()
+  call, not a read and sha256 of the whole artifact.
+- `ModelPredictor` is immutable and thread-safe (`inplace_predict`): it aligns a
+  DataFrame or SparseFeatureMatrix to the model's features and predicts.
+- Legacy pickled artifacts (*.pkl) still load, through the same cache.
+- `ModelBundle` groups the per-target boosters of a multi-target run (same
+  features, same matrix format): the input is aligned once and every target is
+  scored from that one block.
+
+Usage:
+    from src.model_loader import load_registered_predictor
+
+    predictor = load_registered_predictor()
+    preds = predictor.predict(X)
+"""
+
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+import xgboost as xgb
+
+from src.feature_factory import SparseFeatureMatrix
+
+logger = logging.getLogger(__name__)
+
+NATIVE_SUFFIX = ".ubj"
+MANIFEST_SUFFIX = ".features.json"
+DEFAULT_CACHE_SIZE = 4
+
+_cache: "OrderedDict[str, ModelPredictor]" = OrderedDict()
+_hashes: "OrderedDict[tuple, str]" = OrderedDict()  # (path, st_mtime_ns, st_size) -> artifact hash
+_cache_lock = threading.Lock()
+_cache_size = DEFAULT_CACHE_SIZE
+
+
+def manifest_path(model_path) -> Path:
+    model_path = Path(model_path)
+    return model_path.with_name(model_path.stem + MANIFEST_SUFFIX)
+
+
+@dataclass(frozen=True)
+class ModelPredictor:
+    """A loaded booster plus the feature contract it was trained with."""
+    booster: xgb.Booster
+    feature_names: List[str]
+    matrix_format: str       # "dense" | "sparse"
+    artifact_hash: str
+    path: str
+    quantiles: Optional[List[float]] = None  # Multi-quantile models: one output column per quantile
+
+    def align(self, X):
+        """`X` reordered to the model's features, as the array type the model was trained on."""
+        if isinstance(X, SparseFeatureMatrix):
+            # Unknown columns come out empty, i.e. missing -- as absent entries were in training
+            return X.align(self.feature_names).matrix
+        if sp.issparse(X):
+            return X
+        if isinstance(X, pd.DataFrame):
+            if self.matrix_format == "sparse":
+                X = X.reindex(columns=self.feature_names).to_numpy(dtype=np.float32, na_value=np.nan)
+            else:
+                # Dense training filled NULLs with 0, so missing columns are filled the same way
+                return X.reindex(columns=self.feature_names, fill_value=0).to_numpy(dtype=np.float32,
+                                                                                   na_value=np.nan)
+        X = np.asarray(X, dtype=np.float32)
+        if self.matrix_format == "sparse":
+            # Sparse training never stored zeros or NULLs: both are missing, as in load_sparse_matrix
+            return sp.csr_matrix(np.nan_to_num(X, nan=0.0))
+        return X
+
+    def predict(self, X) -> np.ndarray:
+        """Point predictions, or (n_rows, n_quantiles) non-crossing quantiles for quantile models."""
+        preds = self.booster.inplace_predict(self.align(X), missing=np.nan)
+        if self.quantiles:
+            preds = np.sort(preds.reshape(len(preds), -1), axis=1)
+        return preds
+
+
+@dataclass(frozen=True)
+class ModelBundle:
+    """One predictor per target, all trained on the same feature matrix."""
+    version: str
+    predictors: Dict[str, ModelPredictor]
+
+    @property
+    def first(self) -> ModelPredictor:
+        return next(iter(self.predictors.values()))
+
+    @property
+    def feature_names(self) -> List[str]:
+        return self.first.feature_names
+
+    @property
+    def matrix_format(self) -> str:
+        return self.first.matrix_format
+
+    def predict_aligned(self, block) -> Dict[str, np.ndarray]:
+        """{target: predictions} for an input block already in manifest order."""
+        return {target: predictor.booster.inplace_predict(block, missing=np.nan)
+                for target, predictor in self.predictors.items()}
+
+    def predict(self, X) -> pd.DataFrame:
+        """One column per target; `X` is aligned once for all of them."""
+        preds = self.predict_aligned(self.first.align(X))
+        index = X.index if isinstance(X, pd.DataFrame) else None
+        return pd.DataFrame(preds, index=index)
+
+
+def save_model(model, model_path, feature_names, matrix_format="dense", quantiles=None) -> Tuple[Path, str]:
+    """
+    Write `model` (XGBRegressor or Booster) in native format plus its feature manifest.
+
+    Returns (model_path, artifact_hash).
+    """
+    model_path = Path(model_path).with_suffix(NATIVE_SUFFIX)
+    booster = model.get_booster() if hasattr(model, "get_booster") else model
+    buffer = bytes(booster.save_raw(raw_format="ubj"))
+    model_path.write_bytes(buffer)
+
+    artifact_hash = hashlib.sha256(buffer).hexdigest()
+    manifest_path(model_path).write_text(json.dumps({
+        "feature_names": list(feature_names),
+        "matrix_format": matrix_format,
+        "quantiles": list(quantiles) if quantiles else None,
+        "artifact_hash": artifact_hash,
+        "xgboost_version": xgb.__version__,
+    }, indent=2))
+    return model_path, artifact_hash
+
+
+def _build_predictor(path: Path, buffer: bytes, artifact_hash: str, fallback: dict) -> ModelPredictor:
+    if path.suffix == NATIVE_SUFFIX:
+        booster = xgb.Booster()
+        booster.load_model(bytearray(buffer))
+    else:
+        # Legacy pickled XGBRegressor
+        import joblib
+        booster = joblib.load(path).get_booster()
+
+    # Artifacts saved before manifests existed describe themselves via the registry entry
+    manifest = fallback
+    if manifest_path(path).exists():
+        manifest = json.loads(manifest_path(path).read_text())
+    feature_names = manifest.get("feature_names") or booster.feature_names
+    if feature_names is None:
+        raise ValueError(f"Model {path} has no feature manifest and no booster feature names.")
+    return ModelPredictor(
+        booster=booster,
+        feature_names=list(feature_names),
+        matrix_format=manifest.get("matrix_format", "dense"),
+        artifact_hash=artifact_hash,
+        path=str(path),
+        quantiles=manifest.get("quantiles"),
+    )
+
+
+def load_predictor(model_path, fallback: Optional[dict] = None) -> ModelPredictor:
+    """
+    Predictor for the artifact at `model_path`, served from the process LRU when possible.
+
+    fallback: feature_names/matrix_format to use when the artifact has no manifest
+    (e.g. its registry entry).
+    """
+    path = Path(model_path)
+    stat = path.stat()
+    file_key = (str(path.resolve()), stat.st_mtime_ns, stat.st_size)
+
+    with _cache_lock:
+        artifact_hash = _hashes.get(file_key)
+        predictor = _cache.get(artifact_hash) if artifact_hash else None
+        if predictor is not None:
+            _hashes.move_to_end(file_key)
+            _cache.move_to_end(artifact_hash)
+            return predictor
+
+    buffer = path.read_bytes()
+    artifact_hash = hashlib.sha256(buffer).hexdigest()
+
+    with _cache_lock:
+        _hashes[file_key] = artifact_hash
+        _hashes.move_to_end(file_key)
+        while len(_hashes) > _cache_size:
+            _hashes.popitem(last=False)
+        predictor = _cache.get(artifact_hash)
+        if predictor is not None:
+            _cache.move_to_end(artifact_hash)
+            return predictor
+
+    predictor = _build_predictor(path, buffer, artifact_hash, fallback or {})
+    logger.info(f"Loaded model {path.name} ({len(predictor.feature_names)} features, {predictor.matrix_format})")
+
+    with _cache_lock:
+        _cache[artifact_hash] = predictor
+        _cache.move_to_end(artifact_hash)
+        while len(_cache) > _cache_size:
+            _cache.popitem(last=False)
+    return predictor
+
+
+def set_cache_size(size: int):
+    global _cache_size
+    with _cache_lock:
+        _cache_size = max(1, size)
+        while len(_cache) > _cache_size:
+            _cache.popitem(last=False)
+        while len(_hashes) > _cache_size:
+            _hashes.popitem(last=False)
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
+        _hashes.clear()
+
+
+def resolve_model_path(model_info) -> Optional[Path]:
+    """Registry entry -> artifact path on disk (with the /tmp fallback for transient environments)."""
+    model_path = Path(model_info["path"])
+    if model_path.exists():
+        return model_path
+    try:
+        alt_path = Path("/tmp") / model_path.relative_to(model_path.parents[1])
+    except (ValueError, IndexError):
+        alt_path = None
+    if alt_path is not None and alt_path.exists():
+        return alt_path
+    logger.error(f"Model file not found: {model_path}")
+    return None
+
+
+def _registered_model_info(governance):
+    if governance is None:
+        from src.ml_governance import MLGovernance
+        governance = MLGovernance()
+
+    # One indexed lookup: PRODUCTION, else the latest CANDIDATE
+    model_info = governance.get_serving_model_info()
+    if not model_info:
+        logger.warning("No model found (Production or Candidate).")
+    elif model_info["status"] != "production":
+        logger.warning("No PRODUCTION model found in registry. Using latest CANDIDATE.")
+    return model_info
+
+
+def load_registered_predictor(governance=None) -> Optional[ModelPredictor]:
+    """Predictor for the PRODUCTION model, falling back to the latest CANDIDATE."""
+    model_info = _registered_model_info(governance)
+    if not model_info:
+        return None
+
+    model_path = resolve_model_path(model_info)
+    if model_path is None:
+        return None
+
+    return load_predictor(model_path, fallback=model_info)
+
+
+def load_online_predictor(governance=None) -> Optional[ModelPredictor]:
+    """Predictor for the latest model trained on the online feature set (see src/online_model.py)."""
+    if governance is None:
+        from src.ml_governance import MLGovernance
+        governance = MLGovernance()
+
+    model_info = governance.get_online_model_info()
+    if not model_info:
+        logger.warning("No online model registered. Train one with `python -m src.online_model`.")
+        return None
+
+    model_path = resolve_model_path(model_info)
+    if model_path is None:
+        return None
+
+    return load_predictor(model_path, fallback=model_info)
+
+
+def load_registered_interval_predictor(governance=None) -> Optional[ModelPredictor]:
+    """Quantile (prediction-interval) companion of the registered model, if it was trained with one."""
+    model_info = _registered_model_info(governance)
+    interval_info = (model_info or {}).get("quantile_model")
+    if not interval_info:
+        return None
+
+    model_path = resolve_model_path(interval_info)
+    if model_path is None:
+        return None
+
+    return load_predictor(model_path, fallback={**model_info, **interval_info})
+
+
+def load_registered_bundle(governance=None) -> Optional[ModelBundle]:
+    """The latest registered multi-target bundle, or None."""
+    if governance is None:
+        from src.ml_governance import MLGovernance
+        governance = MLGovernance()
+
+    bundle_info = governance.get_latest_bundle()
+    if not bundle_info:
+        logger.warning("No multi-target bundle found in registry.")
+        return None
+
+    predictors = {}
+    for target, member in bundle_info["members"].items():
+        model_path = resolve_model_path(member)
+        if model_path is None:
+            return None
+        predictors[target] = load_predictor(model_path, fallback=member)
+
+    if len({tuple(p.feature_names) for p in predictors.values()}) > 1:
+        raise ValueError(f"Bundle {bundle_info['version']} members disagree on their features.")
+    return ModelBundle(version=bundle_info["version"], predictors=predictors)
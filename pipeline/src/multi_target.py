@@ -0,0 +1,265 @@
+"""
+Multi-Target Training: Several Boosters Over One Quantized Feature Matrix
+
+Each target used to get its own training run: `prepare_data` was called per
+target, every run re-sketched the same feature quantiles, and the resulting
+models were registered (and scored) one at a time. This job trains a list of
+targets from one build of the features and registers them as one versioned bundle.
+
+Key Concepts:
+- The feature matrix is prepared once (from the training snapshot, see
+  src/training_snapshot.py). Targets that are also matrix columns are taken out of
+  X, so no target is a feature of another.
+- Each target still drops its own defining columns (`leakage_columns`, as
+  `prepare_data` does for a single target): they are blanked to missing in that
+  target's training matrix, so no split can use them, while the shared
+  quantization stays one sketch over one column layout.
+- Labels are read raw for every target -- from staging_feature_matrix when it has
+  the column, else from the Gold Layer -- and joined on the matrix rows'
+  (player_name, team, year), the Gold grain, so a traded player's rows keep their
+  own labels and NULL labels stay NULL (the prepared X and y have already filled
+  them with 0).
+- Quantization is computed once: a label-free QuantileDMatrix holds the hist cuts
+  and every target's training matrix is binned against it (`ref=`), so the
+  quantile sketch is not repeated per target.
+- Targets train in parallel threads. XGBoost releases the GIL while boosting, so
+  threads share the in-memory matrix instead of copying it into processes; each
+  worker gets an equal share of the cores.
+- Rows with a missing label get weight 0, as do the latest season's rows, which
+  are the holdout for the registered rmse/r2.
+- The bundle (one native artifact per target) is registered in one registry
+  transaction; `load_registered_bundle()` scores every target from one aligned
+  input block (see src/model_loader.py, src/batch_scoring.py --bundle).
+
+Usage:
+    python -m src.multi_target --targets edce_risk fair_market_value
+"""
+
+import argparse
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.metrics import mean_squared_error, r2_score
+
+from src.feature_factory import SparseFeatureMatrix, as_model_input
+from src.train_model import DB_PATH, MODEL_DIR, RiskModeler, leakage_columns, load_ml_config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TARGETS = ['edce_risk', 'fair_market_value', 'ml_fair_market_value']
+
+
+@dataclass
+class MultiTargetDataset:
+    """The shared feature matrix and one label column per target (NaN = unlabeled)."""
+    X: object                   # DataFrame or SparseFeatureMatrix, no target columns
+    labels: pd.DataFrame
+    metadata: pd.DataFrame
+    matrix_format: str
+
+    @property
+    def feature_names(self) -> List[str]:
+        return list(self.X.columns)
+
+
+class MultiTargetTrainer:
+    def __init__(self, db_path=DB_PATH, targets=None, matrix_format=None, max_workers=None, max_bin=None):
+        config = self._config()
+        self.db_path = db_path
+        self.targets = list(targets or config.get("targets") or DEFAULT_TARGETS)
+        self.matrix_format = matrix_format
+        self.max_workers = max_workers or config.get("max_workers")
+        self.max_bin = max_bin or config.get("max_bin", 256)
+
+    @staticmethod
+    def _config():
+        try:
+            return load_ml_config().get("multi_target", {}) or {}
+        except Exception as e:
+            logger.warning(f"Could not load config: {e}. Using multi-target defaults.")
+            return {}
+
+    def build_dataset(self) -> MultiTargetDataset:
+        """Prepare the feature matrix once and collect every target's labels against its rows."""
+        modeler = RiskModeler(self.db_path, read_only=True)
+        try:
+            # No exclusions here: every target's defining columns are masked per target in train()
+            X, _, metadata = modeler.prepare_data(self.targets[0], matrix_format=self.matrix_format, exclude=[])
+            matrix_format = "sparse" if isinstance(X, SparseFeatureMatrix) else "dense"
+
+            in_matrix = [t for t in self.targets[1:] if t in X.columns]
+            if in_matrix:
+                remaining = [c for c in X.columns if c not in in_matrix]
+                X = X.align(remaining) if matrix_format == "sparse" else X[remaining]
+
+            labels = {}
+            for target in self.targets:
+                joined = self._join_labels(modeler, metadata, target)
+                if joined is not None:
+                    labels[target] = joined
+        finally:
+            modeler.db.close()
+
+        skipped = [t for t in self.targets if t not in labels]
+        if skipped:
+            logger.warning(f"Targets not found in the matrix or the Gold Layer, skipped: {skipped}")
+        labels = pd.DataFrame({t: labels[t] for t in self.targets if t in labels})
+        logger.info(f"✓ Shared matrix: {len(X):,} rows × {len(X.columns)} features ({matrix_format}), "
+                    f"targets {list(labels.columns)}")
+        return MultiTargetDataset(X, labels, metadata.reset_index(drop=True), matrix_format)
+
+    @staticmethod
+    def _join_labels(modeler, metadata, target) -> Optional[np.ndarray]:
+        """Raw `target` per (player_name, team, year) of the matrix rows; NaN where it is NULL or absent."""
+        for source in ('staging_feature_matrix', 'fact_player_efficiency'):
+            tables = modeler.con.execute(
+                "SELECT 1 FROM information_schema.tables WHERE table_name = ?", [source]).fetchall()
+            if tables and target in modeler.con.execute(f"DESCRIBE {source}").df()['column_name'].tolist():
+                break
+        else:
+            return None
+        keys = pd.DataFrame({
+            'row_id': np.arange(len(metadata)),
+            'player_name': metadata['player_name'].to_numpy(),
+            'team': metadata['team'].to_numpy(),
+            'year': metadata['year'].to_numpy(),
+        })
+        modeler.con.register("matrix_keys", keys)
+        try:
+            joined = modeler.con.execute(f"""
+                SELECT k.row_id, f.value
+                FROM matrix_keys k
+                LEFT JOIN (
+                    -- One row per Gold key; AVG only guards against duplicated keys
+                    SELECT player_name, team, year, AVG({target}) AS value
+                    FROM {source} GROUP BY player_name, team, year
+                ) f USING (player_name, team, year)
+                ORDER BY k.row_id
+            """).df()
+        finally:
+            modeler.con.unregister("matrix_keys")
+        return joined['value'].to_numpy(dtype=np.float64)
+
+    @staticmethod
+    def _xgb_params(params: dict, nthread: int):
+        """XGBRegressor-style params -> (xgb.train params, num_boost_round)."""
+        params = dict(params)
+        num_boost_round = int(params.pop("n_estimators", 100))
+        params.pop("n_jobs", None)
+        params.pop("early_stopping_rounds", None)
+        if "random_state" in params:
+            params["seed"] = params.pop("random_state")
+        params.setdefault("objective", "reg:squarederror")
+        params["tree_method"] = "hist"
+        params["nthread"] = nthread
+        return params, num_boost_round
+
+    def _worker_plan(self, n_targets: int, params: dict):
+        """(workers, threads per worker): the cores are split evenly, capped by params n_jobs."""
+        cores = os.cpu_count() or 1
+        n_jobs = params.get("n_jobs")
+        if n_jobs is not None and n_jobs > 0:
+            cores = min(cores, n_jobs)
+        workers = max(1, min(n_targets, self.max_workers or cores))
+        return workers, max(1, cores // workers)
+
+    @staticmethod
+    def _mask_columns(X, columns):
+        """Model input with `columns` blanked to missing (X itself if none of them is present)."""
+        present = [c for c in columns if c in set(X.columns)]
+        if not present:
+            return as_model_input(X)
+        if isinstance(X, SparseFeatureMatrix):
+            # Absent CSR entries are missing, so dropping the stored values blanks the column
+            masked = X.matrix.copy()
+            masked.data[np.isin(masked.indices, X.columns.get_indexer(present))] = 0
+            masked.eliminate_zeros()
+            return masked
+        return X.assign(**{c: np.nan for c in present})
+
+    def train(self, dataset: MultiTargetDataset, params: Optional[dict] = None):
+        """Train one booster per target; returns ({target: booster}, {target: holdout metrics})."""
+        if params is None:
+            params = RiskModeler(self.db_path, read_only=True)._resolve_params()
+        workers, nthread = self._worker_plan(len(dataset.labels.columns), params)
+        train_params, num_boost_round = self._xgb_params(params, nthread)
+        train_params["max_bin"] = self.max_bin
+
+        X = as_model_input(dataset.X)
+        holdout = (dataset.metadata['year'] == dataset.metadata['year'].max()).to_numpy()
+        start = time.perf_counter()
+        # Hist cuts sketched once; every target is binned against them
+        cuts = xgb.QuantileDMatrix(X, max_bin=self.max_bin, nthread=workers * nthread)
+        logger.info(f"✓ Quantized {dataset.X.shape[0]:,} rows once in {time.perf_counter() - start:.1f}s "
+                    f"({self.max_bin} bins); training {len(dataset.labels.columns)} targets "
+                    f"on {workers} workers × {nthread} threads")
+
+        def fit(target):
+            y = dataset.labels[target].to_numpy()
+            labeled = ~np.isnan(y)
+            weight = (labeled & ~holdout).astype(np.float32)
+            X_target = self._mask_columns(dataset.X, leakage_columns(target))
+            dtrain = xgb.QuantileDMatrix(X_target, label=np.nan_to_num(y), weight=weight, ref=cuts,
+                                         max_bin=self.max_bin, nthread=nthread)
+            target_start = time.perf_counter()
+            booster = xgb.train(train_params, dtrain, num_boost_round=num_boost_round)
+            if isinstance(dataset.X, SparseFeatureMatrix):
+                booster.feature_names = dataset.feature_names
+
+            rows = np.flatnonzero(holdout & labeled)
+            metrics = {}
+            if len(rows):
+                preds = booster.inplace_predict(X[rows] if isinstance(dataset.X, SparseFeatureMatrix)
+                                                else dataset.X.iloc[rows], missing=np.nan)
+                metrics = {"rmse": float(np.sqrt(mean_squared_error(y[rows], preds))),
+                           "r2": float(r2_score(y[rows], preds)) if len(rows) > 1 else float("nan")}
+            logger.info(f"  {target}: {time.perf_counter() - target_start:.1f}s, holdout {metrics}")
+            return booster, metrics
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = dict(zip(dataset.labels.columns, pool.map(fit, dataset.labels.columns)))
+        logger.info(f"✓ Trained {len(results)} targets in {time.perf_counter() - start:.1f}s")
+        return ({t: booster for t, (booster, _) in results.items()},
+                {t: metrics for t, (_, metrics) in results.items()})
+
+    def register(self, dataset: MultiTargetDataset, boosters: Dict[str, xgb.Booster],
+                 metrics: Dict[str, dict], governance=None) -> str:
+        """Save every booster natively and register them as one bundle; returns the bundle version."""
+        from src.ml_governance import MLGovernance
+        from src.model_loader import save_model
+
+        version = datetime.now().strftime("%Y%m%d_%H%M%S")
+        members = {}
+        for target, booster in boosters.items():
+            path, artifact_hash = save_model(booster, MODEL_DIR / f"multi_target_{version}_{target}",
+                                             dataset.feature_names, dataset.matrix_format)
+            members[target] = {"path": str(path), "artifact_hash": artifact_hash, "metrics": metrics[target]}
+        (governance or MLGovernance()).register_bundle(version, members, dataset.feature_names,
+                                                       dataset.matrix_format)
+        return version
+
+    def run(self, governance=None) -> str:
+        dataset = self.build_dataset()
+        boosters, metrics = self.train(dataset)
+        return self.register(dataset, boosters, metrics, governance)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Train several targets on one quantized feature matrix.")
+    parser.add_argument("--targets", nargs="+", default=None, help="Defaults to multi_target.targets in ml_config.yaml")
+    parser.add_argument("--matrix-format", choices=["dense", "sparse"], default=None)
+    parser.add_argument("--max-workers", type=int, default=None)
+    args = parser.parse_args()
+
+    version = MultiTargetTrainer(targets=args.targets, matrix_format=args.matrix_format,
+                                 max_workers=args.max_workers).run()
+    logger.info(f"✓ Registered model bundle {version}")
@@ -0,0 +1,194 @@
+"""
+Online Feature Server: Low-Latency Feature Lookup for the API
+
+Loads the latest known feature vector of every active player from the FeatureStore
+into a dense float32 matrix with a player -> row index map, so request-time lookups
+are a dict access plus a row slice instead of a point-in-time pivot.
+
+Key Concepts:
+- A refresh builds a complete new snapshot off to the side and swaps it in with a
+  single reference assignment, so readers never observe a half-loaded state.
+- The snapshot remembers the store version it was built from; `refresh_if_stale`
+  only reloads after a new materialization has landed.
+- Refreshes are serialized by a lock and read through their own cursor, so request
+  threads never share the store's DuckDB connection. A request that finds a
+  refresh already running keeps serving the current snapshot instead of waiting.
+- Missing features are NaN (XGBoost's native missing value).
+
+Usage:
+    from src.online_features import OnlineFeatureServer
+
+    server = OnlineFeatureServer(store)
+    server.refresh()
+    vec = server.get_vector("Patrick Mahomes")
+    X, found = server.get_batch(["Patrick Mahomes", "Josh Allen"])
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.feature_store import FeatureStore
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class OnlineSnapshot:
+    """Immutable in-memory feature snapshot served by OnlineFeatureServer."""
+    matrix: np.ndarray                # (n_players, n_features) float32
+    feature_names: List[str]
+    row_index: Dict[str, int]         # player_name -> row
+    years: np.ndarray                 # prediction year of each row
+    store_version: int
+    as_of: date
+    loaded_at: float = field(default_factory=time.time)
+
+    @classmethod
+    def empty(cls) -> "OnlineSnapshot":
+        return cls(np.empty((0, 0), dtype=np.float32), [], {}, np.empty(0, dtype=np.int32), -1, date.min)
+
+
+class OnlineFeatureServer:
+    """Serves current per-player feature vectors from memory."""
+
+    def __init__(self, store: FeatureStore, min_refresh_interval: float = 30.0):
+        self.store = store
+        self.min_refresh_interval = min_refresh_interval
+        self._snapshot = OnlineSnapshot.empty()
+        self._last_check = 0.0
+        self._refresh_lock = threading.Lock()
+
+    @property
+    def snapshot(self) -> OnlineSnapshot:
+        return self._snapshot
+
+    @property
+    def feature_names(self) -> List[str]:
+        return self._snapshot.feature_names
+
+    def refresh(self, as_of: Optional[date] = None) -> OnlineSnapshot:
+        """
+        Rebuild the snapshot from the store and swap it in atomically.
+
+        For every player, the most recent prediction year with any feature known by
+        `as_of` is served, each feature at its latest version known by `as_of`.
+        """
+        with self._refresh_lock:
+            return self._load(as_of)
+
+    def _load(self, as_of: Optional[date] = None) -> OnlineSnapshot:
+        """Build and swap in a snapshot; the caller holds `_refresh_lock`."""
+        as_of = as_of or date.today()
+        con = self.store.con.cursor()
+        try:
+            version = self.store.get_store_version(con)
+            rows = con.execute("""
+                WITH latest_year AS (
+                    SELECT player_name, MAX(prediction_year) AS prediction_year
+                    FROM feature_values
+                    WHERE valid_from <= ?
+                    GROUP BY player_name
+                )
+                SELECT
+                    fv.player_name,
+                    fv.prediction_year,
+                    fv.feature_name,
+                    arg_max(fv.feature_value, fv.valid_from) AS feature_value
+                FROM feature_values fv
+                JOIN latest_year ly
+                    ON fv.player_name = ly.player_name
+                    AND fv.prediction_year = ly.prediction_year
+                WHERE fv.valid_from <= ?
+                GROUP BY ALL
+            """, [as_of, as_of]).fetchnumpy()
+        finally:
+            con.close()
+
+        players, player_codes = np.unique(rows["player_name"], return_inverse=True)
+        feature_names, feature_codes = np.unique(rows["feature_name"], return_inverse=True)
+
+        matrix = np.full((len(players), len(feature_names)), np.nan, dtype=np.float32)
+        matrix[player_codes, feature_codes] = np.ma.filled(
+            np.ma.asarray(rows["feature_value"], dtype=np.float64), np.nan
+        )
+        years = np.zeros(len(players), dtype=np.int32)
+        years[player_codes] = rows["prediction_year"]
+
+        snapshot = OnlineSnapshot(
+            matrix=matrix,
+            feature_names=feature_names.tolist(),
+            row_index={name: i for i, name in enumerate(players.tolist())},
+            years=years,
+            store_version=version,
+            as_of=as_of,
+        )
+        self._snapshot = snapshot  # Atomic swap
+        self._last_check = time.time()
+
+        logger.info(f"✓ Online features loaded: {matrix.shape[0]:,} players × {matrix.shape[1]} features "
+                    f"(store version {version}, {matrix.nbytes / 1024:.0f} KB)")
+        return snapshot
+
+    def refresh_if_stale(self) -> bool:
+        """Reload if a new materialization landed; checks at most every `min_refresh_interval`s."""
+        if self._snapshot.store_version >= 0 and time.time() - self._last_check < self.min_refresh_interval:
+            return False
+        if not self._refresh_lock.acquire(blocking=False):
+            return False  # Another request is refreshing; serve the current snapshot
+        try:
+            now = time.time()
+            if self._snapshot.store_version >= 0 and now - self._last_check < self.min_refresh_interval:
+                return False
+            self._last_check = now
+
+            con = self.store.con.cursor()
+            try:
+                version = self.store.get_store_version(con)
+            finally:
+                con.close()
+            if version == self._snapshot.store_version:
+                return False
+            self._load()
+            return True
+        finally:
+            self._refresh_lock.release()
+
+    def get_vector(self, player_name: str) -> Optional[np.ndarray]:
+        """Feature vector for one player (a view into the snapshot), or None if unknown."""
+        snapshot = self._snapshot
+        row = snapshot.row_index.get(player_name)
+        if row is None:
+            return None
+        return snapshot.matrix[row]
+
+    def get_features(self, player_name: str) -> Optional[Dict[str, float]]:
+        """Non-missing features of one player as a dict, or None if unknown."""
+        snapshot = self._snapshot
+        row = snapshot.row_index.get(player_name)
+        if row is None:
+            return None
+        values = snapshot.matrix[row]
+        mask = ~np.isnan(values)
+        return dict(zip(np.asarray(snapshot.feature_names)[mask].tolist(), values[mask].tolist()))
+
+    def get_batch(self, player_names: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Feature matrix for a batch of players.
+
+        Returns:
+            (X, found): X is (len(player_names), n_features) float32 with NaN rows for
+            unknown players; found is a boolean mask of players present in the snapshot
+        """
+        snapshot = self._snapshot
+        rows = np.fromiter((snapshot.row_index.get(p, -1) for p in player_names),
+                           dtype=np.int64, count=len(player_names))
+        found = rows >= 0
+        X = np.full((len(player_names), len(snapshot.feature_names)), np.nan, dtype=np.float32)
+        X[found] = snapshot.matrix[rows[found]]
+        return X, found
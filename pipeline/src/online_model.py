@@ -0,0 +1,100 @@
+"""
+Online Risk Model: A Risk Model Trained on the Features the API Can Serve
+
+The API scores risk from the OnlineFeatureServer's in-memory vectors, which hold
+only the feature store's lag and interaction features (a few dozen columns). The
+registered production model is trained on the full staging matrix (about a
+thousand columns), so almost none of its inputs exist online. This job trains a
+model on exactly the online feature set and registers it for the API.
+
+Key Concepts:
+- The online feature set (every feature materialized in `feature_values`) is
+  registered as the feature selection "online"; training projects the staging
+  matrix to it with `prepare_data(feature_set=...)`. Lag columns carry the same
+  names in the staging matrix and the feature store.
+- The model is dense: missing online features arrive as NaN and are filled with 0
+  by CompiledPredictor.align, as NULLs were filled at training time.
+- The latest season is held out (weight 0) for the registered rmse/r2.
+- It is registered with status 'online' (`get_online_model_info`), so it never
+  replaces the production model of the batch paths.
+
+Usage:
+    python -m src.online_model --target edce_risk
+"""
+
+import argparse
+import logging
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.metrics import mean_squared_error, r2_score
+
+from src.feature_store import FeatureStore
+from src.train_model import DB_PATH, MODEL_DIR, RiskModeler
+
+logger = logging.getLogger(__name__)
+
+ONLINE_SELECTION = "online"
+
+
+def register_online_selection(db_path=DB_PATH) -> list:
+    """Register every materialized feature store feature as the "online" selection."""
+    store = FeatureStore(db_path=db_path)
+    try:
+        names = [r[0] for r in store.con.execute(
+            "SELECT DISTINCT feature_name FROM feature_values ORDER BY 1").fetchall()]
+        if not names:
+            raise ValueError("No materialized features. Run the feature store refresh first.")
+        # No coefficients: the selection is defined by what the online store serves
+        store.register_feature_selection(ONLINE_SELECTION, pd.Series(np.nan, index=names), method='online')
+    finally:
+        store.db.close()
+    return names
+
+
+def train_online_model(db_path=DB_PATH, target_col='edce_risk', params: Optional[dict] = None,
+                       governance=None) -> str:
+    """Train a dense model on the online feature set and register it; returns the artifact path."""
+    from src.ml_governance import MLGovernance
+    from src.model_loader import save_model
+
+    register_online_selection(db_path)
+    modeler = RiskModeler(db_path, read_only=True)
+    try:
+        X, y, metadata = modeler.prepare_data(target_col, matrix_format="dense", feature_set=ONLINE_SELECTION)
+        if params is None:
+            params = modeler._resolve_params()
+    finally:
+        modeler.db.close()
+    if X.shape[1] == 0:
+        raise ValueError("None of the online features are in the staging matrix.")
+
+    holdout = (metadata['year'] == metadata['year'].max()).to_numpy()
+    model = xgb.XGBRegressor(**params)
+    model.fit(X, y, sample_weight=(~holdout).astype(np.float32), verbose=False)
+    metrics = {}
+    if holdout.any():
+        preds = model.predict(X[holdout])
+        metrics = {"rmse": float(np.sqrt(mean_squared_error(y[holdout], preds))),
+                   "r2": float(r2_score(y[holdout], preds)) if holdout.sum() > 1 else float("nan")}
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    model_path, artifact_hash = save_model(model, MODEL_DIR / f"online_{target_col}_model_{timestamp}",
+                                           list(X.columns), "dense")
+    (governance or MLGovernance()).register_online_model(model_path, metrics, list(X.columns), "dense",
+                                                         artifact_hash)
+    logger.info(f"✓ Online model trained on {X.shape[1]} features ({len(X):,} rows), holdout {metrics}")
+    return str(model_path)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Train the API's risk model on the online feature set.")
+    parser.add_argument("--target", default="edce_risk")
+    args = parser.parse_args()
+
+    path = train_online_model(target_col=args.target)
+    logger.info(f"✓ Registered online model {path}")
@@ -1,10 +1,38 @@
+"""
+Historical Simulation: Expanding-Window Predictions for Every Past Season
+
+Replays "what would the model have said at the time" for a range of seasons:
+each season is predicted by a model trained only on the seasons before it.
+
+Key Concepts:
+- The history is sorted by year and written once as float32 arrays (the
+  walk-forward validator's layout, src/backtesting.py); each season trains on a
+  leading row range of it, and seasons run concurrently in a spawn process pool.
+- Per-season results are built as columnar frames straight from the sorted
+  arrays -- no per-player rows are assembled in Python.
+- Output is a Parquet dataset partitioned by (source, year), shared with the
+  walk-forward backtest's predictions (source "backtest"); a rerun replaces only
+  the seasons it produced. The frontend's JSON is exported by DuckDB from the
+  writing producer's partitions only, one compact record per line.
+
+Usage:
+    python -m src.simulate_history
+"""
 
-import pandas as pd
-import numpy as np
-import xgboost as xgb
-import yaml
 import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+
+import duckdb
+import numpy as np
+import pandas as pd
+import yaml
+
+from src.backtesting import _fit_fold, _fit_incremental, expanding_folds, write_sorted_history
 from src.db_manager import DBManager
 from src.feature_store import FeatureStore
 
@@ -12,6 +40,10 @@ from src.feature_store import FeatureStore
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+DEFAULT_OUTPUT_DIR = "web/data/historical_predictions"
+DEFAULT_JSON_PATH = "web/data/historical_predictions.json"
+HISTORY_COLUMNS = ["player_name", "year", "team", "actual", "predicted", "error"]
+
 class HistoricalSimulator:
     def __init__(self, config_path="pipeline/config/ml_config.yaml"):
         # Fix relative path if running from root
@@ -25,83 +57,192 @@ class HistoricalSimulator:
         self.fs = FeatureStore(self.db)
         self.params = self.config["models"]["xgboost"]["params"]
         self.target_col = self.config["training"]["target"]
+        backtest_config = self.config.get("validation", {}).get("backtest", {}) or {}
+        self.incremental_rounds = backtest_config.get("incremental_rounds", 50)
+        simulation_config = self.config.get("simulation", {}) or {}
+        self.max_workers = simulation_config.get("max_workers") or os.cpu_count() or 1
+        self.output_dir, self.json_path = history_paths(self.config)
 
-    def run_simulation(self, start_year=2021, end_year=2024):
+    def run_simulation(self, start_year=2021, end_year=2024, mode="full"):
         """
         Expanding Window Simulation:
         - For target_year in [2021, 2022, 2023, 2024]:
             - Train on ALL data where year < target_year
             - Predict on data where year == target_year
             - Store predictions
+
+        mode: 'full' retrains each season from scratch; 'incremental' continues the
+        previous season's booster on the newly appended season(s); 'compare' runs
+        both, keeps the full predictions and adds `predicted_incremental`.
         """
-        logger.info(f"🚀 Starting Expanding Window Simulation ({start_year}-{end_year})...")
+        logger.info(f"🚀 Starting Expanding Window Simulation ({start_year}-{end_year}, {mode})...")
         
         # 1. Load ALL Data
         df = self.fs.load_features()
         
         # 2. Filter for valid data (contracts > 0)
-        df = df[df['cap_hit'] > 0].copy()
-        
-        simulation_history = []
+        df = df[df['cap_hit'] > 0]
         
         # 3. Features
         features = self.config["features"]["player_stats"] + \
                    self.config["features"]["contract_info"] + \
                    self.config["features"]["team_context"]
-                   
-        # Ensure calculated features exist or compute them if needed
-        # (Assuming load_features returns ready-to-use data)
 
-        for test_year in range(start_year, end_year + 1):
-            logger.info(f"🔄 Simulating Season: {test_year}")
-            
-            # SPLIT: Past vs Present
-            train_mask = df['year'] < test_year
-            test_mask = df['year'] == test_year
-            
-            X_train = df.loc[train_mask, features]
-            y_train = df.loc[train_mask, self.target_col]
-            
-            X_test = df.loc[test_mask, features]
-            y_test = df.loc[test_mask, self.target_col]
-            
-            if X_test.empty:
-                logger.warning(f"⚠️ No data found for {test_year}. Skipping.")
-                continue
-                
-            # TRAIN (The "Time Machine" Model)
-            model = xgb.XGBRegressor(**self.params)
-            model.fit(X_train, y_train)
-            
-            # PREDICT
-            preds = model.predict(X_test)
-            
-            # LOG RESULTS
-            # We want to capture the "Truth" of that moment
-            for idx, (player_idx, row) in enumerate(df[test_mask].iterrows()):
-                simulation_history.append({
-                    "player_name": row['player_name'],
-                    "year": int(test_year),
-                    "team": row['team'],
-                    "actual": float(row['cap_hit']),
-                    "predicted": float(max(0, preds[idx])), # No negative salaries
-                    "error": float(row['cap_hit'] - preds[idx])
-                })
-                
-            logger.info(f"✅ {test_year} Simulated. Generated {len(preds)} predictions.")
-
-        # 4. Compile & Save
-        results_df = pd.DataFrame(simulation_history)
-        
-        # Save for Frontend
-        output_path = Path("web/data/historical_predictions.json")
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        results_df.to_json(output_path, orient="records", indent=2)
-        logger.info(f"💾 Simulation Complete. Results saved to {output_path}")
+        results_df = self.simulate(df, features, start_year, end_year, mode)
+
+        # 4. Save for Frontend
+        write_history(results_df, "simulation", self.output_dir, self.json_path)
+        logger.info(f"💾 Simulation Complete. Results saved to {self.output_dir} and {self.json_path}")
         
         return results_df
 
+    def _fold_threads(self, n_workers):
+        """Threads per season fit: the params' n_jobs, capped so workers share the cores."""
+        cores = os.cpu_count() or 1
+        requested = self.params.get("n_jobs", -1)
+        share = max(1, cores // n_workers)
+        return share if requested is None or requested <= 0 else min(requested, share)
+
+    def simulate(self, df, features, start_year, end_year, mode="full"):
+        """Expanding-window predictions for the seasons of `df` in [start_year, end_year], as one frame."""
+        if mode not in ("full", "incremental", "compare"):
+            raise ValueError(f"Unknown simulation mode: {mode}")
+
+        # SPLIT: Past vs Present -- sorted once, so every season is "rows before it"
+        order = np.argsort(df['year'].to_numpy(), kind='stable')
+        sorted_years = df['year'].to_numpy()[order]
+        folds = [f for f in expanding_folds(sorted_years, start_year, min_train=1) if f[0] <= end_year]
+        if not folds:
+            logger.warning(f"⚠️ No seasons to simulate in {start_year}-{end_year}.")
+            return pd.DataFrame(columns=HISTORY_COLUMNS)
+
+        # TRAIN (The "Time Machine" Models), seasons concurrently
+        n_workers = max(1, min(self.max_workers, len(folds))) if mode != "incremental" else 1
+        n_jobs = self._fold_threads(n_workers)
+        logger.info(f"  ⚙️ {len(folds)} seasons ({mode}) on {n_workers} worker(s) × {n_jobs} thread(s)")
+
+        full_preds, incremental_preds = None, None
+        with tempfile.TemporaryDirectory(prefix="simulation_") as tmp:
+            spec = write_sorted_history(df[features], order, tmp)
+            y_path = str(Path(tmp) / "y.npy")
+            np.save(y_path, df[self.target_col].to_numpy(dtype=np.float32)[order])
+
+            if mode in ("full", "compare"):
+                tasks = [
+                    {"spec": spec, "y_path": y_path, "params": self.params, "n_jobs": n_jobs,
+                     "test_year": test_year, "train_end": train_end, "test_end": test_end}
+                    for test_year, train_end, test_end in folds
+                ]
+                if n_workers == 1:
+                    full_preds = dict(map(_fit_fold, tasks))
+                else:
+                    # spawn: workers must not inherit DuckDB/OpenMP thread state via fork
+                    context = multiprocessing.get_context("spawn")
+                    with ProcessPoolExecutor(max_workers=n_workers, mp_context=context) as pool:
+                        full_preds = dict(pool.map(_fit_fold, tasks))
+
+            if mode in ("incremental", "compare"):
+                # Warm start: only the season(s) appended since the previous fold
+                incremental_preds = _fit_incremental(spec, y_path, folds, self.params,
+                                                     self.incremental_rounds, self._fold_threads(1))
+
+        # LOG RESULTS: one columnar frame per season, capturing the "Truth" of that moment
+        cap_hit = df['cap_hit'].to_numpy(dtype=np.float64)
+        target = df[self.target_col].to_numpy(dtype=np.float64)
+        frames, tradeoffs = [], []
+        for test_year, train_end, test_end in folds:
+            rows = order[train_end:test_end]
+            preds, seconds = (incremental_preds if mode == "incremental" else full_preds)[test_year]
+            preds = np.asarray(preds, dtype=np.float64)
+            frame = pd.DataFrame({
+                "player_name": df['player_name'].to_numpy()[rows],
+                "year": int(test_year),
+                "team": df['team'].to_numpy()[rows],
+                "actual": cap_hit[rows],
+                "predicted": np.maximum(0, preds),  # No negative salaries
+                "error": cap_hit[rows] - preds,
+            })
+            if mode == "compare":
+                inc_preds, inc_seconds = incremental_preds[test_year]
+                inc_preds = np.asarray(inc_preds, dtype=np.float64)
+                frame["predicted_incremental"] = np.maximum(0, inc_preds)
+                rmse = float(np.sqrt(np.mean((target[rows] - preds) ** 2)))
+                inc_rmse = float(np.sqrt(np.mean((target[rows] - inc_preds) ** 2)))
+                tradeoffs.append({"year": test_year, "rmse": rmse, "rmse_incremental": inc_rmse,
+                                  "fit_seconds": seconds, "fit_seconds_incremental": inc_seconds})
+                logger.info(f"⚖️ {test_year}: warm start RMSE {inc_rmse:.4f} vs {rmse:.4f} "
+                            f"({inc_seconds:.2f}s vs {seconds:.2f}s)")
+            frames.append(frame)
+            logger.info(f"✅ {test_year} Simulated. Generated {len(frame)} predictions.")
+
+        if tradeoffs:
+            # Accuracy/time trade-off of warm starts, per season
+            self.tradeoffs = pd.DataFrame(tradeoffs)
+            logger.info(f"Warm start trade-off:\n{self.tradeoffs.to_string(index=False)}")
+        return pd.concat(frames, ignore_index=True)
+
+
+def history_paths(config):
+    """(Parquet dataset directory, JSON export path) from an ml_config dict's `simulation` section."""
+    simulation_config = (config or {}).get("simulation", {}) or {}
+    return (simulation_config.get("output_dir", DEFAULT_OUTPUT_DIR),
+            simulation_config.get("json_path", DEFAULT_JSON_PATH))
+
+
+def write_history(results, source, output_dir=DEFAULT_OUTPUT_DIR, json_path=DEFAULT_JSON_PATH):
+    """
+    Write `results` into `source`'s seasons of the partitioned Parquet dataset, then export its JSON.
+
+    source: the producer ("simulation" -- cap_hit predictions, or "backtest" --
+    training-target predictions). Partitions are keyed by (source, year), so a
+    producer only ever replaces its own seasons.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    if len(results):
+        for year in pd.unique(results['year']):
+            shutil.rmtree(output_dir / f"source={source}" / f"year={int(year)}", ignore_errors=True)
+        con = duckdb.connect()
+        try:
+            con.register("history", results.assign(source=source))
+            con.execute(f"COPY history TO '{output_dir}' "
+                        f"(FORMAT PARQUET, PARTITION_BY (source, year), OVERWRITE_OR_IGNORE)")
+        finally:
+            con.close()
+    export_history(source, output_dir, json_path)
+
+
+def export_history(source, output_dir=DEFAULT_OUTPUT_DIR, json_path=DEFAULT_JSON_PATH, start_year=None,
+                   end_year=None):
+    """
+    Export every stored season of `source` (optionally within [start_year, end_year]) as
+    one compact JSON array, one record per line. Returns the number of records.
+    """
+    output_dir, json_path = Path(output_dir), Path(json_path)
+    if not any((output_dir / f"source={source}").glob("year=*/*.parquet")):
+        return 0
+    json_path.parent.mkdir(parents=True, exist_ok=True)
+
+    con = duckdb.connect()
+    try:
+        bounds = [f"year >= {int(start_year)}"] if start_year is not None else []
+        bounds += [f"year <= {int(end_year)}"] if end_year is not None else []
+        # Only this producer's partitions are read, so the export never mixes sources
+        con.execute(f"""
+            CREATE TEMP VIEW exported AS
+            SELECT player_name, year::INTEGER AS year, team, * EXCLUDE (player_name, year, team, source)
+            FROM read_parquet('{output_dir}/source={source}/year=*/*.parquet',
+                              hive_partitioning = true, union_by_name = true)
+            WHERE {" AND ".join(bounds) or "true"}
+        """)
+        tmp_path = json_path.with_name(json_path.name + ".tmp")
+        con.execute(f"COPY (SELECT * FROM exported ORDER BY year, player_name) TO '{tmp_path}' (FORMAT JSON, ARRAY true)")
+        os.replace(tmp_path, json_path)
+        return con.execute("SELECT count(*) FROM exported").fetchone()[0]
+    finally:
+        con.close()
+
+
 if __name__ == "__main__":
     sim = HistoricalSimulator()
     # User requested "last 3-4 years", let's do 2021, 2022, 2023, 2024
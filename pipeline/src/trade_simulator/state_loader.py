@@ -15,6 +15,11 @@ import duckdb
 import pandas as pd
 from typing import Dict, List
 from .state import LeagueState, TeamState
+try:
+    from src.win_probability import RiskIntervalLookup
+except ImportError:
+    # Run as src/run_trade_sim.py (src/ itself on the path)
+    from win_probability import RiskIntervalLookup
 
 class StateLoader:
     def __init__(self, db_path: str, year: int = 2025, min_cap_hit: float = None):
@@ -181,9 +186,13 @@ class StateLoader:
             df_players = self.con.execute(qm).df()
             df_players['top_factors'] = None
 
+        # Model prediction intervals (present once a quantile model has been trained)
+        intervals = RiskIntervalLookup.from_db(self.con, self.year)
+
         # Convert to dictionary list
         market = []
         for idx, row in df_players.iterrows():
+            band = intervals.get(row['name'])
             market.append({
                 "id": f"p_{idx}",
                 "name": row['name'],
@@ -191,7 +200,8 @@ class StateLoader:
                 "position": row['position'],
                 "value": row['value'],
                 "cap_hit": row['cap_hit'],
-                "risk_factors": row['top_factors'] if 'top_factors' in row and pd.notna(row['top_factors']) else None
+                "risk_factors": row['top_factors'] if 'top_factors' in row and pd.notna(row['top_factors']) else None,
+                "risk_interval": [band[0], band[2]] if band else None
             })
             
         state.market_players = market
@@ -10,9 +10,12 @@ except ImportError:
     shap = None
 import matplotlib.pyplot as plt
 import os
+import time
 from sklearn.metrics import mean_squared_error, r2_score
 from pathlib import Path
 from src.feature_store import FeatureStore
+from src.feature_dtypes import apply_dtypes, load_dtype_policy, log_dtype_report
+from src.feature_factory import SparseFeatureMatrix, as_model_input, load_sparse_matrix, take_rows
 
 import numpy as np
 # PATCH NUMPY FOR SHAP COMPATIBILITY
@@ -27,12 +30,37 @@ except Exception:
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-from src.config_loader import get_db_path
+from src.config_loader import get_db_path, get_training_snapshot_dir
+from src.training_snapshot import TrainingSnapshotStore
 
 DB_PATH = get_db_path()
 MODEL_DIR = Path(os.getenv("MODEL_DIR", "/tmp/models"))
 MODEL_DIR.mkdir(parents=True, exist_ok=True)
 
+# LEAKAGE PREVENTION: the Gold Layer columns each target is computed from
+# (scripts/medallion_pipeline.py); they are never features of a model of that target
+TARGET_LEAKAGE_COLUMNS = {
+    'edce_risk': ['potential_dead_cap_millions', 'dead_cap_millions',
+                  'signing_bonus_millions', 'salaries_dead_cap_millions'],
+    'fair_market_value': ['total_tds', 'total_pass_yds', 'total_rush_yds', 'total_rec_yds',
+                          'total_sacks', 'total_int', 'total_penalty_yards',
+                          'ied_overpayment', 'value_metric_proxy'],
+}
+# The ML fair market value is fitted to the production value, so it shares its sources
+TARGET_LEAKAGE_COLUMNS['ml_fair_market_value'] = TARGET_LEAKAGE_COLUMNS['fair_market_value'] + ['fair_market_value']
+
+def leakage_columns(target_col):
+    """Columns that define `target_col` (empty for targets without a known definition)."""
+    return list(TARGET_LEAKAGE_COLUMNS.get(target_col, []))
+
+def load_ml_config():
+    config_path = "pipeline/config/ml_config.yaml"
+    if not Path(config_path).exists():
+        config_path = "config/ml_config.yaml"
+    import yaml
+    with open(config_path, "r") as f:
+        return yaml.safe_load(f)
+
 class RiskModeler:
     def __init__(self, db_path=DB_PATH, read_only=False):
         self.db_path = db_path
@@ -40,7 +68,81 @@ class RiskModeler:
         self.db = DBManager(db_path)
         self.con = self.db.con
 
-    def prepare_data(self, target_col='edce_risk'):
+    def prepare_data(self, target_col='edce_risk', matrix_format=None, use_snapshot=True, feature_set=None,
+                     exclude=None):
+        """
+        Load X, y, metadata from staging_feature_matrix.
+
+        matrix_format: "sparse" streams the matrix into a SparseFeatureMatrix (CSR) that
+        goes straight into XGBoost; "dense" returns a DataFrame. Defaults to
+        `feature_matrix.format` in ml_config.yaml.
+
+        use_snapshot: serve the result from a content-addressed training snapshot
+        (see src/training_snapshot.py), preparing and writing it on a miss. A
+        `read_only` modeler serves hits but never writes snapshots.
+
+        feature_set: project X to these columns -- a list, or the name of a selection
+        registered in the feature store (see src/feature_pruner.py).
+
+        exclude: columns kept out of X; defaults to the target's defining columns
+        (`leakage_columns`).
+        """
+        if exclude is None:
+            exclude = leakage_columns(target_col)
+        if feature_set is not None:
+            X, y, metadata = self.prepare_data(target_col, matrix_format, use_snapshot, exclude=exclude)
+            return self._project(X, feature_set), y, metadata
+
+        if matrix_format is None:
+            try:
+                matrix_format = load_ml_config().get("feature_matrix", {}).get("format", "dense")
+            except Exception as e:
+                logger.warning(f"Could not load config: {e}. Using dense feature matrix.")
+                matrix_format = "dense"
+        prepare = self._prepare_sparse_data if matrix_format == "sparse" else self._prepare_dense_data
+        if not use_snapshot:
+            return prepare(target_col, exclude)
+
+        store = TrainingSnapshotStore(get_training_snapshot_dir())
+        fingerprints = [store.fingerprint(self.con, "staging_feature_matrix")]
+        staging_cols = self.con.execute("DESCRIBE staging_feature_matrix").df()['column_name'].tolist()
+        if target_col not in staging_cols:
+            # The target is joined in from the Gold Layer, so it is part of the content too
+            fingerprints.append(store.fingerprint(
+                self.con, f"SELECT player_name, team, year, {target_col} FROM fact_player_efficiency"))
+        # The dtype policy shapes the prepared frame, so a policy change is a new snapshot
+        policy = [[rule.family, rule.pattern, rule.dtype] for rule in load_dtype_policy(self.con)]
+        key = store.make_key(*fingerprints, target=target_col, matrix_format=matrix_format,
+                             exclude=sorted(exclude), dtype_policy=policy)
+
+        cached = store.get(key)
+        if cached is not None:
+            return cached
+
+        X, y, metadata = prepare(target_col, exclude)
+        if self.read_only:
+            return X, y, metadata
+        store.put(key, X, y, metadata, fingerprint=fingerprints[0])
+        # Serve the snapshot itself, so cold and warm runs see identical (float32) data
+        return store.get(key)
+
+    def _project(self, X, feature_set):
+        """Keep only the columns of `feature_set` (in matrix order)."""
+        if isinstance(feature_set, str):
+            from src.feature_store import load_feature_selection
+            name, feature_set = feature_set, load_feature_selection(self.con, feature_set)
+            if feature_set is None:
+                raise ValueError(f"No feature selection registered as '{name}'.")
+        wanted = set(feature_set)
+        keep = [c for c in X.columns if c in wanted]
+        if len(keep) < len(wanted):
+            logger.warning(f"{len(wanted) - len(keep)} selected features are not in the matrix.")
+        logger.info(f"✓ Projected to {len(keep)} of {len(X.columns)} features.")
+        if isinstance(X, SparseFeatureMatrix):
+            return X.align(keep)
+        return X[keep]
+
+    def _prepare_dense_data(self, target_col, exclude):
         logger.info(f"Loading feature matrix from staging_feature_matrix...")
         
         # Direct read from staging (bypass FeatureStore for now as FeatureFactory populates staging)
@@ -56,24 +158,20 @@ class RiskModeler:
         if target_col not in df.columns:
              # Fallback: Try to join from fact_player_efficiency if missing
              logger.warning(f"Target {target_col} not in matrix. Joining from Gold Layer...")
-             df_target = self.con.execute(f"SELECT player_name, year, {target_col} FROM fact_player_efficiency").df()
-             df = pd.merge(df, df_target, on=['player_name', 'year'], how='inner')
+             df_target = self.con.execute(f"SELECT player_name, team, year, {target_col} FROM fact_player_efficiency").df()
+             df = pd.merge(df, df_target, on=['player_name', 'team', 'year'], how='inner')
 
         # Merge handled implicitly or above
         
         # 1. Split into features and target
-        # LEAKAGE PREVENTION: Drop columns that define average/risk directly
-        skip_cols = [
-            'player_name', 'year', 'team', target_col, 
-            'potential_dead_cap_millions',
-            'dead_cap_millions', 
-            'signing_bonus_millions',
-            'salaries_dead_cap_millions'
-        ]
+        # LEAKAGE PREVENTION: Drop columns that define the target directly
+        skip_cols = ['player_name', 'year', 'team', target_col, *exclude]
         X = df.drop(columns=[c for c in skip_cols if c in df.columns])
         
         # Robust numeric conversion
         X = X.apply(pd.to_numeric, errors='coerce').dropna(axis=1, how='all').fillna(0)
+        X, dtype_report = apply_dtypes(X, load_dtype_policy(self.con))
+        log_dtype_report(dtype_report)
         y = df[target_col].fillna(0)
         
         # 2. Retain player info for joining results back
@@ -82,53 +180,119 @@ class RiskModeler:
         logger.info(f"✓ Data Prepared: {len(X)} rows, {len(X.columns)} features.")
         return X, y, metadata
 
+    def _prepare_sparse_data(self, target_col, exclude):
+        logger.info(f"Loading sparse feature matrix from staging_feature_matrix...")
+
+        staging_cols = self.con.execute("DESCRIBE staging_feature_matrix").df()['column_name'].tolist()
+        if target_col in staging_cols:
+            query = "SELECT * FROM staging_feature_matrix WHERE year BETWEEN 2015 AND 2025"
+        else:
+            logger.warning(f"Target {target_col} not in matrix. Joining from Gold Layer...")
+            query = f"""
+                SELECT s.*, f.{target_col}
+                FROM staging_feature_matrix s
+                JOIN fact_player_efficiency f USING (player_name, team, year)
+                WHERE s.year BETWEEN 2015 AND 2025
+            """
+
+        # LEAKAGE PREVENTION: Drop columns that define the target directly
+        X, metadata, target = load_sparse_matrix(
+            self.con, query,
+            exclude=exclude,
+            metadata_cols=['player_name', 'year', 'team'],
+            target_col=target_col,
+        )
+        if len(X) == 0:
+            raise ValueError("Staging feature matrix is empty. Run Feature Factory first.")
+
+        y = pd.Series(target, name=target_col).fillna(0)
+        logger.info(f"✓ Data Prepared: {len(X)} rows, {len(X.columns)} features (sparse, {X.density:.1%} dense).")
+        return X, y, metadata
+
+    def _resolve_params(self):
+        # Use tuned params from the registry (see src/hyperparameter_tuner.py), else config params
+        params = None
+        try:
+             from src.ml_governance import MLGovernance
+             params = MLGovernance().get_tuned_params()
+             if params:
+                  logger.info(f"Using tuned parameters from the model registry: {params}")
+        except Exception as e:
+             logger.warning(f"Could not read tuned parameters: {e}")
+        if not params:
+             try:
+                  params = load_ml_config()["models"]["xgboost"]["params"]
+             except Exception as e:
+                  logger.warning(f"Could not load config: {e}. Using defaults.")
+                  params = {'n_estimators': 100, 'max_depth': 4, 'learning_rate': 0.1}
+        return params
+
     def train_xgboost(self, X, y, metadata):
         logger.info("Training Production XGBoost Model (with Walk-Forward Validation)...")
+        params = self._resolve_params()
         
         # 1. Run Backtest First
         from src.backtesting import WalkForwardValidator
         validator = WalkForwardValidator()
+        validator.params = params
         backtest_results, predictions_df = validator.run_backtest(X, y, metadata)
         validator.generate_report(backtest_results)
         
         # Save Historical Predictions for Frontend (Validation Layer)
         if not predictions_df.empty:
-            # Assume running from project root
-            preds_target = Path("web/data/historical_predictions.json")
-            preds_target.parent.mkdir(parents=True, exist_ok=True)
-            
-            # Simple JSON export
-            predictions_df.to_json(preds_target, orient="records", indent=2)
-            logger.info(f"✓ Historical Predictions saved to {preds_target}")
+            # Assume running from project root; same partitioned dataset + JSON export as src/simulate_history.py
+            from src.simulate_history import history_paths, write_history
+            predictions_df['error'] = predictions_df['actual'] - predictions_df['predicted']
+            output_dir, json_path = history_paths(load_ml_config())
+            write_history(predictions_df, "backtest", output_dir, json_path)
+            logger.info(f"✓ Historical Predictions saved to {output_dir} (source=backtest) and {json_path}")
         
         # 2. Train Final Production Model on ALL History
         # We use all available data to predict the "unknown" future (2025/2026)
         logger.info("Training Final Production Model on full history...")
         
-        # Use config params
-        try:
-             import yaml
-             config_path = "pipeline/config/ml_config.yaml"
-             if not Path(config_path).exists():
-                 config_path = "config/ml_config.yaml"
-             with open(config_path, "r") as f:
-                  config = yaml.safe_load(f)
-             params = config["models"]["xgboost"]["params"]
-        except Exception as e:
-             logger.warning(f"Could not load config: {e}. Using defaults.")
-             params = {'n_estimators': 100, 'max_depth': 4, 'learning_rate': 0.1}
-        
         model = xgb.XGBRegressor(**params)
-        model.fit(X, y, verbose=False)
+        model.fit(as_model_input(X), y, verbose=False)
+        if isinstance(X, SparseFeatureMatrix):
+            # CSR input carries no column names; keep the vocabulary on the booster
+            model.get_booster().feature_names = list(X.columns)
         
         # 3. Use the latest fold's test set as a proxy for "X_test" for SHAP/Metrics
         # This is strictly for reporting purposes
         latest_year = metadata['year'].max()
-        test_mask = metadata['year'] == latest_year
-        X_test_proxy = X[test_mask]
+        test_mask = (metadata['year'] == latest_year).to_numpy()
+        X_test_proxy = take_rows(X, np.flatnonzero(test_mask))
         
         logger.info(f"✓ Model Trained on full history ({len(X)} rows).")
         return model, X_test_proxy, backtest_results
+    def train_quantile_model(self, X, y, quantiles=None):
+        """
+        One multi-quantile model for prediction intervals around the point estimate.
+
+        A single booster with objective reg:quantileerror fits every quantile in one
+        pass over one quantized (hist) dataset, with the point model's parameters.
+        """
+        if quantiles is None:
+            try:
+                quantiles = load_ml_config()["models"]["xgboost"].get("interval_quantiles", [0.1, 0.5, 0.9])
+            except Exception as e:
+                logger.warning(f"Could not load config: {e}. Using default quantiles.")
+                quantiles = [0.1, 0.5, 0.9]
+        logger.info(f"Training Quantile Model for {y.name} (quantiles {quantiles})...")
+
+        model = xgb.XGBRegressor(**{
+            **self._resolve_params(),
+            "objective": "reg:quantileerror",
+            "quantile_alpha": np.asarray(quantiles, dtype=np.float64),
+            "tree_method": "hist",
+        })
+        start = time.perf_counter()
+        model.fit(as_model_input(X), y, verbose=False)
+        if isinstance(X, SparseFeatureMatrix):
+            model.get_booster().feature_names = list(X.columns)
+        logger.info(f"✓ Quantile Model Trained ({len(quantiles)} quantiles in {time.perf_counter() - start:.1f}s).")
+        return model, list(quantiles)
+
     def generate_shap_report(self, model, X_test):
         if shap is None:
             logger.warning("SHAP library not available. Skipping explanation.")
@@ -136,6 +300,8 @@ class RiskModeler:
             
         try:
             logger.info("Generating SHAP Transparency Explainer...")
+            if isinstance(X_test, SparseFeatureMatrix):
+                X_test = X_test.to_frame()
             explainer = shap.TreeExplainer(model)
             shap_values = explainer.shap_values(X_test)
             
@@ -150,23 +316,37 @@ class RiskModeler:
             logger.warning(f"SHAP generation failed (optional): {e}")
             return None
 
-    def save_predictions(self, model, X, metadata, metrics):
-        import joblib
+    def save_predictions(self, model, X, metadata, metrics, quantile_model=None, quantiles=None):
+        """
+        Persist predictions to `prediction_results` and register the model as a candidate.
+
+        With a quantile model (see train_quantile_model), the interval bounds are stored
+        next to the point estimate as risk_lower / risk_median / risk_upper (the lowest,
+        middle and highest quantile) and the quantile artifact is registered with it.
+        """
         import json
         import yaml
         from datetime import datetime
         from src.ml_governance import MLGovernance
+        from src.model_loader import save_model
         
         logger.info("Saving Predictions and Model Artifacts...")
         
         # 1. Save Predictions to DB
-        preds = model.predict(X)
+        preds = model.predict(as_model_input(X))
         metadata['predicted_risk_score'] = preds
+        if quantile_model is not None:
+            bands = np.sort(np.asarray(quantile_model.predict(as_model_input(X))).reshape(len(preds), -1), axis=1)
+            metadata['risk_lower'] = bands[:, 0]
+            metadata['risk_median'] = bands[:, bands.shape[1] // 2]
+            metadata['risk_upper'] = bands[:, -1]
         
         if self.db.db_path and "read_only" in self.db.db_path: # Simulated read_only check for manager
              logger.info("Database is read-only. Skipping persistence to 'prediction_results' table.")
         else:
-            self.db.execute("CREATE OR REPLACE TABLE prediction_results AS SELECT * FROM metadata", {"metadata": metadata})
+            # Per-year replace: seasons scored by src/batch_scoring.py outside this run survive
+            from src.batch_scoring import replace_year_partitions
+            replace_year_partitions(self.con, "prediction_results", metadata)
             logger.info("✓ Predictions persisted to 'prediction_results' table.")
         
         # 2. Save Model Artifact
@@ -178,67 +358,117 @@ class RiskModeler:
             
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         model_filename = ml_config["models"]["xgboost"]["file_pattern"].format(timestamp=timestamp)
-        model_path = MODEL_DIR / model_filename
-        joblib.dump(model, model_path)
+        matrix_format = "sparse" if isinstance(X, SparseFeatureMatrix) else "dense"
+        # Native booster format + feature manifest (see src/model_loader.py)
+        model_path, artifact_hash = save_model(model, MODEL_DIR / model_filename, list(X.columns), matrix_format)
         logger.info(f"✓ Model artifact saved to: {model_path}")
+        quantile_info = None
+        if quantile_model is not None:
+            quantile_path, quantile_hash = save_model(
+                quantile_model, model_path.with_name(model_path.stem + "_quantile"),
+                list(X.columns), matrix_format, quantiles=quantiles
+            )
+            quantile_info = {"path": str(quantile_path), "artifact_hash": quantile_hash, "quantiles": quantiles}
+            logger.info(f"✓ Quantile model artifact saved to: {quantile_path}")
         
         # 3. Register as Candidate
         governance = MLGovernance()
         governance.register_candidate(
             model_path=model_path,
             metrics=metrics,
-            feature_names=list(X.columns)
+            feature_names=list(X.columns),
+            matrix_format=matrix_format,
+            artifact_hash=artifact_hash,
+            quantile_model=quantile_info
         )
         logger.info("✓ Model registered in governance registry.")
 
-    def save_explanations(self, model, X, metadata):
-        if shap is None:
-            logger.warning("SHAP library not available. Skipping explanation.")
-            return
+    def save_explanations(self, model, X, metadata, top_k=3, min_abs_contribution=None):
+        """
+        Per-prediction rationale from XGBoost's native TreeSHAP (`pred_contribs`).
+
+        Writes two tables:
+        - prediction_explanations:   player_name, year, base_value, top_factors (top-k text)
+        - prediction_contributions:  player_name, year, feature_name, contribution, one row
+          per feature whose |contribution| >= `min_abs_contribution`
+        """
+        if min_abs_contribution is None:
+            try:
+                min_abs_contribution = load_ml_config().get("explanations", {}).get("min_abs_contribution", 1e-3)
+            except Exception:
+                min_abs_contribution = 1e-3
 
         try:
-            logger.info("Generating SHAP Explanations for Rationale (Top 3 Factors)...")
-            explainer = shap.TreeExplainer(model)
-            # Use X (full dataset)
-            shap_values = explainer.shap_values(X)
-            
-            explanations = []
-            all_shap_scores = []
-            feature_names = X.columns.tolist()
-            
-            # Efficiently format strings & capture all data
-            import json
-            for i, row_values in enumerate(shap_values):
-                # filter out 0s for text, but keep for JSON?
-                # User asked for "ALL the scores", so let's keep even small ones?
-                # Actually, 0 means no contribution. but let's store non-zero.
-                contribs = [(feature_names[j], float(val)) for j, val in enumerate(row_values)]
-                
-                # 1. For Text Rationale (Top 3)
-                # Sort by abs value
-                contribs.sort(key=lambda x: abs(x[1]), reverse=True)
-                top_3 = contribs[:3]
-                factors = ", ".join([f"{name} ({val:+.2f})" for name, val in top_3])
-                explanations.append(factors)
-                
-                # 2. For Full Data Storage (JSON)
-                # Store as dict: {feature: score}
-                all_data = {name: val for name, val in contribs if val != 0}
-                all_shap_scores.append(json.dumps(all_data))
-                
-            metadata_copy = metadata.copy()
-            metadata_copy['top_factors'] = explanations
-            metadata_copy['all_factors'] = all_shap_scores
-            
+            logger.info(f"Generating SHAP Explanations for Rationale (Top {top_k} Factors)...")
+            start = time.perf_counter()
+            feature_names = np.asarray(X.columns)
+            phi, base_value = shap_contributions(model, X)
+
+            # 1. Top-k by |contribution|: argpartition, then sort only the k winners
+            top_idx, top_vals = top_k_contributions(phi, top_k)
+            names = feature_names[top_idx]
+            top_factors = [
+                ", ".join(f"{n} ({v:+.2f})" for n, v in zip(row_names, row_vals))
+                for row_names, row_vals in zip(names.tolist(), top_vals.tolist())
+            ]
+
+            explanations = pd.DataFrame({
+                'player_name': metadata['player_name'].to_numpy(),
+                'year': metadata['year'].to_numpy(),
+                'base_value': base_value,
+                'top_factors': top_factors,
+            })
+
+            # 2. Full contributions as a long, sparse table
+            rows, cols = np.nonzero(np.abs(phi) >= min_abs_contribution)
+            contributions = pd.DataFrame({
+                'player_name': explanations['player_name'].to_numpy()[rows],
+                'year': explanations['year'].to_numpy()[rows],
+                'feature_name': pd.Categorical.from_codes(cols, categories=feature_names),
+                'contribution': phi[rows, cols],
+            })
+            logger.info(f"✓ Explained {len(explanations):,} predictions in {time.perf_counter() - start:.2f}s "
+                        f"({len(contributions):,} contributions with |value| >= {min_abs_contribution})")
+
             if self.read_only:
                 logger.info("Database is read-only. Skipping persistence to 'prediction_explanations' table.")
             else:
-                self.db.execute("CREATE OR REPLACE TABLE prediction_explanations AS SELECT player_name, year, top_factors, all_factors FROM metadata_copy", {"metadata_copy": metadata_copy})
-                logger.info("✓ Explanations persisted to 'prediction_explanations' (Top 3 + Full JSON).")
-            
+                self.db.execute("CREATE OR REPLACE TABLE prediction_explanations AS SELECT * FROM explanations", {"explanations": explanations})
+                self.db.execute("""
+                    CREATE OR REPLACE TABLE prediction_contributions AS
+                    SELECT player_name, year, feature_name::VARCHAR AS feature_name, contribution
+                    FROM contributions
+                    ORDER BY player_name, year
+                """, {"contributions": contributions})
+                logger.info("✓ Explanations persisted to 'prediction_explanations' (Top 3) and 'prediction_contributions' (long).")
+
         except Exception as e:
             logger.warning(f"Failed to save explanations: {e}")
 
+
+def shap_contributions(model, X):
+    """
+    Exact TreeSHAP values from XGBoost itself (no shap dependency).
+
+    Returns (phi, base_value): phi is (n_rows, n_features) float32; base_value is the
+    per-row bias term, so phi.sum(axis=1) + base_value equals the margin prediction.
+    """
+    booster = model.get_booster() if hasattr(model, "get_booster") else model
+    data = xgb.DMatrix(as_model_input(X), feature_names=list(X.columns), missing=np.nan)
+    contribs = booster.predict(data, pred_contribs=True)
+    return contribs[:, :-1], contribs[:, -1]
+
+
+def top_k_contributions(phi, k=3):
+    """Column indices and values of each row's k largest |contributions|, largest first."""
+    k = min(k, phi.shape[1])
+    if k == 0:
+        return np.empty((len(phi), 0), dtype=np.int64), np.empty((len(phi), 0), dtype=phi.dtype)
+    idx = np.argpartition(-np.abs(phi), k - 1, axis=1)[:, :k]
+    vals = np.take_along_axis(phi, idx, axis=1)
+    order = np.argsort(-np.abs(vals), axis=1, kind='stable')
+    return np.take_along_axis(idx, order, axis=1), np.take_along_axis(vals, order, axis=1)
+
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser()
@@ -246,7 +476,9 @@ if __name__ == "__main__":
     args = parser.parse_args()
     
     modeler = RiskModeler(read_only=args.read_only)
-    X, y, metadata = modeler.prepare_data()
+    # A pruned feature set registered by src/feature_pruner.py, if one is configured
+    feature_set = load_ml_config().get("feature_selection", {}).get("feature_set")
+    X, y, metadata = modeler.prepare_data(feature_set=feature_set)
     model, X_test, backtest_results = modeler.train_xgboost(X, y, metadata)
     
     # Validation against config thresholds using AVERAGE backtest performance
@@ -258,6 +490,8 @@ if __name__ == "__main__":
         "r2": float(avg_r2)
     }
     
+    quantile_model, quantiles = modeler.train_quantile_model(X, y)
+    
     modeler.generate_shap_report(model, X_test)
-    modeler.save_predictions(model, X, metadata, metrics)
+    modeler.save_predictions(model, X, metadata, metrics, quantile_model, quantiles)
     modeler.save_explanations(model, X, metadata)
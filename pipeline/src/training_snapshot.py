@@ -0,0 +1,154 @@
+"""
+Training Snapshots: Content-Addressed, Memory-Mapped Training Data
+
+`RiskModeler.prepare_data` (and everything built on it: training, pruning,
+backtest scripts) used to re-read the whole staging matrix and redo the numeric
+conversion on every run. A snapshot stores the prepared result once:
+
+    <snapshot_dir>/<key>/
+        manifest.json       feature names, per-column dtypes, format, shape, fingerprint, target
+        X.npy               dense float32 matrix            (format "dense")
+        data.npy, indices.npy, indptr.npy                    (format "sparse", CSR)
+        y.npy               target
+        metadata.parquet    player_name, year, team
+
+Key Concepts:
+- The key hashes the content fingerprint of the source table(s) (schema plus an
+  order-independent sum of row hashes, computed inside DuckDB), the target, the
+  matrix format, the feature_dtypes policy and SNAPSHOT_VERSION. Any change to
+  the data or the policy yields a new key.
+- Read-only callers (pruning, tuning, multi-target) serve hits but never write.
+- Sparse arrays are loaded with np.load(mmap_mode='r'): a hit costs milliseconds
+  and pages in only what is touched.
+- Dense X is stored as one float32 array, with each column's prepared dtype
+  (the feature_dtypes policy: uint8 one-hots, int16 counts, ...) in the manifest.
+  A hit restores those dtypes into an ordinary writable DataFrame, so a served
+  frame is indistinguishable from a freshly prepared one.
+- Snapshots are written to a temp directory and renamed into place, so concurrent
+  readers never see a partial snapshot.
+
+Usage:
+    from src.training_snapshot import TrainingSnapshotStore
+
+    store = TrainingSnapshotStore("data/cache/training")
+    key = store.make_key(store.fingerprint(con, "staging_feature_matrix"), target="edce_risk")
+    cached = store.get(key)
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from src.feature_factory import SparseFeatureMatrix
+
+logger = logging.getLogger(__name__)
+
+# Bump when prepare_data's transformation changes, so old snapshots stop matching
+SNAPSHOT_VERSION = 2
+
+
+class TrainingSnapshotStore:
+    """Content-addressed snapshots of prepared (X, y, metadata)."""
+
+    def __init__(self, snapshot_dir):
+        # Created on the first put(), so read-only callers leave no directories behind
+        self.snapshot_dir = Path(snapshot_dir)
+
+    @staticmethod
+    def fingerprint(con, query: str) -> str:
+        """Content hash of a table or query: schema plus an order-independent row hash."""
+        source = query if query.lstrip().upper().startswith("SELECT") else f"SELECT * FROM {query}"
+        schema = con.execute(f"DESCRIBE {source}").fetchall()
+        row_hash, row_count = con.execute(
+            f"SELECT SUM(hash(t)::HUGEINT), COUNT(*) FROM ({source}) t"
+        ).fetchone()
+        payload = json.dumps([[c[0], c[1]] for c in schema] + [str(row_hash), row_count])
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    @staticmethod
+    def make_key(*fingerprints, **params) -> str:
+        payload = json.dumps({"fingerprints": fingerprints, "version": SNAPSHOT_VERSION, **params},
+                             sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+    def get(self, key: str) -> Optional[Tuple[object, pd.Series, pd.DataFrame]]:
+        """(X, y, metadata) for `key` (sparse X memory-mapped), or None on a miss."""
+        path = self.snapshot_dir / key
+        try:
+            manifest = json.loads((path / "manifest.json").read_text())
+        except FileNotFoundError:
+            return None
+
+        if manifest["format"] == "sparse":
+            matrix = sp.csr_matrix(
+                (np.load(path / "data.npy", mmap_mode="r"),
+                 np.load(path / "indices.npy", mmap_mode="r"),
+                 np.load(path / "indptr.npy", mmap_mode="r")),
+                shape=tuple(manifest["shape"]),
+            )
+            X = SparseFeatureMatrix(matrix, manifest["feature_names"])
+        else:
+            X = pd.DataFrame(np.load(path / "X.npy"), columns=manifest["feature_names"])
+            restore = {name: dtype for name, dtype in zip(manifest["feature_names"], manifest["dtypes"])
+                       if dtype != "float32"}
+            if restore:
+                X = X.astype(restore)
+
+        y = pd.Series(np.load(path / "y.npy", mmap_mode="r"), name=manifest["target"])
+        metadata = pd.read_parquet(path / "metadata.parquet")
+        logger.info(f"✓ Training snapshot hit: {key} ({manifest['shape'][0]:,} × {manifest['shape'][1]})")
+        return X, y, metadata
+
+    def put(self, key: str, X, y: pd.Series, metadata: pd.DataFrame, fingerprint: str = None):
+        """Write a snapshot atomically (temp directory + rename)."""
+        path = self.snapshot_dir / key
+        tmp = self.snapshot_dir / f".{key}.{uuid.uuid4().hex}.tmp"
+        tmp.mkdir(parents=True)
+        try:
+            if isinstance(X, SparseFeatureMatrix):
+                fmt = "sparse"
+                np.save(tmp / "data.npy", X.matrix.data.astype(np.float32, copy=False))
+                np.save(tmp / "indices.npy", X.matrix.indices)
+                np.save(tmp / "indptr.npy", X.matrix.indptr)
+            else:
+                fmt = "dense"
+                np.save(tmp / "X.npy", X.to_numpy(dtype=np.float32, na_value=np.nan))
+            np.save(tmp / "y.npy", y.to_numpy(dtype=np.float64))
+            metadata.reset_index(drop=True).to_parquet(tmp / "metadata.parquet", index=False)
+            (tmp / "manifest.json").write_text(json.dumps({
+                "format": fmt,
+                "feature_names": list(X.columns),
+                "dtypes": None if fmt == "sparse" else [str(dtype) for dtype in X.dtypes],
+                "shape": list(X.shape),
+                "target": y.name,
+                "fingerprint": fingerprint,
+                "version": SNAPSHOT_VERSION,
+                "created_at": datetime.now().isoformat(),
+            }))
+            try:
+                os.rename(tmp, path)
+            except OSError:
+                # Another process published the same snapshot first; contents are identical
+                shutil.rmtree(tmp, ignore_errors=True)
+        except Exception:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        logger.info(f"✓ Training snapshot written: {path}")
+
+    def clear(self):
+        """Remove every snapshot."""
+        if not self.snapshot_dir.exists():
+            return
+        for path in self.snapshot_dir.iterdir():
+            if path.is_dir():
+                shutil.rmtree(path, ignore_errors=True)
@@ -1,10 +1,62 @@
 
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 import math
 import logging
 
 logger = logging.getLogger(__name__)
 
+INTERVAL_COLS = ('risk_lower', 'risk_median', 'risk_upper')
+
+
+class RiskIntervalLookup:
+    """
+    Model prediction intervals per player, read once from `prediction_results`.
+
+    Request handlers attach them to trade assets, so real uncertainty bands are
+    served without a model call at request time.
+    """
+
+    def __init__(self, intervals: Dict[str, Tuple[float, float, float]], year: Optional[int] = None):
+        self.intervals = intervals
+        self.year = year
+
+    @classmethod
+    def from_db(cls, con, year: Optional[int] = None) -> "RiskIntervalLookup":
+        tables = con.execute(
+            "SELECT 1 FROM information_schema.tables WHERE table_name = 'prediction_results'").fetchall()
+        if not tables:
+            # Fresh warehouse / before the first training run
+            logger.warning("prediction_results does not exist yet; using point risk only.")
+            return cls({}, year)
+        columns = {row[0] for row in con.execute("DESCRIBE prediction_results").fetchall()}
+        if not set(INTERVAL_COLS) <= columns:
+            logger.warning("prediction_results has no interval columns; using point risk only.")
+            return cls({}, year)
+        if year is None:
+            year = con.execute("SELECT MAX(year) FROM prediction_results WHERE risk_lower IS NOT NULL").fetchone()[0]
+        rows = con.execute("""
+            SELECT player_name, MAX(risk_lower)::DOUBLE, MAX(risk_median)::DOUBLE, MAX(risk_upper)::DOUBLE
+            FROM prediction_results
+            WHERE year = ? AND risk_lower IS NOT NULL
+            GROUP BY player_name
+        """, [year]).fetchall()
+        logger.info(f"✓ Loaded risk intervals for {len(rows):,} players ({year})")
+        return cls({name: tuple(band) for name, *band in rows}, year)
+
+    def get(self, player_name: str) -> Optional[Tuple[float, float, float]]:
+        return self.intervals.get(player_name)
+
+    def attach(self, assets: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Add `risk_interval` ([lower, upper]) to player assets that do not carry one."""
+        for asset in assets:
+            band = self.intervals.get(asset.get('name'))
+            if band is None or asset.get('risk_interval'):
+                continue
+            asset['risk_interval'] = [band[0], band[2]]
+            asset.setdefault('risk_score', band[1])
+        return assets
+
+
 class WinProbabilityModel:
     """
     Quantifies the impact of roster moves on Projected Wins and Vegas Odds.
@@ -86,9 +138,12 @@ class WinProbabilityModel:
             total_weighted_surplus += weighted_surplus
 
             # 2. Calculate Variance Contribution
-            # High Risk (0.9) adds more uncertainty to the win total.
-            # Variance metric: Risk * Impact
-            total_variance += (risk * abs(weighted_surplus))
+            # With a model prediction interval, its width is the uncertainty;
+            # otherwise High Risk (0.9) stands in for it.
+            # Variance metric: Uncertainty * Impact
+            interval = asset.get('risk_interval')
+            uncertainty = (interval[1] - interval[0]) if interval else risk
+            total_variance += (uncertainty * abs(weighted_surplus))
 
         # 3. Apply Logistic Dampening (Diminishing Returns)
         # For a single trade, linear approximation is usually fine, 
@@ -32,3 +32,99 @@ def test_evaluate_endpoint_structure():
     assert "grade" in data
     assert "reason" in data
     assert data["status"] == "accepted"
+
+def test_risk_batch_scores_with_the_registered_online_model(tmp_path, monkeypatch):
+    from datetime import date
+    import numpy as np
+    import pandas as pd
+    import yaml
+    from api import main
+    from src import model_loader, online_model, train_model
+    from src.feature_store import FeatureStore
+    from src.ml_governance import MLGovernance
+    from src.online_features import OnlineFeatureServer
+
+    monkeypatch.setattr(train_model, "get_training_snapshot_dir", lambda: tmp_path / "snapshots")
+    monkeypatch.setattr(online_model, "MODEL_DIR", tmp_path)
+    config = tmp_path / "ml_config.yaml"
+    config.write_text(yaml.safe_dump({"model_registry": {"registry_path": str(tmp_path / "registry.json")}}))
+    governance = MLGovernance(str(config))
+
+    # Feature store over a small Gold Layer, and a wide staging matrix around its features
+    db_path = str(tmp_path / "api.duckdb")
+    store = FeatureStore(db_path=db_path)
+    store.initialize_schema()
+    store.db.execute("""
+        CREATE TABLE fact_player_efficiency AS
+        SELECT 'P' || (i % 60) AS player_name, 2016 + i // 60 AS year, 'T' AS team,
+               (i * 7) % 13 AS total_tds, 22 + i % 11 AS age
+        FROM range(480) r(i)
+    """)
+    store.refresh_features(as_of=date(2024, 3, 1))
+    matrix = store.get_historical_features(min_year=2016, max_year=2023)
+    rng = np.random.default_rng(0)
+    noise = pd.DataFrame(rng.normal(size=(len(matrix), 200)), columns=[f"staging_{j}" for j in range(200)])
+    staging = pd.concat([matrix.assign(team="T"), noise], axis=1)
+    staging["edce_risk"] = staging["total_tds_lag_1"].fillna(0) * 2 + rng.normal(scale=0.1, size=len(staging))
+    store.db.execute("CREATE TABLE staging_feature_matrix AS SELECT * FROM staging", {"staging": staging})
+    store.db.close()
+
+    path = online_model.train_online_model(db_path, params={"n_estimators": 20, "max_depth": 3}, governance=governance)
+    registered = model_loader.load_online_predictor(governance)
+    assert registered.path == path and set(registered.feature_names) <= set(matrix.columns)
+    assert governance.get_serving_model_info() is None  # Never a batch serving candidate
+
+    server = OnlineFeatureServer(FeatureStore(db_path=db_path, read_only=True), min_refresh_interval=3600)
+    server.refresh(as_of=date(2024, 3, 1))
+    monkeypatch.setattr(main, "_feature_server", server)
+    monkeypatch.setattr(main, "_risk_predictor", None)
+    monkeypatch.setattr(main, "_risk_column_index", None)
+    monkeypatch.setattr(model_loader, "load_online_predictor", lambda: registered)
+    client = TestClient(app)
+
+    data = client.post("/api/risk/batch", json={"player_names": ["P1", "Nobody", "P2"]}).json()
+    assert data["coverage"] == 1.0 and data["found"] == [True, False, True]
+    X, _ = server.get_batch(["P1", "P2"])
+    online = pd.DataFrame(X, columns=server.feature_names)[registered.feature_names].fillna(0)
+    np.testing.assert_allclose([data["risk_scores"][0], data["risk_scores"][2]], registered.predict(online),
+                               rtol=1e-5)
+    assert data["risk_scores"][1] is None
+
+    # Vectors that lack most of the model's features are refused, not scored as missing
+    class Server:
+        feature_names = registered.feature_names[:1]
+        def get_batch(self, names):
+            return np.ones((len(names), 1), dtype=np.float32), np.ones(len(names), dtype=bool)
+    monkeypatch.setattr(main, "get_feature_server", lambda: Server())
+    response = client.post("/api/risk/batch", json={"player_names": ["P1"]})
+    assert response.status_code == 503 and "minimum 90%" in response.json()["detail"]
+
+def test_concurrent_first_requests_build_one_feature_server(monkeypatch):
+    import threading
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    from api import main
+    from src import feature_store
+
+    built = []
+
+    class Server:
+        def __init__(self, store):
+            built.append(self)
+        def refresh(self):
+            time.sleep(0.05)  # Wide window for a second request to race the first
+        def refresh_if_stale(self):
+            return False
+
+    monkeypatch.setattr(main, "_feature_server", None)
+    monkeypatch.setattr(main, "OnlineFeatureServer", Server)
+    monkeypatch.setattr(feature_store, "FeatureStore", lambda read_only: None)
+    barrier = threading.Barrier(8)
+
+    def first_request(_):
+        barrier.wait()
+        return main.get_feature_server()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        servers = list(pool.map(first_request, range(8)))
+    assert len(built) == 1 and all(s is built[0] for s in servers)
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+import scipy.sparse as sp
+from src.backtesting import WalkForwardValidator
+from src.feature_factory import SparseFeatureMatrix
+
+@pytest.fixture
+def history():
+    rng = np.random.default_rng(0)
+    n = 600
+    years = np.repeat(np.arange(2015, 2021), n // 6)
+    rng.shuffle(years)  # Folds must not rely on the input being sorted
+    X = pd.DataFrame(rng.normal(size=(n, 5)), columns=[f"f{i}" for i in range(5)])
+    X.loc[rng.random(n) < 0.5, 'f4'] = 0.0
+    y = pd.Series(X['f0'] * 2 + rng.normal(scale=0.1, size=n))
+    metadata = pd.DataFrame({'player_name': [f"P{i}" for i in range(n)], 'year': years, 'team': 'KC'})
+    return X, y, metadata
+
+def make_validator(max_workers):
+    validator = WalkForwardValidator(max_workers=max_workers)
+    validator.params = {'n_estimators': 20, 'max_depth': 3, 'learning_rate': 0.3, 'random_state': 42, 'n_jobs': 1}
+    return validator
+
+def test_parallel_backtest_matches_sequential(history):
+    X, y, metadata = history
+    seq_results, seq_preds = make_validator(1).run_backtest(X, y, metadata)
+    par_results, par_preds = make_validator(2).run_backtest(X, y, metadata)
+    
+    assert seq_results['test_year'].tolist() == [2018, 2019, 2020]
+    assert list(seq_results.columns) == ["test_year", "rmse", "r2", "train_size", "test_size", "fit_seconds"]
+    assert seq_results['train_size'].tolist() == [300, 400, 500]
+    pd.testing.assert_frame_equal(seq_results.drop(columns='fit_seconds'), par_results.drop(columns='fit_seconds'))
+    pd.testing.assert_frame_equal(seq_preds, par_preds)
+    
+    # Predictions are keyed back to the original rows
+    row = seq_preds.iloc[0]
+    assert metadata.set_index('player_name').loc[row['player_name'], 'year'] == row['year'] == 2018
+
+def test_sparse_backtest_matches_dense_rows(history):
+    X, y, metadata = history
+    sparse = SparseFeatureMatrix(sp.csr_matrix(X.to_numpy(dtype=np.float32)), list(X.columns))
+    results, preds = make_validator(1).run_backtest(sparse, y, metadata)
+    
+    assert results['test_size'].tolist() == [100, 100, 100]
+    assert len(preds) == 300 and preds['predicted'].notna().all()
+
+def test_incremental_backtest_compares_against_full(history, tmp_path):
+    X, y, metadata = history
+    validator = make_validator(1)
+    validator.incremental_rounds = 5
+    results, preds = validator.run_backtest(X, y, metadata, mode="compare")
+    
+    full_results, full_preds = validator.run_backtest(X, y, metadata, mode="full")
+    pd.testing.assert_frame_equal(preds, full_preds)  # Predictions are the full retrain's
+    assert {'rmse_incremental', 'r2_incremental', 'fit_seconds_incremental'} <= set(results.columns)
+    
+    # The first fold has nothing to warm-start from, so both modes agree there
+    assert results.loc[0, 'rmse_incremental'] == pytest.approx(results.loc[0, 'rmse'])
+    
+    inc_results, _ = validator.run_backtest(X, y, metadata, mode="incremental")
+    np.testing.assert_allclose(inc_results['rmse'], results['rmse_incremental'])
+    
+    report_path = tmp_path / "backtest.md"
+    validator.generate_report(results, report_path=str(report_path))
+    assert "## Warm Start vs Full Retrain" in report_path.read_text()
@@ -0,0 +1,102 @@
+import duckdb
+import numpy as np
+import pandas as pd
+import pytest
+import scipy.sparse as sp
+import xgboost as xgb
+
+from src.batch_scoring import BatchScorer, replace_year_partitions
+from src.feature_factory import load_sparse_matrix
+from src.model_loader import load_predictor, save_model
+
+@pytest.fixture
+def staging(tmp_path):
+    db_path = str(tmp_path / "scoring.duckdb")
+    con = duckdb.connect(db_path)
+    con.execute("""
+        CREATE TABLE staging_feature_matrix AS
+        SELECT 'P' || i AS player_name, 2011 + i % 15 AS year, 'T' AS team,
+               CASE WHEN i % 4 = 0 THEN NULL ELSE (i % 7)::DOUBLE END AS feature_a,
+               CASE WHEN i % 3 = 0 THEN 0 ELSE i % 5 END AS feature_b,
+               (i % 11)::DOUBLE / 10 AS feature_c
+        FROM range(600) r(i)
+    """)
+    return db_path, con
+
+@pytest.mark.parametrize("matrix_format", ["dense", "sparse"])
+def test_streamed_scores_match_in_memory_prediction(tmp_path, staging, matrix_format):
+    db_path, con = staging
+    features = ['feature_a', 'feature_b', 'feature_c', 'feature_not_in_matrix']
+    if matrix_format == "sparse":
+        X, meta, _ = load_sparse_matrix(con, "SELECT * FROM staging_feature_matrix")
+        X = X.align(features)
+        model = xgb.XGBRegressor(n_estimators=15, max_depth=3).fit(X.matrix, meta['year'] % 3)
+        expected = model.predict(X.matrix)
+    else:
+        df = con.execute("SELECT * FROM staging_feature_matrix").df()
+        meta = df[['player_name', 'year']]
+        X = df.reindex(columns=features).fillna(0).astype(np.float32)
+        model = xgb.XGBRegressor(n_estimators=15, max_depth=3).fit(X, meta['year'] % 3)
+        expected = model.predict(X)
+    con.close()
+    path, _ = save_model(model, tmp_path / "m.ubj", features, matrix_format)
+
+    scorer = BatchScorer(db_path, load_predictor(path), batch_size=7)
+    summary = scorer.score(2011, 2025)
+    assert summary['rows'].sum() == 600 and len(summary) == 15
+
+    scores = scorer.con.execute("SELECT player_name, predicted_risk_score FROM prediction_results").df()
+    got = meta[['player_name']].merge(scores, on='player_name', how='left')['predicted_risk_score']
+    np.testing.assert_allclose(got, expected, rtol=1e-5, atol=1e-6)
+    scorer.close()
+
+def test_rescoring_a_year_replaces_only_that_partition(tmp_path, staging):
+    db_path, con = staging
+    con.close()
+    model = xgb.XGBRegressor(n_estimators=3).fit(np.random.default_rng(0).normal(size=(50, 1)), np.arange(50))
+    path, _ = save_model(model, tmp_path / "m.ubj", ['feature_c'])
+
+    scorer = BatchScorer(db_path, load_predictor(path), batch_size=16)
+    scorer.score(2011, 2025)
+    scorer.score(2020, 2020)
+    counts = scorer.con.execute("SELECT year, COUNT(*) FROM prediction_results GROUP BY year").fetchall()
+    assert {year: n for year, n in counts} == {year: 40 for year in range(2011, 2026)}
+    scorer.close()
+
+def test_interval_bands_written_next_to_point_estimate(tmp_path, staging):
+    db_path, con = staging
+    df = con.execute("SELECT * FROM staging_feature_matrix").df()
+    con.close()
+    features = ['feature_a', 'feature_c']
+    X = df[features].fillna(0)
+    point = xgb.XGBRegressor(n_estimators=5).fit(X, df['feature_c'])
+    quantile = xgb.XGBRegressor(n_estimators=5, objective="reg:quantileerror",
+                                quantile_alpha=np.array([0.1, 0.5, 0.9])).fit(X, df['feature_c'])
+    point_path, _ = save_model(point, tmp_path / "p.ubj", features)
+    quantile_path, _ = save_model(quantile, tmp_path / "q.ubj", features, quantiles=[0.1, 0.5, 0.9])
+
+    scorer = BatchScorer(db_path, load_predictor(point_path), interval_predictor=load_predictor(quantile_path))
+    scorer.score(2024, 2025)
+    out = scorer.con.execute("""
+        SELECT COUNT(*), COUNT(risk_lower), BOOL_AND(risk_lower <= risk_median AND risk_median <= risk_upper)
+        FROM prediction_results
+    """).fetchone()
+    assert out == (80, 80, True)
+    scorer.close()
+
+def test_training_write_keeps_batch_scored_years(tmp_path, staging):
+    db_path, con = staging
+    con.close()
+    model = xgb.XGBRegressor(n_estimators=3).fit(np.random.default_rng(0).normal(size=(50, 1)), np.arange(50))
+    path, _ = save_model(model, tmp_path / "m.ubj", ['feature_c'])
+    scorer = BatchScorer(db_path, load_predictor(path))
+    scorer.score(2011, 2025)
+
+    # A training run's predictions (with interval columns) cover only 2024-2025
+    trained = pd.DataFrame({'player_name': ['A', 'B'], 'year': [2024, 2025], 'team': 'T',
+                            'predicted_risk_score': [1.0, 2.0], 'risk_lower': [0.5, 1.5]})
+    replace_year_partitions(scorer.con, "prediction_results", trained)
+    counts = dict(scorer.con.execute("SELECT year, COUNT(*) FROM prediction_results GROUP BY year").fetchall())
+    assert counts == {**{year: 40 for year in range(2011, 2024)}, 2024: 1, 2025: 1}
+    assert scorer.con.execute("SELECT COUNT(risk_lower) FROM prediction_results").fetchone()[0] == 2
+    scorer.close()
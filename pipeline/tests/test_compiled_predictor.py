@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+import scipy.sparse as sp
+import xgboost as xgb
+
+from src.compiled_predictor import CompiledPredictor
+from src.model_loader import load_predictor, save_model
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(2000, 8)).astype(np.float32)
+    y = X[:, 0] * 2 + np.sin(X[:, 3]) - X[:, 5] * X[:, 6]
+    return X, y
+
+def test_dense_model_is_bit_exact(data):
+    X, y = data
+    model = xgb.XGBRegressor(n_estimators=60, max_depth=6).fit(X, y)
+    compiled = CompiledPredictor.from_booster(model)
+    assert compiled.validate(model, X) == 0
+    # Single row, as an API request would send it
+    assert compiled.predict(X[7]) == model.get_booster().inplace_predict(X[7:8])
+
+def test_missing_values_follow_default_direction(data):
+    X, y = data
+    X = X.copy()
+    X[::3, 0] = np.nan
+    X[1::5, 5] = np.nan
+    model = xgb.XGBRegressor(n_estimators=30, max_depth=5).fit(X, y)
+    assert CompiledPredictor.from_booster(model).validate(model, X) == 0
+
+def test_sparse_model_treats_absent_entries_as_missing(data):
+    X, y = data
+    X = np.where(X > 0.3, X, 0)
+    csr = sp.csr_matrix(X)
+    model = xgb.XGBRegressor(n_estimators=30, max_depth=4).fit(csr, y)
+    assert CompiledPredictor.from_booster(model).validate(model, csr) == 0
+
+def test_quantile_model_outputs_one_column_per_quantile(data):
+    X, y = data
+    model = xgb.XGBRegressor(n_estimators=20, objective="reg:quantileerror",
+                             quantile_alpha=np.array([0.1, 0.5, 0.9])).fit(X, y)
+    compiled = CompiledPredictor.from_booster(model)
+    assert compiled.predict(X[:5]).shape == (5, 3)
+    assert compiled.validate(model, X) == 0
+
+def test_unsupported_objective_is_rejected(data):
+    X, y = data
+    model = xgb.XGBClassifier(n_estimators=3).fit(X, y > 0)
+    with pytest.raises(NotImplementedError):
+        CompiledPredictor.from_booster(model)
+
+@pytest.mark.parametrize("matrix_format", ["dense", "sparse"])
+def test_align_by_name_matches_registered_predictor(tmp_path, data, matrix_format):
+    X, y = data
+    names = [f"f{i}" for i in range(X.shape[1])]
+    X = np.where(X > 0, X, 0).astype(np.float32)
+    train = sp.csr_matrix(X) if matrix_format == "sparse" else X
+    model = xgb.XGBRegressor(n_estimators=20, max_depth=4).fit(train, y)
+    path, _ = save_model(model, tmp_path / "m.ubj", names, matrix_format)
+    compiled = CompiledPredictor.from_predictor(load_predictor(path))
+
+    # Online vectors: shuffled columns, one model feature absent, NaN where NULL
+    source_names = ["other"] + names[::-1][:-1]
+    source = np.column_stack([np.ones(len(X)), X[:, ::-1][:, :-1]]).astype(np.float32)
+    source[source == 0] = np.nan
+    got = compiled.predict(compiled.align(source, compiled.column_index(source_names)))
+
+    expected_input = X.copy()
+    expected_input[:, 0] = 0
+    expected_input = sp.csr_matrix(expected_input) if matrix_format == "sparse" else expected_input
+    np.testing.assert_array_equal(got, model.get_booster().inplace_predict(expected_input))
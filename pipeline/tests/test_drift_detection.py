@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+import pytest
+import yaml
+from scipy.stats import ks_2samp
+
+from src.drift_detection import compute_drift, ks_statistics, population_stability_index
+from src.ml_governance import MLGovernance
+from src.ml_validator import RedTeamEvaluator
+
+@pytest.fixture
+def samples():
+    rng = np.random.default_rng(0)
+    reference = rng.normal(size=(1500, 6))
+    current = rng.normal(size=(200, 6))
+    current[:, 2] += 0.8                                                      # Shifted feature
+    reference[:, 3], current[:, 3] = rng.integers(0, 3, 1500), rng.integers(0, 4, 200)  # Heavy ties
+    reference[::5, 4] = np.nan                                                # Missing values
+    current[::7, 5] = np.nan
+    return reference, current
+
+def test_ks_matches_scipy_per_feature(samples):
+    reference, current = samples
+    stat, p_value = ks_statistics(reference, current)
+    for j in range(reference.shape[1]):
+        ref, cur = reference[:, j], current[:, j]
+        expected = ks_2samp(ref[~np.isnan(ref)], cur[~np.isnan(cur)])
+        assert stat[j] == pytest.approx(expected.statistic, abs=1e-12)
+        # Asymptotic p-value: same conclusion, close in value
+        assert p_value[j] == pytest.approx(expected.pvalue, abs=0.02)
+
+def test_psi_uses_shared_reference_decile_bins(samples):
+    reference, current = samples
+    psi = population_stability_index(reference, current)
+    edges = np.quantile(reference[:, 0], np.linspace(0, 1, 11)[1:-1], method="lower")
+    expected = np.bincount(np.searchsorted(edges, reference[:, 0], "right"), minlength=10) / len(reference)
+    actual = np.bincount(np.searchsorted(edges, current[:, 0], "right"), minlength=10) / len(current)
+    expected, actual = np.maximum(expected, 1e-4), np.maximum(actual, 1e-4)
+    assert psi[0] == pytest.approx(((actual - expected) * np.log(actual / expected)).sum())
+    assert psi[2] > 0.25 and psi[0] < 0.1
+
+def test_report_ranks_numeric_features(samples):
+    reference, current = samples
+    names = list("abcdef")
+    report = compute_drift(pd.DataFrame(reference, columns=names).assign(team="KC"),
+                           pd.DataFrame(current, columns=names).assign(team="BUF"))
+    assert report['feature'].tolist()[0] == "c" and set(report['feature']) == set(names)
+    assert report['drift_rank'].tolist() == list(range(1, 7))
+
+def test_red_team_persists_drift_report_per_candidate(tmp_path, samples):
+    config_path = tmp_path / "ml_config.yaml"
+    config_path.write_text(yaml.safe_dump({
+        "model_registry": {"registry_path": str(tmp_path / "registry.json")},
+        "validation": {"thresholds": {"min_r2": 0.5, "max_rmse": 1.0, "max_drift_p_value": 0.01, "max_psi": 0.25},
+                       "red_team": {"fail_on_drift": True}},
+    }))
+    MLGovernance(str(config_path)).register_candidate("/models/m.ubj", {"rmse": 0.5, "r2": 0.8}, list("abcdef"))
+    reference, current = (pd.DataFrame(x, columns=list("abcdef")) for x in samples)
+
+    evaluator = RedTeamEvaluator(str(config_path))
+    assert not evaluator.evaluate_model(None, reference, None, current, None, {"rmse": 0.5, "r2": 0.8},
+                                        model_path="/models/m.ubj")
+    stored = evaluator.governance.get_drift_report("/models/m.ubj")
+    assert len(stored) == 6 and stored['feature'].iloc[0] == "c"
+
+def test_features_empty_in_one_sample_are_not_drift(tmp_path):
+    assert np.isnan(compute_drift(np.full((10, 1), np.nan), np.ones((5, 1)))['psi'].iloc[0])
+    assert np.isnan(population_stability_index(np.ones((10, 2)), np.empty((0, 2)))).all()
+
+    config_path = tmp_path / "ml_config.yaml"
+    config_path.write_text(yaml.safe_dump({
+        "model_registry": {"registry_path": str(tmp_path / "registry.json")},
+        "validation": {"thresholds": {"min_r2": 0.5, "max_rmse": 1.0, "max_drift_p_value": 0.01, "max_psi": 0.25},
+                       "red_team": {"fail_on_drift": True}},
+    }))
+    rng = np.random.default_rng(1)
+    # A column that is entirely NULL in the training window
+    reference = pd.DataFrame({"a": rng.normal(size=500), "new_feed": np.nan})
+    current = pd.DataFrame({"a": rng.normal(size=100), "new_feed": 1.0})
+    evaluator = RedTeamEvaluator(str(config_path))
+    assert evaluator.evaluate_model(None, reference, None, current, None, {"rmse": 0.5, "r2": 0.8})
+
+def test_count_below_matches_row_wise_searchsorted():
+    from src.drift_detection import _count_below, _sorted_features
+    rng = np.random.default_rng(3)
+    values = rng.integers(-3, 4, size=(50, 5)).astype(float)
+    values[::6, 1] = np.nan
+    values[0, 2], values[1, 2] = np.inf, -np.inf
+    sorted_rows = _sorted_features(values)
+    queries = np.hstack([sorted_rows, rng.normal(scale=3, size=(5, 7))])
+    for side in ("left", "right"):
+        expected = np.array([np.searchsorted(r, q, side=side) for r, q in zip(sorted_rows, queries)])
+        np.testing.assert_array_equal(_count_below(sorted_rows, queries, side), expected)
@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from src.train_model import RiskModeler, shap_contributions, top_k_contributions
+
+def test_top_k_matches_full_sort():
+    rng = np.random.default_rng(0)
+    phi = rng.normal(size=(50, 40)).astype(np.float32)
+    idx, vals = top_k_contributions(phi, 3)
+
+    expected = np.argsort(-np.abs(phi), axis=1)[:, :3]
+    np.testing.assert_array_equal(idx, expected)
+    np.testing.assert_array_equal(vals, np.take_along_axis(phi, expected, axis=1))
+
+def test_explanations_persisted_long_and_additive(tmp_path):
+    rng = np.random.default_rng(1)
+    X = pd.DataFrame(rng.normal(size=(200, 6)).astype(np.float32), columns=[f"f{i}" for i in range(6)])
+    y = 3 * X['f2'] - X['f4']
+    model = xgb.XGBRegressor(n_estimators=30, max_depth=3).fit(X, y)
+    metadata = pd.DataFrame({'player_name': [f"P{i}" for i in range(200)], 'year': 2024, 'team': 'T'})
+
+    # Contributions plus bias reproduce the prediction
+    phi, base = shap_contributions(model, X)
+    np.testing.assert_allclose(phi.sum(axis=1) + base, model.predict(X), atol=1e-4)
+
+    modeler = RiskModeler(str(tmp_path / "expl.duckdb"))
+    modeler.save_explanations(model, X, metadata, min_abs_contribution=0.0)
+
+    top = modeler.con.execute("SELECT top_factors FROM prediction_explanations WHERE player_name = 'P0'").fetchone()[0]
+    assert top.split(" (")[0] == X.columns[np.argmax(np.abs(phi[0]))]
+
+    n, total = modeler.con.execute("""
+        SELECT COUNT(*), SUM(contribution) FROM prediction_contributions WHERE player_name = 'P0'
+    """).fetchone()
+    assert n == np.count_nonzero(np.abs(phi[0]) >= 0.0)
+    assert abs(total - phi[0].sum()) < 1e-4
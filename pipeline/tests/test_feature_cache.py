@@ -0,0 +1,80 @@
+import os
+import time
+import pandas as pd
+import pytest
+from datetime import date
+from src.feature_cache import FeatureMatrixCache
+from src.feature_store import FeatureStore
+
+@pytest.fixture
+def cached_store(tmp_path):
+    store = FeatureStore(db_path=str(tmp_path / "cache_store.duckdb"), cache_dir=str(tmp_path / "cache"))
+    store.initialize_schema()
+    store.db.execute("CREATE TABLE fact_player_efficiency (player_name VARCHAR, year INTEGER, total_tds INTEGER)")
+    store.db.execute("INSERT INTO fact_player_efficiency VALUES ('TE1', 2022, 4), ('TE1', 2023, 7)")
+    store.refresh_features(as_of=date(2023, 1, 1))
+    return store
+
+def test_roundtrip_and_key_stability(tmp_path):
+    cache = FeatureMatrixCache(str(tmp_path))
+    df = pd.DataFrame({'player_name': ['A', 'B'], 'year': [2023, 2024], 'f': [1.5, None]})
+    
+    key = cache.make_key('training_matrix', as_of_date=date(2024, 9, 1), store_version=3)
+    assert key == cache.make_key('training_matrix', store_version=3, as_of_date=date(2024, 9, 1))
+    assert key != cache.make_key('training_matrix', as_of_date=date(2024, 9, 1), store_version=4)
+    
+    assert cache.get(key) is None
+    cache.put(key, df)
+    pd.testing.assert_frame_equal(cache.get(key), df)
+
+def test_lru_eviction_under_budget(tmp_path):
+    df = pd.DataFrame({'x': range(10_000)})
+    cache = FeatureMatrixCache(str(tmp_path), max_bytes=1)
+    cache.put('a', df)
+    entry_size = cache.size_bytes()
+    cache.max_bytes = int(entry_size * 2.5)
+    
+    cache.put('b', df)
+    # Touch 'a' so that 'b' becomes least recently used
+    old = time.time() - 60
+    os.utime(tmp_path / 'b.arrow', (old, old))
+    assert cache.get('a') is not None
+    
+    cache.put('c', df)
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+    assert cache.size_bytes() <= cache.max_bytes
+
+def test_store_serves_cached_matrix_until_version_bump(cached_store):
+    cutoff = date(2023, 9, 1)
+    first = cached_store.get_training_matrix(as_of_date=cutoff, min_year=2023)
+    assert first.iloc[0]['total_tds_lag_1'] == 4.0
+    
+    # A raw write that bypasses materialization does not bump the version...
+    cached_store.db.execute("UPDATE feature_values SET feature_value = 99 WHERE feature_name = 'total_tds_lag_1'")
+    pd.testing.assert_frame_equal(cached_store.get_training_matrix(as_of_date=cutoff, min_year=2023), first)
+    
+    # ...but every materialization does, invalidating the cached entry
+    version = cached_store.get_store_version()
+    cached_store.db.execute("UPDATE fact_player_efficiency SET total_tds = 5 WHERE year = 2022")
+    cached_store.refresh_features(as_of=date(2023, 6, 1))
+    assert cached_store.get_store_version() == version + 1
+    
+    fresh = cached_store.get_training_matrix(as_of_date=cutoff, min_year=2023)
+    assert fresh.iloc[0]['total_tds_lag_1'] == 5.0
+
+def test_cache_hit_does_not_read_the_gold_layer(cached_store):
+    cutoff = date(2023, 9, 1)
+    first = cached_store.get_training_matrix(as_of_date=cutoff, min_year=2022)
+    assert first['year'].tolist() == [2023]
+    
+    # A hit is keyed on recorded watermarks: it never touches the source table
+    cached_store.db.execute("ALTER TABLE fact_player_efficiency RENAME TO gold_offline")
+    pd.testing.assert_frame_equal(cached_store.get_training_matrix(as_of_date=cutoff, min_year=2022), first)
+    cached_store.db.execute("ALTER TABLE gold_offline RENAME TO fact_player_efficiency")
+    
+    # A Gold rebuild picked up by refresh_features moves the key
+    cached_store.db.execute("INSERT INTO fact_player_efficiency VALUES ('TE2', 2022, 1), ('TE2', 2023, 2)")
+    cached_store.refresh_features(as_of=date(2023, 6, 1))
+    fresh = cached_store.get_training_matrix(as_of_date=cutoff, min_year=2022)
+    assert fresh['player_name'].tolist() == ['TE1', 'TE2']
@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.feature_factory import FeatureFactory
+
+@pytest.fixture
+def factory(tmp_path):
+    factory = FeatureFactory(db_path=str(tmp_path / "factory.duckdb"))
+    factory.db.execute("""
+        CREATE TABLE fact_player_efficiency (
+            player_name VARCHAR, year INTEGER, team VARCHAR, position VARCHAR, college VARCHAR,
+            experience_years VARCHAR, age DOUBLE, cap_hit_millions DOUBLE, draft_round DOUBLE,
+            total_tds DOUBLE, total_pass_yds DOUBLE, edce_risk DOUBLE
+        )
+    """)
+    factory.db.execute("""
+        INSERT INTO fact_player_efficiency VALUES
+        ('QB1', 2021, 'KC', 'QB', 'Texas Tech', '4 yrs', 25, 10.0, 1, 30, 4000, 0.1),
+        ('QB1', 2022, 'KC', 'QB', 'Texas Tech', '5 yrs', 26, 0.0, 1, 40, 5000, 0.2),
+        ('QB1', 2023, 'KC', 'QB', 'Texas Tech', NULL, 27, 45.0, 1, 35, 4500, 0.3),
+        ('WR1', 2023, 'BUF', NULL, 'St. Mary''s', 'R', 22, 1.0, 3, 8, NULL, 0.4)
+    """)
+    return factory
+
+def test_matrix_built_in_database(factory):
+    factory.materialize_hyperscale_matrix()
+    df = factory.db.fetch_df("SELECT * FROM staging_feature_matrix ORDER BY player_name, year")
+    
+    # One-hot naming follows pd.get_dummies(dummy_na=True); team survives as metadata
+    for col in ['position_QB', 'position_nan', 'team_KC', 'team_BUF', "college_St. Mary's", 'team']:
+        assert col in df.columns
+    assert 'position' not in df.columns and 'college' not in df.columns
+    assert df['position_nan'].tolist() == [False, False, False, True]
+    
+    qb = df[df['player_name'] == 'QB1'].set_index('year')
+    assert qb.loc[2023, 'total_tds_lag_1'] == 40
+    assert qb.loc[2023, 'total_tds_lag_2'] == 30
+    assert pd.isna(qb.loc[2021, 'total_tds_lag_1'])
+    assert qb['experience_years_num'].tolist() == [4, 5, 0]
+    
+    # Interactions / volatility
+    assert np.isnan(qb.loc[2022, 'td_per_dollar'])  # zero cap hit
+    assert qb.loc[2023, 'td_volatility'] == pytest.approx(np.std([35, 40, 30], ddof=1))
+    
+    sensors = df.filter(like='sensor_')
+    assert sensors.shape[1] == 200
+
+def test_matrix_stored_with_family_dtypes(factory):
+    factory.materialize_hyperscale_matrix()
+    types = dict(factory.db.execute("SELECT column_name, column_type FROM (DESCRIBE staging_feature_matrix)").fetchall())
+    
+    assert types['position_QB'] == 'UTINYINT'
+    assert types['total_tds'] == 'SMALLINT' and types['total_tds_lag_1'] == 'SMALLINT'
+    assert types['sensor_legal_disciplinary_0'] == 'FLOAT'
+    assert types['cap_hit_millions'] == 'FLOAT'
+    assert types['year'] == 'INTEGER'  # Keys are left alone
+
+def test_dtype_policy_falls_back_when_values_do_not_fit():
+    from src.feature_dtypes import DEFAULT_DTYPE_POLICY, apply_dtypes
+    df = pd.DataFrame({
+        'year': [2023, 2024],
+        'total_sacks': [1.5, 2.0],        # Half sacks: not integral
+        'games_played': [16.0, np.nan],
+        'team_KC': [True, False],
+        'team': ['KC', 'BUF'],
+    })
+    typed, report = apply_dtypes(df, DEFAULT_DTYPE_POLICY)
+    
+    assert typed['year'].dtype == np.int64
+    assert typed['total_sacks'].dtype == np.float32
+    assert str(typed['games_played'].dtype) == 'Int16' and pd.isna(typed['games_played'][1])
+    assert typed['team_KC'].dtype == np.uint8
+    assert typed['team'].dtype == 'category'
+    assert report.set_index('family').loc['one_hot', 'bytes_saved'] == 2 * 7
+
+def test_point_in_time_validation_covers_every_row(factory):
+    # Gap year: WR1 skips 2022, so its 2023 lag_1 must be empty rather than 2021
+    factory.db.execute("""
+        INSERT INTO fact_player_efficiency VALUES
+        ('WR1', 2021, 'BUF', 'WR', 'St. Mary''s', 'R', 20, 1.0, 3, 5, NULL, 0.4)
+    """)
+    factory.materialize_hyperscale_matrix()
+    assert factory.db.execute("SELECT COUNT(*) FROM feature_pit_violations").fetchone()[0] == 0
+    wr = factory.db.fetch_df("SELECT * FROM staging_feature_matrix WHERE player_name = 'WR1' AND year = 2023")
+    assert pd.isna(wr.loc[0, 'total_tds_lag_1']) and wr.loc[0, 'total_tds_lag_2'] == 5
+    
+    # Leak the current season into a lag and the validator must find exactly that cell
+    factory.db.execute("""
+        UPDATE staging_feature_matrix SET total_tds_lag_1 = total_tds
+        WHERE player_name = 'QB1' AND year = 2023
+    """)
+    assert factory.validate_point_in_time('staging_feature_matrix') == 1
+    violation = factory.db.fetch_df("SELECT * FROM feature_pit_violations")
+    assert violation.loc[0, 'feature_name'] == 'total_tds_lag_1'
+    assert violation.loc[0, 'source_year'] == 2022
+    assert violation.loc[0, 'feature_value'] == 35 and violation.loc[0, 'expected_value'] == 40
+
+def test_sensors_are_deterministic(factory):
+    first = factory.generate_hyperscale_matrix().filter(like='sensor_')
+    second = factory.generate_hyperscale_matrix().filter(like='sensor_')
+    np.testing.assert_array_equal(first.values, second.values)
+
+def test_sensors_are_pinned_to_md5(factory):
+    import hashlib
+    df = factory.generate_hyperscale_matrix().set_index(['player_name', 'year'])
+    
+    # Recomputed outside DuckDB: the values cannot move with a DuckDB upgrade
+    def uniform(stream):
+        key = f"QB1|2023|sensor_legal_disciplinary_0|42|{stream}".encode()
+        return (int(hashlib.md5(key).hexdigest()[:13], 16) + 0.5) / 2 ** 52
+    expected = np.sqrt(-2 * np.log(uniform(1))) * np.cos(2 * np.pi * uniform(2)) / 100.0
+    assert df.loc[('QB1', 2023), 'sensor_legal_disciplinary_0'] == pytest.approx(expected, rel=1e-6)
+
+def test_sparse_matrix_matches_dense(factory):
+    factory.materialize_hyperscale_matrix()
+    X, metadata, y = factory.to_sparse_matrix(exclude=['experience_years_num'], target_col='edce_risk')
+    dense = factory.db.fetch_df("SELECT * FROM staging_feature_matrix")
+    
+    assert metadata['player_name'].tolist() == dense['player_name'].tolist()
+    np.testing.assert_allclose(y, dense['edce_risk'])
+    assert 'edce_risk' not in X.columns and 'team' not in X.columns and 'experience_years_num' not in X.columns
+    assert 'position_QB' in X.columns and 'sensor_legal_disciplinary_0' in X.columns
+    assert X.density < 1.0
+    
+    # Zeros and NULLs are simply absent; everything else round-trips (as float32)
+    expected = dense[X.feature_names].astype(float).fillna(0).to_numpy(dtype=np.float32)
+    np.testing.assert_allclose(X.matrix.toarray(), expected, rtol=1e-6)
+
+def test_sparse_matrix_align(factory):
+    factory.materialize_hyperscale_matrix()
+    X, _, _ = factory.to_sparse_matrix()
+    aligned = X.align(['total_tds', 'not_a_feature', 'age'])
+    
+    assert aligned.feature_names == ['total_tds', 'not_a_feature', 'age']
+    np.testing.assert_array_equal(aligned.matrix[:, 1].toarray(), 0)
+    np.testing.assert_array_equal(aligned.matrix[:, [0, 2]].toarray(),
+                                  X.matrix[:, [X.feature_names.index('total_tds'),
+                                               X.feature_names.index('age')]].toarray())
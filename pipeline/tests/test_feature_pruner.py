@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from sklearn.decomposition import PCA
+from sklearn.preprocessing import StandardScaler
+
+from src import train_model
+from src.feature_pruner import FeaturePruner
+from src.feature_store import FeatureStore
+
+@pytest.fixture
+def warehouse(tmp_path, monkeypatch):
+    monkeypatch.setattr(train_model, 'get_training_snapshot_dir', lambda: tmp_path / 'snapshots')
+    db_path = str(tmp_path / 'prune.duckdb')
+    modeler = train_model.RiskModeler(db_path)
+    # edce_risk depends on signal_a and signal_b only; noise_* are pure noise
+    modeler.con.execute("""
+        CREATE TABLE staging_feature_matrix AS
+        SELECT 'P' || i AS player_name, 2015 + i % 10 AS year, 'T' AS team,
+               sin(i)::DOUBLE AS signal_a, cos(i * 1.7)::DOUBLE AS signal_b,
+               sin(i * 3.1 + 1)::DOUBLE AS noise_1, cos(i * 5.3 + 2)::DOUBLE AS noise_2,
+               (i % 7)::DOUBLE AS experience_years,
+               2 * sin(i) - cos(i * 1.7) AS edce_risk
+        FROM range(400) r(i)
+    """)
+    modeler.db.close()
+    return db_path
+
+def test_matrix_is_loaded_and_standardized_once(warehouse, monkeypatch):
+    pruner = FeaturePruner(warehouse, n_jobs=2, chunk_rows=64)
+    loads = []
+    original = pruner._load
+    monkeypatch.setattr(pruner, '_load', lambda target: loads.append(target) or original(target))
+
+    selected, coef = pruner.prune_with_l1()
+    pca = pruner.analyze_components(n_components=3)
+    assert loads == ['edce_risk']
+    assert set(selected) >= {'signal_a', 'signal_b'} and 'experience_years' not in coef.index
+
+    # Chunked statistics equal a single StandardScaler pass
+    prepared = pruner.prepare()
+    X = prepared.values[:, prepared.keep]
+    np.testing.assert_allclose(prepared.scaler.mean_, StandardScaler().fit(X).mean_, rtol=1e-5)
+    reference = PCA(n_components=3).fit(StandardScaler().fit_transform(X))
+    np.testing.assert_allclose(pca.explained_variance_ratio_, reference.explained_variance_ratio_, rtol=1e-2)
+
+def test_randomized_and_incremental_pca_agree(warehouse):
+    pruner = FeaturePruner(warehouse, chunk_rows=64)
+    randomized = pruner.analyze_components(n_components=2, method="randomized")
+    incremental = pruner.analyze_components(n_components=2, method="incremental")
+    np.testing.assert_allclose(randomized.explained_variance_ratio_, incremental.explained_variance_ratio_,
+                               rtol=1e-2)
+
+def test_selection_persisted_and_projected_at_read_time(warehouse):
+    FeaturePruner(warehouse, n_jobs=1).prune_with_l1(persist_as='l1_edce_risk')
+    selected = FeatureStore(warehouse).get_feature_selection('l1_edce_risk')
+    assert selected[:2] == ['signal_a', 'signal_b']  # Ranked by |coefficient|
+
+    modeler = train_model.RiskModeler(warehouse, read_only=True)
+    X, y, _ = modeler.prepare_data(matrix_format='dense', feature_set='l1_edce_risk')
+    assert set(X.columns) == set(selected) and len(X) == len(y) == 400
+    with pytest.raises(ValueError):
+        modeler.prepare_data(matrix_format='dense', feature_set='missing_selection')
@@ -266,3 +266,222 @@ def test_feature_stats(store):
     stats = store.get_feature_stats()
     assert not stats.empty
     assert 'lag' in stats['feature_type'].values
+
+def test_lag_materialization_skips_gap_years(store):
+    """A missing season must not be treated as the prior year."""
+    store.db.execute("DROP TABLE IF EXISTS fact_player_efficiency")
+    store.db.execute("CREATE TABLE fact_player_efficiency (player_name VARCHAR, year INTEGER, total_tds INTEGER)")
+    store.db.execute("INSERT INTO fact_player_efficiency VALUES ('RB1', 2020, 5), ('RB1', 2022, 9), ('RB1', 2023, 11)")
+    
+    store.materialize_lag_features(source_table='fact_player_efficiency')
+    
+    df = store.db.fetch_df("""
+        SELECT prediction_year, feature_name, feature_value, valid_from
+        FROM feature_values WHERE player_name = 'RB1'
+    """)
+    lags = {(r.prediction_year, r.feature_name): r.feature_value for r in df.itertuples()}
+    
+    # 2022 has no 2021 season, so no lag_1 -- but lag_2 reaches back to 2020
+    assert (2022, 'total_tds_lag_1') not in lags
+    assert lags[(2022, 'total_tds_lag_2')] == 5
+    assert lags[(2023, 'total_tds_lag_1')] == 9
+    assert lags[(2023, 'total_tds_lag_3')] == 5
+    
+    lag_3 = df[(df['prediction_year'] == 2023) & (df['feature_name'] == 'total_tds_lag_3')].iloc[0]
+    assert lag_3['valid_from'] == pd.Timestamp(2021, 2, 15)
+
+def test_lag_materialization_aggregates_traded_seasons(store):
+    """A season split across teams lags as one season total, not an arbitrary stint."""
+    store.db.execute("DROP TABLE IF EXISTS fact_player_efficiency")
+    store.db.execute("CREATE TABLE fact_player_efficiency (player_name VARCHAR, year INTEGER, team VARCHAR, total_tds INTEGER, age DOUBLE)")
+    store.db.execute("""
+        INSERT INTO fact_player_efficiency VALUES
+        ('WR1', 2022, 'KC', 4, 25), ('WR1', 2022, 'BUF', 6, 26),
+        ('WR1', 2023, 'BUF', 9, 26), ('WR1', 2023, 'MIA', 1, 26)
+    """)
+    store.register_lag_features(columns=['total_tds', 'age'], lag_periods=[1])
+    
+    store.materialize_lag_features(source_table='fact_player_efficiency', as_of=date(2024, 1, 1))
+    
+    df = store.db.fetch_df("SELECT prediction_year, feature_name, feature_value FROM feature_values")
+    assert len(df) == 2  # One value per (player, year, feature) despite two rows per season
+    lags = {r.feature_name: r.feature_value for r in df.itertuples()}
+    assert lags == {'total_tds_lag_1': 10, 'age_lag_1': 26}
+    
+    # A revision re-runs the staged upsert without touching a row twice
+    store.db.execute("UPDATE fact_player_efficiency SET total_tds = 5 WHERE team = 'KC'")
+    store.materialize_lag_features(source_table='fact_player_efficiency', as_of=date(2024, 6, 1))
+    latest = store.db.execute("""
+        SELECT feature_value FROM feature_values WHERE feature_name = 'total_tds_lag_1'
+        ORDER BY valid_from DESC LIMIT 1
+    """).fetchone()[0]
+    assert latest == 11
+
+def test_lag_materialization_uses_registry(store):
+    """Lag columns and depths are driven by the feature registry."""
+    store.db.execute("DROP TABLE IF EXISTS fact_player_efficiency")
+    store.db.execute("CREATE TABLE fact_player_efficiency (player_name VARCHAR, year INTEGER, total_sacks DOUBLE)")
+    store.db.execute("INSERT INTO fact_player_efficiency VALUES ('DE1', 2019, 4.5), ('DE1', 2020, 8.0), ('DE1', 2024, 12.0)")
+    store.register_lag_features(columns=['total_sacks'], lag_periods=[1, 4])
+    
+    store.materialize_lag_features(source_table='fact_player_efficiency')
+    
+    names = set(store.db.fetch_df("SELECT DISTINCT feature_name FROM feature_values")['feature_name'])
+    assert names == {'total_sacks_lag_1', 'total_sacks_lag_4'}
+    
+    # Re-running is an idempotent upsert
+    store.materialize_lag_features(source_table='fact_player_efficiency')
+    count = store.db.execute("SELECT COUNT(*) FROM feature_values").fetchone()[0]
+    assert count == 2
+
+def test_feature_snapshot_roundtrip(store, tmp_path, monkeypatch):
+    """Wide snapshots persist the as-of matrix and support column projection."""
+    monkeypatch.setattr("src.feature_store.get_feature_snapshot_dir", lambda: tmp_path / "snapshots")
+    store.db.execute("""
+        INSERT INTO feature_values (entity_key, player_name, prediction_year, feature_name, feature_value, valid_from, valid_until)
+        VALUES 
+        ('S1_2023', 'Snap', 2023, 'f_a', 1.0, '2023-02-15', NULL),
+        ('S1_2023', 'Snap', 2023, 'f_b', 2.0, '2023-02-15', NULL),
+        ('S1_2023', 'Snap', 2023, 'f_late', 3.0, '2023-12-01', NULL)
+    """)
+    store.db.execute("INSERT INTO fact_player_efficiency VALUES ('Snap', 2023, 'TeamS')")
+    cutoff = date(2023, 9, 1)
+    
+    expected = store.get_training_matrix(as_of_date=cutoff, min_year=2023)
+    assert 'f_late' not in expected.columns
+    
+    for fmt in ('table', 'parquet'):
+        store.materialize_snapshot(cutoff, min_year=2023, fmt=fmt)
+        snap = store.load_snapshot(cutoff)
+        pd.testing.assert_frame_equal(snap, expected, check_dtype=False)
+    
+    projected = store.load_snapshot(cutoff, columns=['f_b'])
+    assert list(projected.columns) == ['player_name', 'year', 'f_b']
+    assert projected.iloc[0]['f_b'] == 2.0
+    
+    assert store.load_snapshot(date(2020, 9, 1)).empty
+
+def test_incremental_refresh_versions_changed_partitions(store):
+    """Only changed Gold years are recomputed; superseded values are closed, not deleted."""
+    store.db.execute("DROP TABLE IF EXISTS fact_player_efficiency")
+    store.db.execute("CREATE TABLE fact_player_efficiency (player_name VARCHAR, year INTEGER, total_tds INTEGER)")
+    store.db.execute("INSERT INTO fact_player_efficiency VALUES ('WR1', 2022, 3), ('WR1', 2023, 6), ('WR1', 2024, 8), ('WR1', 2025, 10)")
+    
+    assert store.refresh_features(as_of=date(2025, 2, 1)) == [2022, 2023, 2024, 2025]
+    before = store.db.execute("SELECT COUNT(*) FROM feature_values").fetchone()[0]
+    
+    # No Gold changes -> no work
+    assert store.refresh_features(as_of=date(2025, 2, 2)) == []
+    
+    # Stat correction to the 2024 season, learned 2025-03-01
+    store.db.execute("UPDATE fact_player_efficiency SET total_tds = 9 WHERE year = 2024")
+    assert store.refresh_features(as_of=date(2025, 3, 1)) == [2024]
+    
+    versions = store.db.fetch_df("""
+        SELECT feature_value, valid_from, valid_until FROM feature_values
+        WHERE feature_name = 'total_tds_lag_1' AND prediction_year = 2025
+        ORDER BY valid_from
+    """)
+    # Old value kept but closed at the revision date; revision valid from then on
+    assert versions['feature_value'].tolist() == [8.0, 9.0]
+    assert versions.iloc[0]['valid_until'] == pd.Timestamp(2025, 3, 1)
+    assert versions.iloc[1]['valid_from'] == pd.Timestamp(2025, 3, 1)
+    assert versions.iloc[1]['valid_until'] == pd.Timestamp(2026, 2, 15)
+    
+    # Only the single lag sourced from 2024 gained a revision
+    after = store.db.execute("SELECT COUNT(*) FROM feature_values").fetchone()[0]
+    assert after == before + 1
+    
+    # Earlier knowledge state is still reproducible
+    df_then = store.get_training_matrix(as_of_date=date(2025, 2, 20), min_year=2025)
+    df_now = store.get_training_matrix(as_of_date=date(2025, 3, 2), min_year=2025)
+    assert df_then.iloc[0]['total_tds_lag_1'] == 8.0
+    assert df_now.iloc[0]['total_tds_lag_1'] == 9.0
+
+def test_late_revision_does_not_stay_current(store):
+    """A correction learned after its lag's window closed never shadows later seasons."""
+    store.db.execute("DROP TABLE IF EXISTS fact_player_efficiency")
+    store.db.execute("CREATE TABLE fact_player_efficiency (player_name VARCHAR, year INTEGER, total_tds INTEGER)")
+    store.db.execute("INSERT INTO fact_player_efficiency VALUES ('WR1', 2022, 3), ('WR1', 2023, 6), ('WR1', 2024, 8), ('WR1', 2025, 10)")
+    store.refresh_features(as_of=date(2025, 2, 1))
+    
+    # 2022 correction learned 2025-03-01: the 2023 lag_1 window closed on 2024-02-15
+    store.db.execute("UPDATE fact_player_efficiency SET total_tds = 4 WHERE year = 2022")
+    assert store.refresh_features(as_of=date(2025, 3, 1)) == [2022]
+    
+    versions = store.db.fetch_df("""
+        SELECT feature_value, valid_from, valid_until FROM feature_values
+        WHERE feature_name = 'total_tds_lag_1' AND prediction_year = 2023
+        ORDER BY valid_from
+    """)
+    assert versions['feature_value'].tolist() == [3.0, 4.0]
+    assert versions['valid_until'].notna().all()
+    assert versions.iloc[0]['valid_until'] == pd.Timestamp(2024, 2, 15)
+    
+    # Queried after the natural window, only the current season is known
+    df = store.get_training_matrix(as_of_date=date(2025, 3, 2), min_year=2022)
+    assert df['year'].tolist() == [2025]
+    assert df.iloc[0]['total_tds_lag_1'] == 8.0
+    assert store.validate_temporal_integrity()
+
+def test_features_at_cutoffs_asof(store):
+    """Each (entity, cutoff) pair sees only the versions known at its own cutoff."""
+    store.db.execute("""
+        INSERT INTO feature_values (entity_key, player_name, prediction_year, feature_name, feature_value, valid_from, valid_until)
+        VALUES 
+        ('k1', 'P1', 2022, 'f1', 10.0, '2022-02-01', '2022-06-01'),
+        ('k2', 'P1', 2022, 'f1', 15.0, '2022-06-01', '2023-02-01'),
+        ('k3', 'P1', 2023, 'f1', 20.0, '2023-02-01', NULL)
+    """)
+    spine = pd.DataFrame({
+        'player_name': ['P1', 'P1', 'P1', 'P1'],
+        'year': [2022, 2022, 2022, 2023],
+        'cutoff': pd.to_datetime(['2022-01-01', '2022-03-01', '2022-07-01', '2023-03-01']),
+        'fold': [1, 2, 3, 4],
+    })
+    
+    df = store.get_features_at_cutoffs(spine)
+    
+    assert df['fold'].tolist() == [1, 2, 3, 4]
+    assert pd.isna(df.iloc[0]['f1'])
+    assert df['f1'].tolist()[1:] == [10.0, 15.0, 20.0]
+    
+    # Single-date semantics agree with get_training_matrix
+    store.db.execute("INSERT INTO fact_player_efficiency VALUES ('P1', 2022, 'TeamA')")
+    strict = store.get_features_at_cutoffs(spine.iloc[[2]], enforce_valid_until=True)
+    expected = store.get_training_matrix(as_of_date=date(2022, 7, 1), min_year=2022)
+    assert strict.iloc[0]['f1'] == expected.iloc[0]['f1']
+
+def test_features_at_cutoffs_keep_input_rows(store):
+    """Results line up with the caller's rows however the frame is scanned."""
+    store.db.execute("""
+        INSERT INTO feature_values (entity_key, player_name, prediction_year, feature_name, feature_value, valid_from, valid_until)
+        SELECT 'k' || i, 'P' || i, 2022, 'f1', i::DOUBLE, '2022-02-01', NULL FROM range(5000) r(i)
+    """)
+    ids = pd.Series(range(5000)).sample(frac=1, random_state=0).to_numpy()
+    spine = pd.DataFrame({'player_name': [f'P{i}' for i in ids], 'year': 2022,
+                          'cutoff': pd.Timestamp('2022-03-01'), 'fold': ids})
+    
+    df = store.get_features_at_cutoffs(spine)
+    
+    assert df['player_name'].tolist() == spine['player_name'].tolist()
+    assert (df['f1'] == df['fold']).all()
+
+def test_backtest_matrices_single_pass(store):
+    """All folds come back from one call, without leaking later seasons."""
+    store.db.execute("""
+        INSERT INTO feature_values (entity_key, player_name, prediction_year, feature_name, feature_value, valid_from, valid_until)
+        VALUES 
+        ('L_2022', 'Legacy', 2022, 'yards_lag_1', 1000.0, '2022-02-15', '2023-02-15'),
+        ('L_2023', 'Legacy', 2023, 'yards_lag_1', 1100.0, '2023-02-15', '2024-02-15')
+    """)
+    store.db.execute("INSERT INTO fact_player_efficiency (player_name, year) VALUES ('Legacy', 2022), ('Legacy', 2023)")
+    
+    df = store.get_backtest_matrices(test_years=[2022, 2023], min_year=2022)
+    
+    fold_22 = df[df['fold'] == 2022]
+    fold_23 = df[df['fold'] == 2023]
+    assert fold_22['year'].tolist() == [2022]
+    assert sorted(fold_23['year'].tolist()) == [2022, 2023]
+    assert fold_23.set_index('year').loc[2023, 'yards_lag_1'] == 1100.0
+    assert fold_23.set_index('year').loc[2022, 'yards_lag_1'] == 1000.0
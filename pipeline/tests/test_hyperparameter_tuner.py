@@ -0,0 +1,56 @@
+import json
+import duckdb
+import numpy as np
+import pandas as pd
+import pytest
+import yaml
+from src.hyperparameter_tuner import HyperparameterTuner
+from src.ml_governance import MLGovernance
+
+@pytest.fixture
+def history():
+    rng = np.random.default_rng(1)
+    n = 700
+    years = np.repeat(np.arange(2014, 2021), n // 7)
+    X = pd.DataFrame(rng.normal(size=(n, 4)), columns=list("abcd"))
+    y = pd.Series(np.sin(X['a'] * 2) + X['b'] ** 2 + rng.normal(scale=0.1, size=n))
+    metadata = pd.DataFrame({'player_name': [f"P{i}" for i in range(n)], 'year': years, 'team': 'KC'})
+    return X, y, metadata
+
+@pytest.fixture
+def tuner():
+    tuner = HyperparameterTuner(max_workers=1)
+    tuner.search_space = {'max_depth': [2, 3, 4, 5], 'learning_rate': [0.1, 0.3]}
+    tuner.n_candidates, tuner.eta, tuner.max_rounds, tuner.early_stopping_rounds = 4, 2, 200, 10
+    return tuner
+
+def test_successive_halving_prunes_candidates(history, tuner):
+    result = tuner.tune(*history, start_year=2017)
+    
+    # 4 folds (2017-2020): rung 0 = 4 candidates × 1 fold, rung 1 = 2 × 2, rung 2 = 1 × 4
+    trials_per_candidate = result.trials.groupby('candidate').size().sort_values()
+    assert trials_per_candidate.tolist() == [1, 1, 2, 4]
+    assert len(result.trials) == 1 + 1 + 2 + 4
+    
+    assert result.fold_metrics['fold_year'].tolist() == [2017, 2018, 2019, 2020]
+    assert (result.fold_metrics['best_iteration'] < tuner.max_rounds).all()  # Early stopping kicked in
+    assert result.best_params['n_estimators'] == int(np.median(result.fold_metrics['best_iteration']))
+    assert result.cv_rmse == pytest.approx(result.fold_metrics['rmse'].mean())
+    
+    # Early stopping uses the last training season; the validation year is only scored
+    assert (result.trials['stopping_year'] == result.trials['fold_year'] - 1).all()
+    assert not np.allclose(result.trials['rmse'], result.trials['stopping_rmse'])
+
+def test_best_config_recorded_in_registry(history, tuner, tmp_path):
+    config_path = tmp_path / "ml_config.yaml"
+    config_path.write_text(yaml.safe_dump({"model_registry": {"registry_path": str(tmp_path / "registry.json")}}))
+    governance = MLGovernance(config_path=str(config_path))
+    
+    result = tuner.tune(*history, start_year=2019)
+    tuner.record(result, governance)
+    
+    with duckdb.connect(str(tmp_path / "registry.duckdb"), read_only=True) as con:
+        params, fold_metrics = con.execute("SELECT params, fold_metrics FROM registry_tuning").fetchone()
+    assert json.loads(params) == result.best_params
+    assert len(json.loads(fold_metrics)) == 2
+    assert MLGovernance(config_path=str(config_path)).get_tuned_params() == result.best_params
@@ -0,0 +1,81 @@
+import duckdb
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.inference import InferenceEngine
+from src.model_loader import ModelPredictor
+
+class CountingPredictor(ModelPredictor):
+    """Scores rows as 10 * feature_a, recording how many rows it was asked for."""
+    def predict(self, X):
+        X = self.align(X)
+        self.booster.append(X.shape[0])
+        first = X[:, [0]].toarray() if hasattr(X, "toarray") else X[:, [0]]
+        return 10.0 * np.asarray(first).ravel()
+
+def make_predictor(artifact_hash, matrix_format="dense"):
+    return CountingPredictor(booster=[], feature_names=['feature_a', 'feature_b'], matrix_format=matrix_format,
+                             artifact_hash=artifact_hash, path="model.ubj")
+
+@pytest.fixture
+def gold_db(tmp_path):
+    db_path = str(tmp_path / "inference.duckdb")
+    con = duckdb.connect(db_path)
+    con.execute("""
+        CREATE TABLE staging_feature_matrix AS
+        SELECT 'P' || i AS player_name, 2023 + i % 3 AS year, 'T' AS team,
+               i::DOUBLE AS feature_a, 1.0 AS feature_b
+        FROM range(30) r(i)
+    """)
+    con.execute("CREATE TABLE fact_player_efficiency AS SELECT player_name, year, team FROM staging_feature_matrix")
+    con.close()
+    return db_path
+
+def run(db_path, monkeypatch, predictor):
+    engine = InferenceEngine(db_path)
+    monkeypatch.setattr(engine, "get_latest_model", lambda: predictor)
+    engine.enrich_gold_layer()
+    return sum(predictor.booster)
+
+@pytest.mark.parametrize("matrix_format", ["dense", "sparse"])
+def test_only_changed_rows_are_rescored(gold_db, monkeypatch, matrix_format):
+    # 20 of the 30 rows are in scope (year >= 2024)
+    assert run(gold_db, monkeypatch, make_predictor("v1", matrix_format)) == 20
+    assert run(gold_db, monkeypatch, make_predictor("v1", matrix_format)) == 0
+
+    with duckdb.connect(gold_db) as con:
+        con.execute("UPDATE staging_feature_matrix SET feature_a = 100 WHERE player_name = 'P1'")
+    assert run(gold_db, monkeypatch, make_predictor("v1", matrix_format)) == 1
+
+    # A new model artifact re-scores everything
+    assert run(gold_db, monkeypatch, make_predictor("v2", matrix_format)) == 20
+
+    with duckdb.connect(gold_db) as con:
+        scores = con.execute("""
+            SELECT player_name, year, ml_risk_score FROM fact_player_efficiency ORDER BY player_name, year
+        """).df().set_index('player_name')
+        assert scores.loc['P1', 'ml_risk_score'] == 1000.0
+        assert scores.loc['P2', 'ml_risk_score'] == 20.0
+        assert scores.loc['P3', 'ml_risk_score'] is None or np.isnan(scores.loc['P3', 'ml_risk_score'])  # 2023
+        assert con.execute("SELECT COUNT(DISTINCT artifact_hash) FROM inference_scores").fetchone()[0] == 1
+
+def test_gold_rebuild_is_resynced_without_rescoring(gold_db, monkeypatch):
+    run(gold_db, monkeypatch, make_predictor("v1"))
+    with duckdb.connect(gold_db) as con:
+        con.execute("CREATE OR REPLACE TABLE fact_player_efficiency AS SELECT player_name, year, team FROM staging_feature_matrix")
+
+    assert run(gold_db, monkeypatch, make_predictor("v1")) == 0
+    with duckdb.connect(gold_db) as con:
+        assert con.execute("SELECT COUNT(ml_risk_score) FROM fact_player_efficiency").fetchone()[0] == 20
+        # The surrogate key stays in player_keys, so the Feature Factory never sees it
+        columns = con.execute("DESCRIBE fact_player_efficiency").df()['column_name'].tolist()
+        assert 'player_key' not in columns
+
+@pytest.mark.parametrize("matrix_format", ["dense", "sparse"])
+def test_duplicate_matrix_rows_are_not_rescored_every_run(gold_db, monkeypatch, matrix_format):
+    with duckdb.connect(gold_db) as con:
+        # A second, different row for P1/2024
+        con.execute("INSERT INTO staging_feature_matrix VALUES ('P1', 2024, 'T', 50.0, 2.0)")
+    assert run(gold_db, monkeypatch, make_predictor("v1", matrix_format)) == 20
+    assert run(gold_db, monkeypatch, make_predictor("v1", matrix_format)) == 0
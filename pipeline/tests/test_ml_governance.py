@@ -0,0 +1,67 @@
+import json
+import multiprocessing
+
+import pytest
+import yaml
+
+from src.ml_governance import MLGovernance
+
+@pytest.fixture
+def config_path(tmp_path):
+    path = tmp_path / "ml_config.yaml"
+    path.write_text(yaml.safe_dump({"model_registry": {"registry_path": str(tmp_path / "registry.json")}}))
+    return str(path)
+
+def register(config_path, name, rmse=1.0):
+    MLGovernance(config_path).register_candidate(f"/models/{name}.ubj", {"rmse": rmse, "r2": 0.5},
+                                                 ["a", "b"], artifact_hash=name)
+
+def test_promotion_archives_previous_production(config_path):
+    governance = MLGovernance(config_path)
+    register(config_path, "m1")
+    register(config_path, "m2")
+    assert governance.get_latest_candidate()["path"] == "/models/m2.ubj"
+    assert governance.get_serving_model_info()["status"] == "candidate"
+
+    assert governance.promote_to_production("/models/m1.ubj")
+    assert governance.promote_to_production("/models/m2.ubj")
+    assert not governance.promote_to_production("/models/unknown.ubj")
+
+    production = governance.get_serving_model_info()
+    assert production["path"] == "/models/m2.ubj" and production["feature_names"] == ["a", "b"]
+    assert [m["path"] for m in governance.list_models("archived")] == ["/models/m1.ubj"]
+    assert governance.get_latest_candidate() is None
+
+def test_legacy_json_is_imported_once(tmp_path, config_path):
+    legacy = {
+        "production_model": {"path": "/models/prod.pkl", "timestamp": "2025-01-02T00:00:00", "git_sha": "abc",
+                             "metrics": {"rmse": 1.5}, "feature_names": ["x"], "status": "production"},
+        "candidates": [{"path": "/models/cand.ubj", "timestamp": "2025-02-01T00:00:00", "metrics": {"rmse": 1.2},
+                        "feature_names": ["x", "y"], "matrix_format": "sparse",
+                        "quantile_model": {"path": "/models/cand_quantile.ubj", "quantiles": [0.1, 0.9]}}],
+        "history": [{"path": "/models/old.pkl", "timestamp": "2024-06-01T00:00:00", "status": "archived"}],
+        "tuned_params": {"params": {"max_depth": 4}, "cv_rmse": 1.1, "fold_metrics": [], "n_trials": 3},
+    }
+    (tmp_path / "registry.json").write_text(json.dumps(legacy))
+
+    governance = MLGovernance(config_path)
+    assert governance.get_production_model_info()["path"] == "/models/prod.pkl"
+    candidate = governance.get_latest_candidate()
+    assert candidate["matrix_format"] == "sparse" and candidate["quantile_model"]["quantiles"] == [0.1, 0.9]
+    assert candidate["metrics"] == {"rmse": 1.2}
+    assert governance.get_tuned_params() == {"max_depth": 4}
+    assert len(governance.list_models()) == 3
+
+    # A second process start does not import again
+    assert len(MLGovernance(config_path).list_models()) == 3
+
+def test_concurrent_registrations_are_all_kept(config_path):
+    MLGovernance(config_path)
+    ctx = multiprocessing.get_context("spawn")
+    processes = [ctx.Process(target=register, args=(config_path, f"m{i}")) for i in range(6)]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join(timeout=60)
+    assert all(p.exitcode == 0 for p in processes)
+    assert len(MLGovernance(config_path).list_models("candidate")) == 6
@@ -0,0 +1,113 @@
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+import scipy.sparse as sp
+import xgboost as xgb
+
+from src import model_loader
+from src.feature_factory import SparseFeatureMatrix
+from src.model_loader import load_predictor, save_model
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    model_loader.clear_cache()
+    yield
+    model_loader.clear_cache()
+
+@pytest.fixture
+def trained():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(300, 5)).astype(np.float32), columns=list("abcde"))
+    y = 2 * X['b'] - X['e']
+    return xgb.XGBRegressor(n_estimators=20, max_depth=3).fit(X, y), X
+
+def test_native_roundtrip_aligns_columns(tmp_path, trained):
+    model, X = trained
+    path, artifact_hash = save_model(model, tmp_path / "m.pkl", list(X.columns))
+    assert path.suffix == ".ubj" and model_loader.manifest_path(path).exists()
+
+    predictor = load_predictor(path)
+    assert predictor.artifact_hash == artifact_hash and predictor.feature_names == list("abcde")
+    # Shuffled and extra columns are aligned to the manifest
+    shuffled = X[list("edcba")].assign(extra=1.0)
+    np.testing.assert_allclose(predictor.predict(shuffled), model.predict(X), rtol=1e-6)
+
+def test_sparse_model_predicts_from_sparse_matrix(tmp_path):
+    rng = np.random.default_rng(1)
+    dense = rng.normal(size=(200, 4)).astype(np.float32)
+    dense[dense < 0] = 0
+    model = xgb.XGBRegressor(n_estimators=10).fit(sp.csr_matrix(dense), dense[:, 0] + dense[:, 3])
+    path, _ = save_model(model, tmp_path / "s.ubj", ["w", "x", "y", "z"], matrix_format="sparse")
+
+    predictor = load_predictor(path)
+    # Column order of the incoming matrix does not matter
+    X = SparseFeatureMatrix(sp.csr_matrix(dense[:, ::-1]), ["z", "y", "x", "w"])
+    np.testing.assert_allclose(predictor.predict(X), model.predict(sp.csr_matrix(dense)), rtol=1e-6)
+
+def test_sparse_model_scores_frames_like_csr(tmp_path):
+    rng = np.random.default_rng(3)
+    dense = rng.normal(size=(300, 3)).astype(np.float32)
+    dense[dense < 0.3] = 0
+    model = xgb.XGBRegressor(n_estimators=10, max_depth=3).fit(sp.csr_matrix(dense), dense[:, 0] - dense[:, 2])
+    path, _ = save_model(model, tmp_path / "s.ubj", ["x", "y", "z"], matrix_format="sparse")
+    predictor = load_predictor(path)
+
+    expected = predictor.predict(SparseFeatureMatrix(sp.csr_matrix(dense), ["x", "y", "z"]))
+    # Zeros and NULLs in a DataFrame are missing, as absent CSR entries are
+    frame = pd.DataFrame(dense, columns=["x", "y", "z"]).replace(0, np.nan)
+    frame.loc[::2, "x"] = frame.loc[::2, "x"].fillna(0)
+    np.testing.assert_allclose(predictor.predict(frame[["z", "x", "y"]]), expected, rtol=1e-6)
+    np.testing.assert_allclose(predictor.predict(dense), expected, rtol=1e-6)
+
+def test_cache_reuses_boosters_and_evicts_lru(tmp_path, trained):
+    model, X = trained
+    paths = [save_model(model.set_params(n_estimators=n).fit(X, X['a']), tmp_path / f"m{n}.ubj", list(X.columns))[0]
+             for n in (3, 4, 5)]
+    model_loader.set_cache_size(2)
+    try:
+        first = load_predictor(paths[0])
+        assert load_predictor(paths[0]) is first
+        load_predictor(paths[1])
+        load_predictor(paths[2])
+        assert load_predictor(paths[0]) is not first
+    finally:
+        model_loader.set_cache_size(model_loader.DEFAULT_CACHE_SIZE)
+
+def test_cache_hit_skips_reading_the_artifact(tmp_path, trained, monkeypatch):
+    model, X = trained
+    path, _ = save_model(model, tmp_path / "m.ubj", list(X.columns))
+    first = load_predictor(path)
+
+    reads = []
+    original = model_loader.Path.read_bytes
+    monkeypatch.setattr(model_loader.Path, 'read_bytes', lambda self: reads.append(self) or original(self))
+    assert load_predictor(path) is first and reads == []
+
+    # A rewritten artifact is hashed (and loaded) again
+    save_model(model.set_params(n_estimators=3).fit(X, X['a']), path, list(X.columns))
+    assert load_predictor(path) is not first and reads
+
+def test_legacy_pickle_uses_registry_entry(tmp_path):
+    rng = np.random.default_rng(2)
+    X = rng.normal(size=(100, 3)).astype(np.float32)
+    model = xgb.XGBRegressor(n_estimators=5).fit(X, X[:, 1])
+    joblib.dump(model, tmp_path / "legacy.pkl")
+
+    predictor = load_predictor(tmp_path / "legacy.pkl",
+                               fallback={"feature_names": ["p", "q", "r"], "matrix_format": "dense"})
+    frame = pd.DataFrame(X, columns=["p", "q", "r"])
+    np.testing.assert_allclose(predictor.predict(frame), model.predict(X), rtol=1e-6)
+
+def test_quantile_model_predicts_sorted_bands(tmp_path, trained):
+    _, X = trained
+    quantiles = [0.1, 0.5, 0.9]
+    model = xgb.XGBRegressor(n_estimators=20, objective="reg:quantileerror",
+                             quantile_alpha=np.array(quantiles)).fit(X, X['b'])
+    path, _ = save_model(model, tmp_path / "q.ubj", list(X.columns), quantiles=quantiles)
+
+    predictor = load_predictor(path)
+    bands = predictor.predict(X)
+    assert predictor.quantiles == quantiles and bands.shape == (len(X), 3)
+    assert np.all(np.diff(bands, axis=1) >= 0)
+    np.testing.assert_allclose(bands, np.sort(model.predict(X), axis=1), rtol=1e-6)
@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+import pytest
+import yaml
+
+from src import multi_target, train_model
+from src.batch_scoring import BatchScorer
+from src.ml_governance import MLGovernance
+from src.model_loader import load_registered_bundle
+from src.multi_target import MultiTargetTrainer
+
+PARAMS = {'n_estimators': 20, 'max_depth': 3, 'learning_rate': 0.3, 'random_state': 0}
+
+@pytest.fixture
+def warehouse(tmp_path, monkeypatch):
+    monkeypatch.setattr(train_model, 'get_training_snapshot_dir', lambda: tmp_path / 'snapshots')
+    monkeypatch.setattr(multi_target, 'MODEL_DIR', tmp_path)
+    db_path = str(tmp_path / 'multi.duckdb')
+    modeler = train_model.RiskModeler(db_path)
+    # fair_market_value is a matrix column (and must not become a feature);
+    # ml_fair_market_value only exists in the Gold Layer, unknown for every fifth player.
+    # A quarter of edce_risk and of fair_market_value labels are NULL. dead_cap_millions
+    # and total_tds copy the labels they define, so a model that sees them leaks.
+    modeler.con.execute("""
+        CREATE TABLE staging_feature_matrix AS
+        SELECT 'P' || i AS player_name, 2015 + i % 10 AS year, 'T' AS team,
+               sin(i)::DOUBLE AS signal_a, cos(i * 1.7)::DOUBLE AS signal_b,
+               CASE WHEN i % 4 = 0 THEN NULL ELSE 2 * sin(i) - cos(i * 1.7) END AS edce_risk,
+               CASE WHEN i % 4 = 1 THEN NULL ELSE 10 + 3 * cos(i * 1.7) END AS fair_market_value
+        FROM range(400) r(i)
+    """)
+    modeler.con.execute("""
+        CREATE TABLE fact_player_efficiency AS
+        SELECT 'P' || i AS player_name, 'T' AS team, 2015 + i % 10 AS year,
+               CASE WHEN i % 5 = 0 THEN NULL ELSE 5 * sin(i) END AS ml_fair_market_value
+        FROM range(400) r(i)
+    """)
+    # P0 was traded in 2015: a second row for the same player-year, with its own labels
+    modeler.con.execute("INSERT INTO staging_feature_matrix VALUES ('P0', 2015, 'U', 0.5, 0.5, 7.0, 3.0)")
+    modeler.con.execute("INSERT INTO fact_player_efficiency VALUES ('P0', 'U', 2015, 1.5)")
+    modeler.con.execute("ALTER TABLE staging_feature_matrix ADD COLUMN dead_cap_millions DOUBLE")
+    modeler.con.execute("ALTER TABLE staging_feature_matrix ADD COLUMN total_tds DOUBLE")
+    modeler.con.execute("UPDATE staging_feature_matrix SET dead_cap_millions = edce_risk, total_tds = fair_market_value")
+    modeler.db.close()
+    return db_path
+
+@pytest.fixture
+def governance(tmp_path):
+    path = tmp_path / "ml_config.yaml"
+    path.write_text(yaml.safe_dump({"model_registry": {"registry_path": str(tmp_path / "registry.json")}}))
+    return MLGovernance(str(path))
+
+@pytest.mark.parametrize('matrix_format', ['dense', 'sparse'])
+def test_targets_share_one_matrix_and_keep_null_labels(warehouse, matrix_format):
+    dataset = MultiTargetTrainer(warehouse, matrix_format=matrix_format).build_dataset()
+    assert list(dataset.labels.columns) == ['edce_risk', 'fair_market_value', 'ml_fair_market_value']
+    assert not set(dataset.labels.columns) & set(dataset.feature_names)
+    # NULL labels stay missing (weight 0) instead of becoming 0-valued labels
+    assert dataset.labels.isna().sum().tolist() == [100, 100, 80]
+
+    regular = (dataset.metadata['team'] == 'T').to_numpy()
+    rows = dataset.metadata['player_name'].str[1:].astype(int).to_numpy()
+    expected = np.where(rows % 4 == 1, np.nan, 10 + 3 * np.cos(rows * 1.7))
+    np.testing.assert_allclose(dataset.labels['fair_market_value'][regular], expected[regular], rtol=1e-5)
+    assert np.isnan(dataset.labels['edce_risk'].to_numpy()[regular & (rows % 4 == 0)]).all()
+
+    # Each of the traded player's rows keeps its own raw label
+    traded = dataset.labels[(dataset.metadata['player_name'] == 'P0').to_numpy()]
+    by_team = traded.set_axis(dataset.metadata.loc[dataset.metadata['player_name'] == 'P0', 'team'])
+    assert np.isnan(by_team.loc['T', 'edce_risk']) and by_team.loc['U', 'edce_risk'] == 7.0
+    assert np.isnan(by_team.loc['T', 'ml_fair_market_value']) and by_team.loc['U', 'ml_fair_market_value'] == 1.5
+
+@pytest.mark.parametrize('matrix_format', ['dense', 'sparse'])
+def test_each_target_ignores_its_own_defining_columns(warehouse, matrix_format):
+    trainer = MultiTargetTrainer(warehouse, matrix_format=matrix_format, max_workers=1)
+    dataset = trainer.build_dataset()
+    assert {'dead_cap_millions', 'total_tds'} <= set(dataset.feature_names)
+
+    boosters, _ = trainer.train(dataset, PARAMS)
+    used = {t: set(b.get_score(importance_type='weight')) for t, b in boosters.items()}
+    assert 'dead_cap_millions' not in used['edce_risk']
+    assert 'total_tds' not in used['fair_market_value'] and 'total_tds' not in used['ml_fair_market_value']
+    # A column is only hidden from the target it defines
+    assert 'total_tds' in used['edce_risk'] and 'dead_cap_millions' in used['fair_market_value']
+
+def test_quantized_once_and_scored_as_a_bundle(warehouse, governance, monkeypatch):
+    sketches = []
+    original = multi_target.xgb.QuantileDMatrix
+    monkeypatch.setattr(multi_target.xgb, 'QuantileDMatrix',
+                        lambda *args, **kwargs: sketches.append(kwargs.get('ref') is None) or original(*args, **kwargs))
+
+    trainer = MultiTargetTrainer(warehouse, matrix_format='sparse', max_workers=3)
+    dataset = trainer.build_dataset()
+    boosters, metrics = trainer.train(dataset, PARAMS)
+    assert sketches.count(True) == 1 and len(sketches) == 4  # One sketch, binned once per target
+    assert metrics['edce_risk']['r2'] > 0.5
+    version = trainer.register(dataset, boosters, metrics, governance)
+
+    bundle = load_registered_bundle(governance)
+    assert bundle.version == version and set(bundle.predictors) == set(dataset.labels.columns)
+    assert governance.get_serving_model_info() is None  # Bundle members are not serving candidates
+
+    scorer = BatchScorer(warehouse, table='staging_feature_matrix', output_table='multi_target_predictions',
+                         bundle=bundle)
+    scorer.score(2015, 2024)
+    scored = scorer.con.execute("SELECT * FROM multi_target_predictions ORDER BY player_name").df()
+    scorer.close()
+    assert len(scored) == 401
+    assert {'predicted_edce_risk', 'predicted_fair_market_value', 'predicted_ml_fair_market_value'} <= set(scored.columns)
+
+    expected = boosters['fair_market_value'].inplace_predict(
+        dataset.X.align(bundle.feature_names).matrix, missing=np.nan)
+    keys = ['player_name', 'team']
+    by_player = pd.Series(expected, index=pd.MultiIndex.from_frame(dataset.metadata[keys])).sort_index()
+    np.testing.assert_allclose(scored.set_index(keys)['predicted_fair_market_value'].sort_index(),
+                               by_player, rtol=1e-5)
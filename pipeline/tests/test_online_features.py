@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from datetime import date
+from src.feature_store import FeatureStore
+from src.online_features import OnlineFeatureServer
+
+@pytest.fixture
+def server(tmp_path):
+    store = FeatureStore(db_path=str(tmp_path / "online.duckdb"))
+    store.initialize_schema()
+    store.db.execute("CREATE TABLE fact_player_efficiency (player_name VARCHAR, year INTEGER, total_tds INTEGER, age INTEGER)")
+    store.db.execute("""
+        INSERT INTO fact_player_efficiency VALUES 
+        ('QB1', 2023, 20, 27), ('QB1', 2024, 30, 28),
+        ('WR1', 2022, 8, 24), ('WR1', 2023, 11, 25)
+    """)
+    store.refresh_features(as_of=date(2024, 1, 1))
+    return OnlineFeatureServer(store, min_refresh_interval=0)
+
+def test_serves_latest_vector_per_player(server):
+    server.refresh(as_of=date(2025, 3, 1))
+    
+    qb = server.get_features('QB1')
+    assert qb['total_tds_lag_1'] == 20.0
+    assert qb['age_lag_1'] == 27.0
+    
+    # WR1's latest prediction year is 2023: lag_1 from 2022
+    assert server.get_features('WR1')['total_tds_lag_1'] == 8.0
+    assert server.get_features('Nobody') is None
+    
+    X, found = server.get_batch(['WR1', 'Nobody', 'QB1'])
+    assert X.dtype == np.float32
+    assert found.tolist() == [True, False, True]
+    assert np.isnan(X[1]).all()
+    col = server.feature_names.index('total_tds_lag_1')
+    assert X[2, col] == 20.0
+
+def test_refresh_only_after_new_materialization(server):
+    server.refresh()
+    before = server.snapshot
+    assert server.refresh_if_stale() is False
+    
+    server.store.db.execute("UPDATE fact_player_efficiency SET total_tds = 25 WHERE player_name = 'QB1' AND year = 2023")
+    server.store.refresh_features(as_of=date(2024, 6, 1))
+    
+    assert server.refresh_if_stale() is True
+    assert server.snapshot is not before
+    assert server.get_features('QB1')['total_tds_lag_1'] == 25.0
+
+def test_concurrent_staleness_checks_refresh_once(server):
+    from concurrent.futures import ThreadPoolExecutor
+    server.refresh()
+    server.store.db.execute("UPDATE fact_player_efficiency SET total_tds = 25 WHERE player_name = 'QB1' AND year = 2023")
+    server.store.refresh_features(as_of=date(2024, 6, 1))
+    
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        refreshed = list(pool.map(lambda _: server.refresh_if_stale(), range(8)))
+    assert refreshed.count(True) == 1
+    assert server.get_features('QB1')['total_tds_lag_1'] == 25.0
@@ -0,0 +1,89 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+import xgboost as xgb
+import yaml
+
+from src import simulate_history
+from src.filter_history import filter_history
+from src.simulate_history import HistoricalSimulator, write_history
+
+PARAMS = {'n_estimators': 20, 'max_depth': 3, 'learning_rate': 0.3, 'random_state': 0, 'n_jobs': 1}
+
+def history_frame():
+    i = np.arange(600)
+    return pd.DataFrame({
+        'player_name': [f'P{k}' for k in i], 'year': 2015 + i % 10, 'team': 'T',
+        'games': np.sin(i) * 10 + 10, 'age': 22 + i % 12, 'team_wins': np.cos(i * 1.3) * 5 + 8,
+        'cap_hit': 1 + np.abs(np.sin(i) * 20 + (i % 12)),
+    })
+
+@pytest.fixture
+def simulator(tmp_path, monkeypatch):
+    frame = history_frame()
+    monkeypatch.setattr(simulate_history, 'DBManager', lambda: None)
+    monkeypatch.setattr(simulate_history, 'FeatureStore',
+                        lambda db: type('Store', (), {'load_features': staticmethod(lambda: frame.copy())})())
+    config = {
+        'models': {'xgboost': {'params': PARAMS}},
+        'training': {'target': 'cap_hit'},
+        'features': {'player_stats': ['games'], 'contract_info': ['age'], 'team_context': ['team_wins']},
+        'validation': {'backtest': {'incremental_rounds': 5}},
+        'simulation': {'max_workers': 2, 'output_dir': str(tmp_path / 'history'),
+                       'json_path': str(tmp_path / 'history.json')},
+    }
+    path = tmp_path / 'ml_config.yaml'
+    path.write_text(yaml.safe_dump(config))
+    return HistoricalSimulator(str(path))
+
+def test_parallel_seasons_match_a_sequential_refit(simulator):
+    results = simulator.run_simulation(2021, 2024)
+    frame = history_frame()
+    features = ['games', 'age', 'team_wins']
+    for year in range(2021, 2025):
+        model = xgb.XGBRegressor(**PARAMS).fit(frame.loc[frame['year'] < year, features],
+                                               frame.loc[frame['year'] < year, 'cap_hit'])
+        expected = model.predict(frame.loc[frame['year'] == year, features])
+        season = results[results['year'] == year]
+        assert season['player_name'].tolist() == frame.loc[frame['year'] == year, 'player_name'].tolist()
+        np.testing.assert_allclose(season['predicted'], np.maximum(0, expected), rtol=1e-6)
+    np.testing.assert_allclose(results['error'], results['actual'] - results['predicted'], atol=1e-6)
+
+def test_rerun_replaces_only_its_partitions(simulator, tmp_path):
+    simulator.run_simulation(2021, 2024)
+    compare = simulator.run_simulation(2023, 2023, mode='compare')
+    assert 'predicted_incremental' in compare.columns
+
+    partitions = sorted(p.name for p in (tmp_path / 'history' / 'source=simulation').iterdir())
+    assert partitions == ['year=2021', 'year=2022', 'year=2023', 'year=2024']
+
+    text = (tmp_path / 'history.json').read_text()
+    assert '\n  ' not in text  # Compact: one record per line, no indentation
+    records = json.loads(text)
+    assert len(records) == 240 and {r['year'] for r in records} == {2021, 2022, 2023, 2024}
+    assert list(records[0])[:3] == ['player_name', 'year', 'team']
+    assert all((r['predicted_incremental'] is not None) == (r['year'] == 2023) for r in records)
+
+def test_backtest_and_simulation_seasons_never_mix(simulator, tmp_path, monkeypatch):
+    simulator.run_simulation(2021, 2024)
+    backtest = pd.DataFrame({'player_name': ['P1', 'P2'], 'year': [2023, 2024], 'team': 'T',
+                             'actual': [0.2, 0.4], 'predicted': [0.25, 0.35]})
+    write_history(backtest, 'backtest', tmp_path / 'history', tmp_path / 'backtest.json')
+    assert {r['actual'] for r in json.loads((tmp_path / 'backtest.json').read_text())} == {0.2, 0.4}
+
+    # A rerun of the simulation still exports only its own (cap_hit) seasons
+    simulator.run_simulation(2024, 2024)
+    records = json.loads((tmp_path / 'history.json').read_text())
+    assert len(records) == 240 and min(r['actual'] for r in records) >= 1
+
+    # Filtering trims the dataset, so the next export does not bring the seasons back
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('config')
+    (tmp_path / 'ml_config.yaml').rename(tmp_path / 'config' / 'ml_config.yaml')
+    filter_history(2022, 2023)
+    simulator.run_simulation(2023, 2023)
+    records = json.loads((tmp_path / 'history.json').read_text())
+    assert {r['year'] for r in records} == {2022, 2023}
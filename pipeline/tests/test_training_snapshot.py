@@ -0,0 +1,115 @@
+import duckdb
+import numpy as np
+import pandas as pd
+import pytest
+import scipy.sparse as sp
+
+from src import train_model
+from src.feature_factory import SparseFeatureMatrix
+from src.training_snapshot import TrainingSnapshotStore
+
+@pytest.fixture
+def metadata():
+    return pd.DataFrame({'player_name': ['A', 'B', 'C'], 'year': [2022, 2023, 2024], 'team': ['X', 'Y', 'Z']})
+
+def test_dense_roundtrip_restores_dtypes_and_is_writable(tmp_path, metadata):
+    store = TrainingSnapshotStore(tmp_path)
+    X = pd.DataFrame({'f1': np.array([1.0, 2.0, 3.0], dtype=np.float32), 'f2': [0.5, np.nan, 1.5],
+                      'pos_QB': pd.array([1, 0, 1], dtype='UInt8'), 'games': pd.array([16, 3, 0], dtype='Int16')})
+    y = pd.Series([0.1, 0.2, 0.3], name='edce_risk')
+
+    assert store.get('k') is None
+    store.put('k', X, y, metadata)
+    X2, y2, meta2 = store.get('k')
+
+    # The feature_dtypes policy survives the snapshot
+    assert X2.dtypes.astype(str).tolist() == ['float32', 'float64', 'UInt8', 'Int16']
+    np.testing.assert_array_equal(X2.to_numpy(dtype=np.float32, na_value=np.nan),
+                                  X.to_numpy(dtype=np.float32, na_value=np.nan))
+    assert list(X2.columns) == ['f1', 'f2', 'pos_QB', 'games'] and y2.name == 'edce_risk'
+
+    # An ordinary frame: in-place edits work
+    X2['f1'] = X2['f1'] * 2
+    X2.fillna(0, inplace=True)
+    np.testing.assert_allclose(y2, y)
+    pd.testing.assert_frame_equal(meta2, metadata)
+
+def test_sparse_roundtrip(tmp_path, metadata):
+    store = TrainingSnapshotStore(tmp_path)
+    X = SparseFeatureMatrix(sp.csr_matrix(np.array([[1, 0], [0, 2], [3, 0]], dtype=np.float32)), ['a', 'b'])
+    store.put('k', X, pd.Series([1.0, 2.0, 3.0], name='t'), metadata)
+
+    X2, _, _ = store.get('k')
+    assert isinstance(X2, SparseFeatureMatrix) and list(X2.columns) == ['a', 'b']
+    np.testing.assert_array_equal(X2.matrix.toarray(), X.matrix.toarray())
+
+def test_fingerprint_tracks_content_not_row_order(tmp_path):
+    con = duckdb.connect()
+    con.execute("CREATE TABLE t AS SELECT * FROM (VALUES ('A', 1.0), ('B', 2.0)) v(player_name, x)")
+    first = TrainingSnapshotStore.fingerprint(con, "t")
+
+    con.execute("CREATE OR REPLACE TABLE t AS SELECT * FROM t ORDER BY player_name DESC")
+    assert TrainingSnapshotStore.fingerprint(con, "t") == first
+
+    con.execute("UPDATE t SET x = 2.5 WHERE player_name = 'B'")
+    changed = TrainingSnapshotStore.fingerprint(con, "t")
+    assert changed != first
+    assert TrainingSnapshotStore.make_key(first, target='y') != TrainingSnapshotStore.make_key(changed, target='y')
+
+def test_prepare_data_served_from_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(train_model, 'get_training_snapshot_dir', lambda: tmp_path / 'snapshots')
+    modeler = train_model.RiskModeler(str(tmp_path / 'snap.duckdb'))
+    modeler.con.execute("""
+        CREATE TABLE staging_feature_matrix AS
+        SELECT 'P' || i AS player_name, 2015 + i % 10 AS year, 'T' AS team,
+               i * 0.5 AS feature_a, i % 3 AS games_played, i * 0.1 AS edce_risk
+        FROM range(20) r(i)
+    """)
+
+    cold = modeler.prepare_data('edce_risk', matrix_format='dense')
+    assert len(list((tmp_path / 'snapshots').iterdir())) == 1
+    # Served frames carry the same dtypes as an unsnapshotted preparation
+    fresh = modeler.prepare_data('edce_risk', matrix_format='dense', use_snapshot=False)
+    pd.testing.assert_series_equal(cold[0].dtypes, fresh[0].dtypes)
+
+    # A hit must not touch the preparation path at all
+    monkeypatch.setattr(modeler, '_prepare_dense_data', lambda *args: pytest.fail("snapshot missed"))
+    warm = modeler.prepare_data('edce_risk', matrix_format='dense')
+    pd.testing.assert_frame_equal(warm[0], cold[0])
+    pd.testing.assert_series_equal(warm[1], cold[1])
+
+    # Changing the source data changes the key
+    modeler.con.execute("UPDATE staging_feature_matrix SET feature_a = feature_a + 1 WHERE player_name = 'P3'")
+    with pytest.raises(pytest.fail.Exception):
+        modeler.prepare_data('edce_risk', matrix_format='dense')
+
+def test_dtype_policy_change_and_read_only_callers(tmp_path, monkeypatch):
+    snapshots = tmp_path / 'snapshots'
+    monkeypatch.setattr(train_model, 'get_training_snapshot_dir', lambda: snapshots)
+    db_path = str(tmp_path / 'policy.duckdb')
+    modeler = train_model.RiskModeler(db_path)
+    modeler.con.execute("""
+        CREATE TABLE staging_feature_matrix AS
+        SELECT 'P' || i AS player_name, 2015 + i % 10 AS year, 'T' AS team,
+               i * 0.5 AS feature_a, i % 3 AS games_played, i * 0.1 AS edce_risk
+        FROM range(20) r(i)
+    """)
+
+    # A read-only caller prepares on a miss without writing a snapshot
+    reader = train_model.RiskModeler(db_path, read_only=True)
+    reader.db = modeler.db
+    reader.con = modeler.con
+    reader.prepare_data('edce_risk', matrix_format='dense')
+    assert not snapshots.exists()
+
+    before = modeler.prepare_data('edce_risk', matrix_format='dense')[0]
+    assert before['games_played'].dtype == 'int16'
+
+    # Declaring a policy that leaves counts as float must not restore the old int16 snapshot
+    modeler.con.execute("""
+        CREATE TABLE feature_dtype_policy AS
+        SELECT 'float' AS family, '.*' AS pattern, 'float32' AS dtype, 'all float' AS description, 1 AS priority
+    """)
+    after = modeler.prepare_data('edce_risk', matrix_format='dense')[0]
+    assert after['games_played'].dtype == 'float32'
+    assert len(list(snapshots.iterdir())) == 2
@@ -1,6 +1,7 @@
 
+import duckdb
 import pytest
-from pipeline.src.win_probability import WinProbabilityModel
+from pipeline.src.win_probability import RiskIntervalLookup, WinProbabilityModel
 
 @pytest.fixture
 def model():
@@ -78,3 +79,40 @@ def test_balanced_trade(model):
     
     impact = model.calculate_win_impact(proposal)
     assert impact["IND"]["delta_wins"] == 0.0
+
+def test_model_interval_replaces_heuristic_variance(model):
+    """
+    A model prediction interval (risk_interval) sets the uncertainty, not the point risk.
+    """
+    narrow = {"type": "player", "position": "WR", "surplus_value": 10.0, "risk_score": 0.9,
+              "risk_interval": [0.45, 0.50]}
+    wide = dict(narrow, risk_interval=[0.10, 0.90])
+
+    def spread(asset):
+        proposal = {"team_a": "LV", "team_b": "KC", "team_b_assets": [asset], "team_a_assets": []}
+        return model.calculate_win_impact(proposal)["LV"]["vegas_variance"]
+
+    # 20 weighted * 0.8 width = 16. / 50 = 0.32 sigma -> 0.6 spread; narrow band hits the 0.5 floor
+    assert spread(wide) == 0.6
+    assert spread(narrow) == 0.5
+
+def test_interval_lookup_attaches_bands():
+    con = duckdb.connect()
+    con.execute("""
+        CREATE TABLE prediction_results AS SELECT * FROM (VALUES
+            ('A', 2024, 'KC', 0.40, 0.20, 0.40, 0.70),
+            ('A', 2025, 'KC', 0.50, 0.30, 0.50, 0.80),
+            ('B', 2025, 'LV', 0.10, 0.05, 0.10, 0.20)
+        ) v(player_name, year, team, predicted_risk_score, risk_lower, risk_median, risk_upper)
+    """)
+    lookup = RiskIntervalLookup.from_db(con)
+    assert lookup.year == 2025
+
+    assets = lookup.attach([{"name": "A"}, {"name": "B", "risk_interval": [0.0, 1.0]}, {"name": "C"}])
+    assert assets[0] == {"name": "A", "risk_interval": [0.30, 0.80], "risk_score": 0.50}
+    assert assets[1]["risk_interval"] == [0.0, 1.0]
+    assert "risk_interval" not in assets[2]
+
+def test_interval_lookup_is_empty_before_the_first_training_run():
+    lookup = RiskIntervalLookup.from_db(duckdb.connect(), 2025)
+    assert lookup.intervals == {} and lookup.get("A") is None